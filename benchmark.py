@@ -0,0 +1,58 @@
+import argparse
+import sys
+from detector.benchmark import (FUNCTIONS, RESOLUTIONS, compare, load_results, run_suite,
+                                save_results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mede o desempenho dos detectores em cenas sintéticas reproduzíveis.")
+    parser.add_argument("--spots", type=int, nargs="+", default=[4, 50, 500, 2000],
+                        help="Quantidades de vagas (padrão: 4 50 500 2000)")
+    parser.add_argument("--resolutions", nargs="+", choices=sorted(RESOLUTIONS),
+                        default=["480p", "1080p", "4k"], help="Resoluções (padrão: todas)")
+    parser.add_argument("--functions", nargs="+", choices=FUNCTIONS, default=list(FUNCTIONS),
+                        help="Funções medidas (padrão: todas)")
+    parser.add_argument("--quick", action="store_true",
+                        help="Só 480p com 4 e 50 vagas (verificação rápida)")
+    parser.add_argument("--repeat", type=int, default=30, help="Medições por função (padrão: 30)")
+    parser.add_argument("--max-seconds", type=float, default=2.0,
+                        help="Tempo máximo por função (padrão: 2)")
+    parser.add_argument("--no-memory", action="store_true", help="Não mede o pico de memória")
+    parser.add_argument("--stages", action="store_true",
+                        help="Inclui o p50 de cada etapa interna dos detectores")
+    parser.add_argument("--output", default=None, help="Grava os resultados em JSON")
+    parser.add_argument("--baseline", default=None,
+                        help="JSON de uma execução anterior; regressões fazem o comando falhar")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Piora tolerada em relação à referência (padrão: 0.25 = 25%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.quick:
+        args.spots, args.resolutions = [4, 50], ["480p"]
+
+    results = run_suite(args.spots, args.resolutions, args.functions, args.repeat,
+                        args.max_seconds, memory=not args.no_memory, stages=args.stages,
+                        log=print)
+    if args.output:
+        save_results(args.output, results)
+
+    if args.baseline is None:
+        return 0
+    rows = compare(results, load_results(args.baseline), args.tolerance)
+    print(f"\n{'medição':<40} {'ref. ms':>9} {'atual ms':>9} {'razão':>7}")
+    for row in rows:
+        flag = "  REGRESSÃO" if row.regressed else ""
+        print(f"{row.key:<40} {row.baseline_ms:9.3f} {row.current_ms:9.3f} {row.ratio:7.2f}{flag}")
+    regressions = sum(row.regressed for row in rows)
+    if regressions:
+        print(f"{regressions} regressões acima de {args.tolerance:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
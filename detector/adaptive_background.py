@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+from detector.background_utils import match_background_size
+
+
+class AdaptiveBackground:
+    """
+    Fundo que acompanha mudanças lentas de iluminação.
+
+    A cada frame, a média ponderada (`cv2.accumulateWeighted`) é atualizada
+    apenas dentro das vagas classificadas como livres (bounding box, restrita
+    à máscara do polígono quando houver). O custo é proporcional aos pixels
+    das vagas livres, não ao frame inteiro. O array `frame` é alterado no
+    próprio lugar, e a cada `refresh_interval` atualizações as vagas que
+    mudaram são repassadas a `detector.refresh_background`, que recalcula só
+    as características em cache dessas vagas.
+
+    Vagas livres cuja bounding box se sobrepõe a uma vaga ocupada podem
+    absorver parte do carro vizinho na borda; com `alpha` pequeno o efeito é
+    desprezível.
+    """
+
+    def __init__(self, bg_frame: np.ndarray, detector, alpha: float = 0.01,
+                 refresh_interval: int = 30):
+        """
+        Parâmetros:
+            bg_frame: Frame inicial do estacionamento vazio (não é alterado).
+            detector: Detector cujas vagas e caches são atualizados.
+            alpha: Peso do frame atual na média (0 a 1).
+            refresh_interval: Atualizações entre cada recálculo dos caches do detector.
+        """
+        self.detector = detector
+        self.alpha = alpha
+        self.refresh_interval = refresh_interval
+        self.frame = bg_frame.copy()
+        self._accumulator = None
+        self._regions = None
+        self._changed = set()
+        self._updates = 0
+
+        # Contadores
+        self.pixels_updated = 0
+
+    def _spot_regions(self, frame_shape: tuple) -> list:
+        """
+        (x, y, w, h, máscara ou None) de cada vaga, recortados ao frame.
+        """
+        detector = self.detector
+        height, width = frame_shape[:2]
+        regions = []
+        if hasattr(detector, "spot_bounding_boxes"):
+            masks = detector._masks_for_shape(frame_shape)
+            boxes = [detector.spot_bounding_boxes[idx] for idx in range(len(detector.spots))]
+        else:
+            masks = None
+            boxes = detector.spots
+
+        for idx, (x, y, w, h) in enumerate(boxes):
+            w = max(0, min(x + w, width) - x)
+            h = max(0, min(y + h, height) - y)
+            mask = masks[idx][:h, :w] if masks is not None else None
+            regions.append((x, y, w, h, mask))
+        return regions
+
+    def _prepare(self, frame_shape: tuple):
+        if self._accumulator is not None and self._accumulator.shape[:2] == tuple(frame_shape[:2]):
+            return
+        self.frame = np.ascontiguousarray(match_background_size(self.frame, frame_shape))
+        self._accumulator = self.frame.astype(np.float32)
+        self._regions = self._spot_regions(frame_shape)
+
+    def background(self, frame_shape: tuple) -> np.ndarray:
+        """
+        Fundo na resolução dos frames, para passar ao detector.
+
+        Um fundo de outra resolução é redimensionado uma única vez, antes da
+        primeira detecção: o detector passa a guardar em cache o mesmo array
+        que `update` altera e que `flush` repassa a `refresh_background`.
+        """
+        self._prepare(frame_shape)
+        return self.frame
+
+    def update(self, frame: np.ndarray, detections: list) -> np.ndarray:
+        """
+        Incorpora `frame` ao fundo nas vagas livres segundo `detections`.
+
+        Retorna o fundo atualizado (sempre o mesmo array `frame`).
+        """
+        self._prepare(frame.shape)
+        for idx, (occupied, _) in enumerate(detections):
+            if occupied:
+                continue
+            x, y, w, h, mask = self._regions[idx]
+            if w == 0 or h == 0:
+                continue
+            acc = self._accumulator[y:y+h, x:x+w]
+            cv2.accumulateWeighted(frame[y:y+h, x:x+w], acc, self.alpha, mask)
+            # Fora da máscara o acumulador não muda, então a conversão da
+            # bounding box inteira preserva esses pixels
+            self.frame[y:y+h, x:x+w] = cv2.convertScaleAbs(acc)
+            self.pixels_updated += w * h if mask is None else cv2.countNonZero(mask)
+            self._changed.add(idx)
+
+        self._updates += 1
+        if self._updates % self.refresh_interval == 0:
+            self.flush()
+        return self.frame
+
+    def flush(self):
+        """
+        Repassa ao detector as vagas alteradas desde o último recálculo.
+        """
+        if self._changed and hasattr(self.detector, "refresh_background"):
+            self.detector.refresh_background(self.frame, sorted(self._changed))
+        self._changed.clear()
@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+
+def iter_frame_batches(frames, batch_size: int = 32):
+    """
+    Agrupa frames em blocos empilhados com forma (N, H, W, 3).
+
+    Parâmetros:
+        frames: Array (N, H, W, 3) ou qualquer iterável de frames BGR.
+        batch_size: Quantidade máxima de frames por bloco.
+
+    Retorna:
+        Gerador de arrays (n, H, W, 3), com n <= batch_size.
+    """
+    if isinstance(frames, np.ndarray) and frames.ndim == 4:
+        for start in range(0, len(frames), batch_size):
+            yield frames[start:start+batch_size]
+        return
+
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield np.stack(batch)
+            batch = []
+    if batch:
+        yield np.stack(batch)
+
+
+def gray_stack(stack: np.ndarray) -> np.ndarray:
+    """
+    Converte um bloco (N, H, W, 3) para cinza com uma única chamada ao OpenCV.
+    """
+    n, h, w = stack.shape[:3]
+    tall = np.ascontiguousarray(stack).reshape(n * h, w, 3)
+    return cv2.cvtColor(tall, cv2.COLOR_BGR2GRAY).reshape(n, h, w)
+
+
+def pad_rows(rois: np.ndarray, pad: int, mode: str) -> np.ndarray:
+    """
+    Acrescenta `pad` linhas acima e abaixo de cada ROI de um bloco (N, h, w).
+
+    Com a borda certa (`edge` = BORDER_REPLICATE, `reflect` = BORDER_REFLECT_101),
+    um filtro aplicado ao bloco empilhado verticalmente dá, nas linhas
+    originais, o mesmo resultado que aplicado a cada ROI separadamente.
+    """
+    return np.pad(rois, ((0, 0), (pad, pad), (0, 0)), mode=mode)
+
+
+def filter_stack(rois: np.ndarray, pad: int, mode: str, fn) -> np.ndarray:
+    """
+    Aplica `fn` (filtro 2D do OpenCV) a todas as ROIs do bloco de uma vez.
+    """
+    n, h, w = rois.shape
+    padded = np.ascontiguousarray(pad_rows(rois, pad, mode))
+    filtered = fn(padded.reshape(n * (h + 2 * pad), w))
+    return filtered.reshape(n, h + 2 * pad, w)[:, pad:pad+h]
+
+
+def run_batches(detect_stack, frames, num_spots: int, batch_size: int = 32):
+    """
+    Executa `detect_stack` bloco a bloco e junta os resultados.
+
+    Parâmetros:
+        detect_stack: Função (bloco) -> (ocupação (n, vagas), cores [n][vagas]).
+        frames: Array (N, H, W, 3) ou iterável de frames.
+        num_spots: Quantidade de vagas do layout.
+        batch_size: Tamanho dos blocos.
+
+    Retorna:
+        Tupla (ocupação, cores): matriz booleana (N, vagas) e lista de N listas
+        com a cor de cada vaga (None quando livre).
+    """
+    occupancy = []
+    colors = []
+    for stack in iter_frame_batches(frames, batch_size):
+        batch_occupancy, batch_colors = detect_stack(stack)
+        occupancy.append(batch_occupancy)
+        colors.extend(batch_colors)
+
+    if not occupancy:
+        return np.zeros((0, num_spots), dtype=bool), []
+    return np.concatenate(occupancy), colors
@@ -0,0 +1,301 @@
+import json
+import math
+import platform
+import time
+import tracemalloc
+from typing import NamedTuple
+import cv2
+import numpy as np
+from detector.color_utils import get_dominant_color
+from detector.improved_parking_detector import ImprovedParkingDetector
+from detector.parking_detector import ParkingDetector
+from detector.polygon_parking_detector import PolygonParkingDetector
+from detector.profiling import StageProfiler
+
+RESOLUTIONS = {
+    "480p": (480, 854),
+    "1080p": (1080, 1920),
+    "4k": (2160, 3840),
+}
+
+FUNCTIONS = (
+    "rect.detect",
+    "improved.detect",
+    "polygon.detect",
+    "rect.draw_annotations",
+    "polygon.draw_annotations",
+    "get_dominant_color",
+)
+
+
+class SyntheticScene(NamedTuple):
+    """
+    Cena sintética: fundo, frames com carros e os dois formatos de layout.
+
+    `occupancy[n, i]` indica se a vaga i tem carro no frame n.
+    """
+    background: np.ndarray
+    frames: list
+    rects: list
+    polygons: list
+    occupancy: np.ndarray
+
+
+def synthetic_layout(num_spots: int, shape: tuple) -> tuple:
+    """
+    Grade de `num_spots` vagas cobrindo o frame.
+
+    Retorna:
+        (retângulos (x, y, w, h), polígonos inclinados de 4 pontos dentro de cada retângulo)
+    """
+    height, width = shape[:2]
+    cols = max(1, math.ceil(math.sqrt(num_spots * width / height)))
+    rows = math.ceil(num_spots / cols)
+    cell_w, cell_h = width // cols, height // rows
+    margin_x, margin_y = max(1, cell_w // 10), max(1, cell_h // 10)
+
+    rects, polygons = [], []
+    for idx in range(num_spots):
+        row, col = divmod(idx, cols)
+        x, y = col * cell_w + margin_x, row * cell_h + margin_y
+        w, h = cell_w - 2 * margin_x, cell_h - 2 * margin_y
+        rects.append((x, y, w, h))
+        skew = w // 5
+        polygons.append([[x + skew, y], [x + w, y], [x + w - skew, y + h], [x, y + h]])
+    return rects, polygons
+
+
+def synthetic_background(shape: tuple, rects: list, seed: int = 0) -> np.ndarray:
+    """
+    Asfalto com textura (ruído fixo) e faixas brancas entre as vagas.
+    """
+    rng = np.random.default_rng(seed)
+    height, width = shape[:2]
+    noise = rng.normal(90, 6, (height, width)).clip(0, 255).astype(np.uint8)
+    background = cv2.merge([noise, noise, cv2.add(noise, 4)])
+    for x, y, w, h in rects:
+        cv2.line(background, (x - 2, y), (x - 2, y + h), (230, 230, 230), max(1, w // 40))
+    return background
+
+
+def synthetic_scene(num_spots: int, resolution="480p", num_frames: int = 8,
+                    occupancy: float = 0.5, seed: int = 0) -> SyntheticScene:
+    """
+    Gera uma cena reproduzível (mesma `seed`, mesma cena).
+
+    Parâmetros:
+        num_spots: Quantidade de vagas (ex.: 4 a 2000).
+        resolution: Nome em RESOLUTIONS ou (altura, largura).
+        num_frames: Frames gerados, cada um com uma ocupação sorteada.
+        occupancy: Fração esperada de vagas ocupadas por frame.
+        seed: Semente do gerador.
+    """
+    shape = RESOLUTIONS[resolution] if isinstance(resolution, str) else tuple(resolution)
+    rects, polygons = synthetic_layout(num_spots, shape)
+    background = synthetic_background(shape, rects, seed)
+
+    rng = np.random.default_rng(seed + 1)
+    occupied = rng.random((num_frames, num_spots)) < occupancy
+    frames = []
+    for n in range(num_frames):
+        frame = background.copy()
+        for idx in np.flatnonzero(occupied[n]):
+            x, y, w, h = rects[idx]
+            # Carro: corpo colorido centrado na vaga e para-brisa escuro
+            car_w, car_h = max(2, int(w * 0.6)), max(2, int(h * 0.8))
+            cx, cy = x + (w - car_w) // 2, y + (h - car_h) // 2
+            color = tuple(int(c) for c in rng.integers(0, 256, 3))
+            cv2.rectangle(frame, (cx, cy), (cx + car_w, cy + car_h), color, -1)
+            cv2.rectangle(frame, (cx + car_w // 6, cy + car_h // 5),
+                          (cx + car_w - car_w // 6, cy + car_h // 3), (30, 30, 30), -1)
+        frames.append(frame)
+    return SyntheticScene(background, frames, rects, polygons, occupied)
+
+
+def time_function(fn, inputs: list, repeat: int = 30, warmup: int = 2,
+                  max_seconds: float = 2.0) -> np.ndarray:
+    """
+    Tempo (em segundos) de cada chamada `fn(entrada)`, percorrendo `inputs` em ciclo.
+
+    Para após `repeat` medições ou `max_seconds` (com pelo menos uma medição);
+    o aquecimento é pulado quando uma chamada sozinha já passa de `max_seconds`.
+    """
+    for n in range(warmup):
+        start = time.perf_counter()
+        fn(inputs[n % len(inputs)])
+        if time.perf_counter() - start > max_seconds:
+            break
+
+    samples = []
+    started = time.perf_counter()
+    for n in range(repeat):
+        item = inputs[n % len(inputs)]
+        start = time.perf_counter()
+        fn(item)
+        samples.append(time.perf_counter() - start)
+        if time.perf_counter() - started > max_seconds:
+            break
+    return np.array(samples)
+
+
+def peak_memory(fn, item) -> float:
+    """
+    Pico de memória alocada (em MB, via tracemalloc) durante uma chamada `fn(item)`.
+    """
+    tracemalloc.start()
+    try:
+        fn(item)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2**20
+
+
+def _mean_area(rects: list) -> float:
+    return float(np.mean([w * h for _, _, w, h in rects]))
+
+
+def benchmark_cases(scene: SyntheticScene, profiler: StageProfiler = None) -> dict:
+    """
+    Funções medidas na cena: nome -> (função, entradas).
+
+    Os thresholds em pixels absolutos (retangular e melhorado) são ajustados
+    à área das vagas sintéticas, para que a proporção de vagas ocupadas (e
+    portanto o custo da cor dominante) seja a mesma em qualquer escala.
+    """
+    bg = scene.background
+    area = _mean_area(scene.rects)
+
+    rect = ParkingDetector(scene.rects, profiler=profiler)
+    rect.occupancy_threshold = 0.2 * area
+    improved = ImprovedParkingDetector(scene.rects, profiler=profiler)
+    improved.min_pixel_threshold = 0.3 * area
+    polygon = PolygonParkingDetector(scene.polygons, profiler=profiler)
+
+    rect_detections = [rect.detect(frame, bg) for frame in scene.frames]
+    polygon_detections = [polygon.detect(frame, bg) for frame in scene.frames]
+    car_images = [scene.frames[n][y:y+h, x:x+w]
+                  for n, idx in zip(*np.nonzero(scene.occupancy))
+                  for x, y, w, h in [scene.rects[idx]]][:32]
+
+    return {
+        "rect.detect": (lambda frame: rect.detect(frame, bg), scene.frames),
+        "improved.detect": (lambda frame: improved.detect(frame, bg), scene.frames),
+        "polygon.detect": (lambda frame: polygon.detect(frame, bg), scene.frames),
+        # O retangular desenha no próprio frame: a cópia entra na medição, como nos outros
+        "rect.draw_annotations": (lambda item: rect.draw_annotations(item[0].copy(), item[1]),
+                                  list(zip(scene.frames, rect_detections))),
+        "polygon.draw_annotations": (lambda item: polygon.draw_annotations(*item),
+                                     list(zip(scene.frames, polygon_detections))),
+        "get_dominant_color": (get_dominant_color, car_images or [scene.frames[0]]),
+    }
+
+
+def result_key(name: str, resolution: str, spots: int) -> str:
+    return f"{name}@{resolution}/{spots}"
+
+
+def run_suite(spot_counts=(4, 50, 500, 2000), resolutions=("480p", "1080p", "4k"),
+              functions=FUNCTIONS, repeat: int = 30, max_seconds: float = 2.0,
+              memory: bool = True, stages: bool = False, seed: int = 0, log=None) -> dict:
+    """
+    Mede as funções em todas as combinações de resolução e quantidade de vagas.
+
+    Parâmetros:
+        spot_counts: Quantidades de vagas.
+        resolutions: Nomes em RESOLUTIONS.
+        functions: Subconjunto de FUNCTIONS.
+        repeat: Medições por função (no máximo).
+        max_seconds: Tempo máximo por função.
+        memory: Mede o pico de memória (uma chamada extra com tracemalloc).
+        stages: Mede também as etapas internas dos detectores (StageProfiler);
+                o custo da instrumentação entra nos tempos.
+        seed: Semente das cenas.
+        log: Função chamada com uma linha de texto por resultado (opcional).
+
+    Retorna:
+        {"meta": {...}, "results": {chave: {...}}}, pronto para JSON.
+    """
+    results = {}
+    for resolution in resolutions:
+        for spots in spot_counts:
+            scene = synthetic_scene(spots, resolution, seed=seed)
+            profiler = StageProfiler() if stages else None
+            cases = benchmark_cases(scene, profiler)
+            for name in functions:
+                fn, inputs = cases[name]
+                if profiler is not None:
+                    profiler.stages.clear()
+                samples = time_function(fn, inputs, repeat, max_seconds=max_seconds)
+                p50, p95, p99 = np.percentile(samples, (50, 95, 99)) * 1000
+                mean = float(samples.mean())
+                entry = {
+                    "name": name, "resolution": resolution, "spots": spots,
+                    "samples": len(samples), "fps": 1 / mean if mean > 0 else 0.0,
+                    "mean_ms": mean * 1000, "p50_ms": float(p50), "p95_ms": float(p95),
+                    "p99_ms": float(p99),
+                }
+                if memory:
+                    entry["peak_memory_mb"] = peak_memory(fn, inputs[0])
+                if profiler is not None:
+                    entry["stages_p50_ms"] = {stage: row["p50"] for stage, row
+                                              in profiler.report()["stages"].items()}
+                key = result_key(name, resolution, spots)
+                results[key] = entry
+                if log is not None:
+                    log(f"{key:<40} {entry['p50_ms']:9.3f} ms p50 {entry['p95_ms']:9.3f} ms p95 "
+                        f"{entry['fps']:9.1f} /s")
+    return {"meta": environment(), "results": results}
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "threads": cv2.getNumThreads(),
+    }
+
+
+class Comparison(NamedTuple):
+    key: str
+    baseline_ms: float
+    current_ms: float
+    ratio: float
+    regressed: bool
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.25, metric: str = "p50_ms",
+            min_delta_ms: float = 0.05) -> list:
+    """
+    Compara dois resultados de `run_suite` nas chaves em comum.
+
+    Uma medição regrediu quando ficou mais de `tolerance` (fração) acima da
+    referência e a diferença absoluta passa de `min_delta_ms` (evita ruído
+    em funções muito rápidas).
+
+    Retorna:
+        Lista de Comparison, da maior para a menor razão atual/referência.
+    """
+    rows = []
+    for key, entry in current["results"].items():
+        reference = baseline["results"].get(key)
+        if reference is None:
+            continue
+        base, now = reference[metric], entry[metric]
+        ratio = now / base if base > 0 else float("inf")
+        regressed = now > base * (1 + tolerance) and now - base > min_delta_ms
+        rows.append(Comparison(key, base, now, ratio, regressed))
+    return sorted(rows, key=lambda row: -row.ratio)
+
+
+def save_results(path: str, results: dict):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
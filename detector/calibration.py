@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from detector.background_utils import background_key
+from detector.capture import PREFETCH, ThreadedCapture
+
+
+def spot_differences(frame: np.ndarray, background, spots: list) -> np.ndarray:
+    """
+    Pixels diferentes do fundo em cada vaga (após o filtro de mediana).
+
+    O frame é convertido para cinza uma única vez para todas as vagas.
+
+    Parâmetros:
+        frame: Frame BGR.
+        background: BackgroundModel do detector (ROIs do fundo já filtradas).
+        spots: Lista de vagas (x, y, w, h).
+
+    Retorna:
+        Array com a contagem de pixels diferentes por vaga.
+    """
+    frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    counts = np.zeros(len(spots), dtype=np.int64)
+    for idx, (x, y, w, h) in enumerate(spots):
+        roi = frame_gray[y:y+h, x:x+w]
+        if roi.size == 0:
+            continue
+        roi_frame = cv2.medianBlur(roi, 5)
+        counts[idx] = cv2.countNonZero(cv2.absdiff(background.rois[idx], roi_frame))
+    return counts
+
+
+class SampleReservoir:
+    """
+    Amostra uniforme de tamanho fixo das medições por frame (reservoir sampling).
+
+    Cada linha guarda as medições de todas as vagas em um frame, de modo que
+    a memória não depende da duração do vídeo e os percentis por vaga são
+    estimados sobre uma amostra uniforme de todos os frames vistos.
+    """
+
+    def __init__(self, size: int, num_spots: int, seed: int = 0):
+        self.size = size
+        self.samples = np.zeros((size, num_spots), dtype=np.int64)
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, values: np.ndarray):
+        if self.seen < self.size:
+            self.samples[self.seen] = values
+        else:
+            slot = self._rng.integers(0, self.seen + 1)
+            if slot < self.size:
+                self.samples[slot] = values
+        self.seen += 1
+
+    @property
+    def filled(self) -> np.ndarray:
+        return self.samples[:min(self.seen, self.size)]
+
+    def percentile(self, q: float) -> np.ndarray:
+        """
+        Percentil `q` de cada vaga sobre a amostra.
+        """
+        return np.percentile(self.filled, q, axis=0)
+
+
+def iter_video_frames(source, stride: int = 1):
+    """
+    Gera os frames de um vídeo (caminho ou índice) sem perder nenhum, com passo opcional.
+    """
+    with ThreadedCapture(source, policy=PREFETCH, stride=stride) as capture:
+        if not capture.isOpened():
+            raise IOError(f"Não foi possível abrir o vídeo: {source}")
+        while True:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            yield frame
+
+
+def collect_differences(frames, background, spots: list, reservoir_size: int = 2048,
+                        workers: int = 0, seed: int = 0) -> SampleReservoir:
+    """
+    Mede todos os frames de `frames` e guarda uma amostra limitada das medições.
+
+    Parâmetros:
+        frames: Iterável de frames BGR ou caminho/índice de vídeo.
+        background: BackgroundModel do detector.
+        spots: Lista de vagas (x, y, w, h).
+        reservoir_size: Quantidade máxima de frames guardados na amostra.
+        workers: Threads para medir os frames em paralelo (0: na thread atual).
+                 O OpenCV libera o GIL, então threads bastam.
+        seed: Semente da amostragem.
+    """
+    if isinstance(frames, (str, int)):
+        frames = iter_video_frames(frames)
+
+    reservoir = SampleReservoir(reservoir_size, len(spots), seed)
+    if workers <= 0:
+        for frame in frames:
+            reservoir.add(spot_differences(frame, background, spots))
+        return reservoir
+
+    # Mantém no máximo 2 frames por thread em processamento (memória limitada)
+    with ThreadPoolExecutor(workers) as pool:
+        pending = []
+        for frame in frames:
+            pending.append(pool.submit(spot_differences, frame, background, spots))
+            if len(pending) >= 2 * workers:
+                reservoir.add(pending.pop(0).result())
+        for future in pending:
+            reservoir.add(future.result())
+    return reservoir
+
+
+def calibration_key(spots: list, bg_frame: np.ndarray) -> str:
+    """
+    Chave dos thresholds: hash do layout e hash do conteúdo do fundo.
+    """
+    layout = json.dumps([list(map(int, spot)) for spot in spots])
+    layout_hash = hashlib.blake2b(layout.encode(), digest_size=8).hexdigest()
+    return f"{layout_hash}-{background_key(bg_frame)[2]}"
+
+
+def _read_thresholds_file(path: str) -> dict:
+    """
+    Conteúdo do arquivo de thresholds; um arquivo ausente, truncado ou
+    inválido conta como vazio (a calibração roda de novo e o regrava).
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return {}
+    return stored if isinstance(stored, dict) else {}
+
+
+def load_thresholds(path: str, key: str) -> dict:
+    """
+    Lê os thresholds salvos para `key` (None se não houver ou se o arquivo
+    estiver corrompido).
+    """
+    entry = _read_thresholds_file(path).get(key)
+    if entry is None:
+        return None
+    return {int(idx): float(value) for idx, value in entry.items()}
+
+
+def save_thresholds(path: str, key: str, thresholds: dict):
+    """
+    Salva os thresholds em `path` (JSON), preservando as outras chaves.
+
+    A escrita é atômica: um arquivo temporário substitui o anterior.
+    """
+    stored = _read_thresholds_file(path)
+    stored[key] = {str(idx): float(value) for idx, value in thresholds.items()}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stored, f, indent=2)
+    os.replace(tmp_path, path)
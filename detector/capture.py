@@ -0,0 +1,236 @@
+import queue
+import threading
+import time
+import cv2
+
+# Políticas da fila de captura
+PREFETCH = "prefetch"   # sem perdas: a leitura espera quando a fila está cheia
+LATEST = "latest"       # tempo real: descarta o frame mais antigo quando cheia
+
+_END = object()
+
+
+def stride_for_rate(fps: float, sample_hz: float) -> int:
+    """
+    Passo entre frames analisados para amostrar a `sample_hz` um vídeo a `fps`.
+    """
+    if not sample_hz or sample_hz <= 0 or not fps or fps <= 0:
+        return 1
+    return max(1, int(round(fps / sample_hz)))
+
+
+def default_policy(source) -> str:
+    """
+    Escolhe a política pela origem: câmeras e streams usam LATEST, arquivos PREFETCH.
+    """
+    if isinstance(source, int):
+        return LATEST
+    if isinstance(source, str) and source.split("://")[0].lower() in ("rtsp", "rtmp", "http", "https", "udp"):
+        return LATEST
+    return PREFETCH
+
+
+class ThreadedCapture:
+    """
+    Decodifica frames de um `cv2.VideoCapture` em uma thread separada.
+
+    Os frames vão para uma fila limitada, de forma que a decodificação
+    (`cap.read()`) acontece em paralelo com a detecção. `read()` tem a mesma
+    assinatura de `cv2.VideoCapture.read()`.
+    """
+
+    def __init__(self, source, policy: str = None, queue_size: int = 8, loop: bool = False,
+                 stride: int = 1, sample_hz: float = None):
+        """
+        Parâmetros:
+            source: Caminho/URL/índice da câmera ou um `cv2.VideoCapture` já aberto.
+            policy: PREFETCH ou LATEST. Padrão: conforme a origem (`default_policy`).
+            queue_size: Quantidade máxima de frames decodificados na fila.
+            loop: Se True, volta ao início do vídeo ao chegar no fim.
+            stride: Entrega apenas um a cada `stride` frames. Os demais são
+                    pulados com `cap.grab()`, sem decodificação completa.
+            sample_hz: Alternativa a `stride`: taxa desejada em frames por
+                       segundo, convertida em passo pelo FPS da origem.
+        """
+        if isinstance(source, cv2.VideoCapture):
+            self.cap = source
+            policy = policy or PREFETCH
+        else:
+            self.cap = cv2.VideoCapture(source)
+            policy = policy or default_policy(source)
+        if policy not in (PREFETCH, LATEST):
+            raise ValueError(f"Política de captura inválida: {policy}")
+
+        self.policy = policy
+        self.loop = loop
+        if sample_hz:
+            stride = stride_for_rate(self.cap.get(cv2.CAP_PROP_FPS), sample_hz)
+        self.stride = max(1, int(stride))
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+
+        # Contadores
+        self.frames_read = 0
+        self.frames_skipped = 0
+        self.dropped_frames = 0
+
+        # Informações do último frame entregue por read()
+        self.frame_number = 0
+        self.capture_time = None
+        # True depois que read() chega ao fim (distingue do timeout)
+        self.ended = False
+
+        self._position = 0
+        self._stop = threading.Event()
+        self._restart = threading.Event()
+        self._thread = None
+        # Protege a decisão "fim do vídeo" x `restart`: a thread só sai
+        # (marcando `_finishing`) se nenhum restart estiver pendente
+        self._lock = threading.Lock()
+        self._finishing = False
+
+    def isOpened(self) -> bool:
+        return self.cap.isOpened()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Quantidade de frames decodificados aguardando na fila.
+        """
+        return self.queue.qsize()
+
+    def start(self):
+        """
+        Inicia a thread de captura.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ThreadedCapture", daemon=True)
+            self._thread.start()
+        return self
+
+    def _drain(self):
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _put(self, item):
+        if self.policy == LATEST:
+            while not self._stop.is_set():
+                try:
+                    self.queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.dropped_frames += 1
+                    except queue.Empty:
+                        pass
+        else:
+            while not self._stop.is_set():
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    if self._restart.is_set():
+                        return
+
+    def _run(self):
+        empty_passes = 0
+        while not self._stop.is_set():
+            if self._restart.is_set():
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                self._position = 0
+                self._drain()
+                self._restart.clear()
+
+            # Frames fora do passo: apenas grab(), sem retrieve()
+            if self.stride > 1 and self._position % self.stride != 0:
+                ret = self.cap.grab()
+                frame = None
+                if ret:
+                    self._position += 1
+                    self.frames_skipped += 1
+                    continue
+            else:
+                ret, frame = self.cap.read()
+            if not ret:
+                # Evita laço infinito em vídeos que não retornam nenhum frame
+                if self.loop and empty_passes == 0 and self._position > 0:
+                    empty_passes += 1
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    self._position = 0
+                    continue
+                with self._lock:
+                    if self._restart.is_set():
+                        # restart() chegou junto com o fim: volta ao início
+                        continue
+                    self._finishing = True
+                self._put(_END)
+                return
+
+            empty_passes = 0
+            self._position += 1
+            self.frames_read += 1
+            self._put((self._position, time.perf_counter(), frame))
+
+    def read(self, timeout: float = None):
+        """
+        Retorna o próximo frame da fila como (ret, frame).
+
+        Com `timeout`, retorna (False, None) se nenhum frame chegar a tempo.
+        """
+        self.start()
+        try:
+            item = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return False, None
+
+        if item is _END:
+            # Mantém o marcador de fim para as próximas leituras
+            self.queue.put(_END)
+            self.ended = True
+            return False, None
+
+        self.frame_number, self.capture_time, frame = item
+        return True, frame
+
+    def restart(self):
+        """
+        Volta ao início do vídeo, descartando os frames já enfileirados.
+        """
+        self._restart.set()
+        self._drain()
+        with self._lock:
+            if self._thread is not None and self._finishing:
+                # A thread já decidiu terminar (fim do vídeo): espera ela
+                # enfileirar o fim e sair, descarta o marcador e inicia outra
+                self._thread.join()
+                self._thread = None
+                self._finishing = False
+                self._drain()
+                self.start()
+        self.ended = False
+
+    def stop(self):
+        """
+        Para a thread de captura.
+        """
+        self._stop.set()
+        self._drain()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def release(self):
+        """
+        Para a thread e libera o `cv2.VideoCapture`.
+        """
+        self.stop()
+        self.cap.release()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.release()
@@ -1,14 +1,27 @@
+from functools import partial
 import cv2
 import numpy as np
 
 
-def get_dominant_color(image: np.ndarray, k: int=3):
+class KMeansStats:
+    """
+    Chamadas ao k-means de um detector ou cache de cores (lidas pelas métricas).
+    """
+
+    def __init__(self):
+        # Contadores
+        self.full = 0
+        self.fast = 0
+
+
+def get_dominant_color(image: np.ndarray, k: int=3, stats: KMeansStats = None):
     """
     Retorna a cor dominante no ROI pelo método de k-means.
 
     Parâmetros:
         image: Imagem do ROI onde a cor será extraída.
         k: Número de clusters para o k-means (padrão é 3).
+        stats: `KMeansStats` opcional onde a chamada é contada.
 
     Retorna:
         Tupla com a cor dominante em formato RGB.
@@ -18,6 +31,8 @@ def get_dominant_color(image: np.ndarray, k: int=3):
     data = np.float32(data)
 
     # critérios e execução do k-means
+    if stats is not None:
+        stats.full += 1
     criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
     _, labels, centers = cv2.kmeans(
         data, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
@@ -26,3 +41,162 @@ def get_dominant_color(image: np.ndarray, k: int=3):
     # seleciona a cor mais frequente
     dominant = centers[np.argmax(counts)]
     return tuple(map(int, dominant))
+
+
+def _kmeans_pp_labels(data: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Rótulos iniciais (N, 1) a partir de centros sorteados por k-means++ com `rng`.
+    """
+    chosen = [int(rng.integers(len(data)))]
+    diff = data - data[chosen[0]]
+    distances = np.einsum("ij,ij->i", diff, diff)
+    for _ in range(1, k):
+        # Sorteio proporcional ao quadrado da distância ao centro mais próximo
+        cumulative = np.cumsum(distances)
+        if cumulative[-1] > 0:
+            choice = int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side="right"))
+            choice = min(choice, len(data) - 1)
+        else:
+            choice = int(rng.integers(len(data)))
+        chosen.append(choice)
+        diff = data - data[choice]
+        distances = np.minimum(distances, np.einsum("ij,ij->i", diff, diff))
+    centers = data[chosen]
+    # Distância ao quadrado a menos de |x|², que não muda o centro mais próximo
+    scores = (centers * centers).sum(axis=1) - 2 * data @ centers.T
+    return scores.argmin(axis=1).astype(np.int32).reshape(-1, 1)
+
+
+def get_dominant_color_fast(image: np.ndarray, mask: np.ndarray = None, k: int = 3,
+                            max_samples: int = 1024, seed: int = 0, stats: KMeansStats = None):
+    """
+    Versão rápida e determinística de `get_dominant_color`.
+
+    Roda o mesmo k-means sobre uma amostra aleatória (semente fixa) de no
+    máximo `max_samples` pixels, com centros iniciais k-means++ e 3
+    tentativas em vez de 10. A inicialização usa um gerador numpy local:
+    o gerador global do OpenCV (usado por `get_dominant_color`) não é tocado.
+    Tolerância em relação a `get_dominant_color`: em ROIs com um cluster
+    claramente maior (o carro), a cor difere em no máximo ~2 níveis por
+    canal; quando dois clusters têm tamanhos parecidos,
+    qualquer um dos dois pode ser escolhido, como já acontece entre
+    execuções do k-means original.
+
+    Parâmetros:
+        image: Imagem do ROI onde a cor será extraída.
+        mask: Máscara opcional (mesmo tamanho do ROI); só pixels > 0 são usados.
+        k: Número de clusters para o k-means (padrão é 3).
+        max_samples: Quantidade máxima de pixels usados.
+        seed: Semente da amostragem e da inicialização.
+        stats: `KMeansStats` opcional onde a chamada é contada.
+
+    Retorna:
+        Tupla com a cor dominante, ou None se não houver pixels.
+    """
+    if mask is not None:
+        pixels = image[mask > 0]
+    else:
+        pixels = image.reshape((-1, image.shape[-1]))
+    if len(pixels) == 0:
+        return None
+    rng = np.random.default_rng(seed)
+    if len(pixels) > max_samples:
+        pixels = pixels[rng.choice(len(pixels), max_samples, replace=False)]
+    data = np.float32(pixels)
+    k = min(k, len(data))
+
+    if stats is not None:
+        stats.fast += 1
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
+    best = None
+    for _ in range(3):
+        initial = _kmeans_pp_labels(data, k, rng)
+        compactness, labels, centers = cv2.kmeans(data, k, initial, criteria, 1,
+                                                  cv2.KMEANS_USE_INITIAL_LABELS)
+        if best is None or compactness < best[0]:
+            best = (compactness, labels, centers)
+    _, labels, centers = best
+    counts = np.bincount(labels.flatten(), minlength=k)
+
+    dominant = centers[np.argmax(counts)]
+    return tuple(map(int, dominant))
+
+
+def get_mean_color(image: np.ndarray, mask: np.ndarray = None):
+    """
+    Cor média do ROI (só pixels com máscara > 0), ou None se não houver pixels.
+    """
+    pixels = image[mask > 0] if mask is not None else image.reshape((-1, image.shape[-1]))
+    if len(pixels) == 0:
+        return None
+    return tuple(map(int, np.mean(pixels, axis=0)))
+
+
+class SpotColorCache:
+    """
+    Guarda a cor de cada vaga durante um episódio de ocupação.
+
+    A cor é calculada quando a vaga passa a ficar ocupada e reaproveitada até
+    ela ficar livre de novo. Com `refresh_interval`, é recalculada a cada N
+    frames ocupados (ex.: troca de carro sem a vaga ficar livre no meio).
+    """
+
+    def __init__(self, refresh_interval: int = None, engine=None):
+        """
+        Parâmetros:
+            refresh_interval: Recalcula a cor a cada N frames ocupados (None: nunca).
+            engine: Função `engine(imagem, mascara)` que calcula a cor.
+                    Padrão: `get_dominant_color_fast`, contada em `kmeans_stats`.
+        """
+        self.refresh_interval = refresh_interval
+        self.kmeans_stats = KMeansStats()
+        self.engine = engine or partial(get_dominant_color_fast, stats=self.kmeans_stats)
+        self._colors = {}
+
+        # Contadores
+        self.computed = 0
+        self.reused = 0
+
+    def update(self, idx: int, occupied: bool, image: np.ndarray, mask: np.ndarray = None,
+               engine=None):
+        """
+        Retorna a cor da vaga `idx` neste frame (None se livre).
+
+        `engine` substitui, nesta chamada, a função configurada no construtor
+        (ex.: detectores cuja cor não é a dominante).
+        """
+        if not occupied:
+            self._colors.pop(idx, None)
+            return None
+
+        entry = self._colors.get(idx)
+        if entry is not None:
+            color, age = entry
+            if self.refresh_interval is None or age < self.refresh_interval:
+                self._colors[idx] = (color, age + 1)
+                self.reused += 1
+                return color
+
+        color = (engine or self.engine)(image, mask)
+        self._colors[idx] = (color, 1)
+        self.computed += 1
+        return color
+
+    def advance(self, idx: int, occupied: bool):
+        """
+        Conta um frame da vaga `idx` cujo resultado foi reaproveitado sem
+        calcular a cor (ex.: `SpotChangeGate`), para que `refresh_interval`
+        continue contando todos os frames ocupados.
+        """
+        if not occupied:
+            self._colors.pop(idx, None)
+            return
+        entry = self._colors.get(idx)
+        if entry is not None:
+            self._colors[idx] = (entry[0], entry[1] + 1)
+
+    def reset(self):
+        """
+        Esquece todas as cores guardadas.
+        """
+        self._colors.clear()
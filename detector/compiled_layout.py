@@ -0,0 +1,161 @@
+import cv2
+import numpy as np
+
+
+class CompiledLayout:
+    """
+    Layout de vagas rasterizado uma única vez em índices planos de pixels.
+
+    Os pixels de cada vaga (na união das vagas) são guardados como índices
+    planos, concatenados vaga a vaga. Vagas sobrepostas simplesmente repetem
+    os pixels em comum, então cada uma continua contando toda a sua área.
+    Contagens e somas por vaga saem de um `np.add.reduceat` sobre esses
+    índices, sem laço em Python sobre as vagas.
+    """
+
+    def __init__(self, masks: dict, bounding_boxes: dict, frame_shape: tuple):
+        """
+        Parâmetros:
+            masks: Máscara de cada vaga (não zero = dentro), no tamanho da sua ROI.
+            bounding_boxes: (x, y, w, h) de cada vaga.
+            frame_shape: Forma dos frames que serão analisados.
+        """
+        self.num_spots = len(masks)
+        self.frame_shape = tuple(frame_shape[:2])
+
+        # Retângulo que contém todas as vagas
+        boxes = []
+        for idx in range(self.num_spots):
+            x, y, _, _ = bounding_boxes[idx]
+            mh, mw = masks[idx].shape[:2]
+            if mh and mw:
+                boxes.append((x, y, x + mw, y + mh))
+        if boxes:
+            x0 = min(b[0] for b in boxes)
+            y0 = min(b[1] for b in boxes)
+            x1 = max(b[2] for b in boxes)
+            y1 = max(b[3] for b in boxes)
+        else:
+            x0 = y0 = x1 = y1 = 0
+        self.union = (x0, y0, x1 - x0, y1 - y0)
+        union_w = x1 - x0
+
+        indices = []
+        mask_pixels = []
+        for idx in range(self.num_spots):
+            x, y, _, _ = bounding_boxes[idx]
+            rows, cols = np.nonzero(masks[idx])
+            indices.append((rows + (y - y0)) * union_w + (cols + (x - x0)))
+            mask_pixels.append(len(rows))
+
+        self.mask_pixels = np.array(mask_pixels, dtype=np.int64)
+        self.pixel_index = (np.concatenate(indices) if indices else np.zeros(0)).astype(np.intp)
+        self._index_spots()
+
+    @classmethod
+    def from_arrays(cls, pixel_index: np.ndarray, mask_pixels: np.ndarray, union: tuple,
+                    frame_shape: tuple) -> "CompiledLayout":
+        """
+        Reconstrói um layout já compilado (ex.: arrays mapeados de um `LayoutCache`).
+        """
+        layout = cls.__new__(cls)
+        layout.num_spots = len(mask_pixels)
+        layout.frame_shape = tuple(frame_shape[:2])
+        layout.union = tuple(union)
+        layout.mask_pixels = np.asarray(mask_pixels, dtype=np.int64)
+        layout.pixel_index = np.asarray(pixel_index, dtype=np.intp)
+        layout._index_spots()
+        return layout
+
+    def _index_spots(self):
+        # Início de cada vaga não vazia em pixel_index (reduceat não aceita
+        # segmentos vazios)
+        offsets = np.concatenate([[0], np.cumsum(self.mask_pixels)[:-1]]).astype(np.intp)
+        self._valid = self.mask_pixels > 0
+        self._starts = offsets[self._valid]
+
+    def label_map(self) -> np.ndarray:
+        """
+        Retorna o mapa de rótulos da união (idx + 1 por vaga, 0 fora das vagas).
+
+        Em pixels sobrepostos prevalece a vaga de maior índice.
+        """
+        _, _, w, h = self.union
+        labels = np.zeros(h * w, dtype=np.int32)
+        spot_ids = np.repeat(np.arange(1, self.num_spots + 1, dtype=np.int32), self.mask_pixels)
+        labels[self.pixel_index] = spot_ids
+        return labels.reshape(h, w)
+
+    def crop(self, image: np.ndarray) -> np.ndarray:
+        """
+        Recorta a imagem na união das vagas.
+        """
+        x, y, w, h = self.union
+        return image[y:y+h, x:x+w]
+
+    def _per_spot_sum(self, planes: np.ndarray) -> np.ndarray:
+        """
+        Soma planos com a forma da união, por vaga.
+
+        Aceita um plano (h, w) -> (vagas,) ou um bloco (N, h, w) -> (N, vagas).
+        """
+        single = planes.ndim == 2
+        if single:
+            planes = planes[None]
+        totals = np.zeros((len(planes), self.num_spots), dtype=np.int64)
+        if len(self._starts):
+            # Uma redução plana por frame é bem mais rápida que reduceat em 2D;
+            # uint32 comporta vagas de até ~16 milhões de pixels
+            for row, plane in zip(totals, planes):
+                values = np.take(plane.ravel(), self.pixel_index)
+                row[self._valid] = np.add.reduceat(values, self._starts, dtype=np.uint32)
+        return totals[0] if single else totals
+
+    def changed_counts(self, frame_gray: np.ndarray, bg_gray: np.ndarray) -> np.ndarray:
+        """
+        Conta, por vaga, os pixels em que o frame (ou cada frame de um bloco
+        (N, H, W)) difere do fundo.
+        """
+        x, y, w, h = self.union
+        changed = frame_gray[..., y:y+h, x:x+w] != self.crop(bg_gray)
+        return self._per_spot_sum(changed)
+
+    def occupancy(self, frame_gray: np.ndarray, bg_gray: np.ndarray, threshold: float) -> np.ndarray:
+        """
+        Retorna a ocupação booleana (fração de pixels alterados >= threshold),
+        com forma (vagas,) ou (N, vagas) para um bloco de frames.
+        """
+        changed = self.changed_counts(frame_gray, bg_gray)
+        occupied = np.zeros(changed.shape, dtype=bool)
+        valid = self._valid
+        occupied[..., valid] = (changed[..., valid] / self.mask_pixels[valid]) >= threshold
+        return occupied
+
+    def mean_colors(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Retorna a cor média (por canal) de cada vaga, com forma (vagas, canais).
+        """
+        region = self.crop(frame)
+        planes = cv2.split(region) if region.ndim == 3 else [region]
+        means = np.zeros((self.num_spots, len(planes)), dtype=np.float64)
+        valid = self._valid
+        for c, plane in enumerate(planes):
+            sums = self._per_spot_sum(plane)
+            means[valid, c] = sums[valid] / self.mask_pixels[valid]
+        return means
+
+    def mean_colors_batch(self, stack: np.ndarray) -> np.ndarray:
+        """
+        Cor média de cada vaga em cada frame de um bloco (N, H, W, canais).
+
+        Retorna um array com forma (N, vagas, canais).
+        """
+        x, y, w, h = self.union
+        region = stack[:, y:y+h, x:x+w]
+        means = np.zeros((len(stack), self.num_spots, region.shape[3]), dtype=np.float64)
+        valid = self._valid
+        for frame_idx, frame_region in enumerate(region):
+            for c, plane in enumerate(cv2.split(frame_region)):
+                sums = self._per_spot_sum(plane)
+                means[frame_idx, valid, c] = sums[valid] / self.mask_pixels[valid]
+        return means
@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+
+
+def _clip_box(box: tuple, frame_shape: tuple) -> tuple:
+    x, y, w, h = box
+    height, width = frame_shape[:2]
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(width, x + w), min(height, y + h)
+    return (x0, y0, max(0, x1 - x0), max(0, y1 - y0))
+
+
+def spot_crops(boxes: list, frame_shape: tuple, max_waste: float = 0.5) -> list:
+    """
+    Agrupa as bounding boxes das vagas em poucos recortes retangulares.
+
+    Começa com um recorte por vaga e junta, repetidamente, o par cujo
+    retângulo combinado desperdiça menos área, enquanto a área extra for no
+    máximo `max_waste` vezes a área dos dois recortes. Layouts compactos
+    viram um único recorte (a união); layouts espalhados, alguns recortes
+    disjuntos.
+
+    Parâmetros:
+        boxes: Bounding boxes (x, y, w, h) das vagas.
+        frame_shape: Forma do frame (os recortes são limitados a ele).
+        max_waste: Fração de área extra tolerada em cada junção.
+
+    Retorna:
+        Lista de recortes (x, y, w, h) que cobrem todas as vagas.
+    """
+    crops = [_clip_box(box, frame_shape) for box in boxes]
+    # (x0, y0, x1, y1) de cada recorte não vazio
+    rects = np.array([(x, y, x + w, y + h) for x, y, w, h in crops if w > 0 and h > 0],
+                     dtype=np.int64).reshape(-1, 4)
+
+    while len(rects) > 1:
+        x0 = np.minimum.outer(rects[:, 0], rects[:, 0])
+        y0 = np.minimum.outer(rects[:, 1], rects[:, 1])
+        x1 = np.maximum.outer(rects[:, 2], rects[:, 2])
+        y1 = np.maximum.outer(rects[:, 3], rects[:, 3])
+        areas = (rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1])
+        pair_area = areas[:, None] + areas[None, :]
+        waste = ((x1 - x0) * (y1 - y0) - pair_area).astype(np.float64)
+        waste[np.tril_indices(len(rects))] = np.inf
+        waste[waste > max_waste * pair_area] = np.inf
+
+        i, j = np.unravel_index(np.argmin(waste), waste.shape)
+        if not np.isfinite(waste[i, j]):
+            break
+        merged = (x0[i, j], y0[i, j], x1[i, j], y1[i, j])
+        rects = np.vstack([np.delete(rects, (i, j), axis=0), merged])
+
+    return [(int(x0), int(y0), int(x1 - x0), int(y1 - y0)) for x0, y0, x1, y1 in rects]
+
+
+class CroppedGray:
+    """
+    Conversão para cinza restrita à região das vagas.
+
+    Os recortes são calculados uma vez por resolução. `convert` escreve o
+    cinza de cada recorte em um buffer do tamanho do frame, reaproveitado
+    entre chamadas; as coordenadas das vagas continuam as mesmas e os pixels
+    fora dos recortes não são definidos (nenhuma vaga os lê).
+    """
+
+    def __init__(self, boxes: list, max_waste: float = 0.5):
+        """
+        Parâmetros:
+            boxes: Bounding boxes (x, y, w, h) das vagas.
+            max_waste: Ver `spot_crops`.
+        """
+        self.boxes = [tuple(int(v) for v in box) for box in boxes]
+        self.max_waste = max_waste
+        self.crops = None
+        self._shape = None
+        self._buffer = None
+
+    def crops_for(self, frame_shape: tuple) -> list:
+        shape = tuple(frame_shape[:2])
+        if shape != self._shape:
+            self.crops = spot_crops(self.boxes, shape, self.max_waste)
+            self._buffer = np.empty(shape, dtype=np.uint8)
+            self._shape = shape
+        return self.crops
+
+    def preload(self, frame_shape: tuple, crops: list):
+        """
+        Usa recortes já calculados (ex.: de um `LayoutCache`) para a resolução dada.
+        """
+        shape = tuple(frame_shape[:2])
+        self.crops = list(crops)
+        self._buffer = np.empty(shape, dtype=np.uint8)
+        self._shape = shape
+
+    def convert(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Retorna o frame em cinza, válido apenas dentro dos recortes.
+
+        O array retornado é sobrescrito na próxima chamada.
+        """
+        crops = self.crops_for(frame.shape)
+        gray = self._buffer
+        for x, y, w, h in crops:
+            cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY, dst=gray[y:y+h, x:x+w])
+        return gray
+
+    @property
+    def coverage(self) -> float:
+        """
+        Fração do frame convertida (após a primeira chamada).
+        """
+        if self._shape is None:
+            return 1.0
+        area = sum(w * h for _, _, w, h in self.crops)
+        return area / (self._shape[0] * self._shape[1])
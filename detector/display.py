@@ -0,0 +1,229 @@
+import threading
+import time
+from typing import NamedTuple
+import cv2
+import numpy as np
+
+
+class DetectionResult(NamedTuple):
+    """
+    Resultado publicado pela detecção: `seq` cresce a cada frame analisado.
+    """
+    seq: int
+    frame: np.ndarray
+    detections: list
+    frame_number: int
+    capture_time: float
+
+
+class LatestResult:
+    """
+    Último resultado da detecção, compartilhado com a exibição.
+
+    A publicação troca uma única referência (atômica no CPython): quem lê
+    recebe sempre um resultado completo, sem locks, e resultados
+    intermediários que ninguém chegou a ver são simplesmente substituídos.
+    """
+
+    def __init__(self):
+        self._result = None
+        self._seq = 0
+
+    def publish(self, frame: np.ndarray, detections: list, frame_number: int = 0,
+                capture_time: float = None) -> DetectionResult:
+        self._seq += 1
+        result = DetectionResult(self._seq, frame, detections, frame_number, capture_time)
+        self._result = result
+        return result
+
+    def get(self) -> DetectionResult:
+        """
+        Resultado mais recente (None antes do primeiro frame).
+        """
+        return self._result
+
+
+class DetectionWorker:
+    """
+    Lê e analisa frames em uma thread própria, independente da exibição.
+
+    Cada frame é lido uma única vez de um `ThreadedCapture` e analisado uma
+    única vez; o resultado vai para um `LatestResult`. Pausado, o worker não
+    lê nem analisa nada (o frame não muda, então o resultado também não).
+    """
+
+    def __init__(self, capture, detector, bg_frame: np.ndarray = None, latest: LatestResult = None,
+                 fps: float = None, profiler=None):
+        """
+        Parâmetros:
+            capture: `ThreadedCapture` de onde os frames são lidos.
+            detector: Detector usado em cada frame.
+            bg_frame: Frame de fundo repassado a `detect`.
+            latest: Onde os resultados são publicados. Padrão: um novo `LatestResult`.
+            fps: Taxa máxima de análise (None ou 0: o mais rápido possível).
+            profiler: `StageProfiler` opcional; mede `read`, `detect` e a latência.
+        """
+        self.capture = capture
+        self.detector = detector
+        self.bg_frame = bg_frame
+        self.latest = latest if latest is not None else LatestResult()
+        self.period = 1.0 / fps if fps else 0.0
+        self.profiler = profiler
+        self.finished = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Contadores
+        self.frames = 0
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def toggle_pause(self) -> bool:
+        """
+        Alterna entre pausado e executando; retorna True se ficou pausado.
+        """
+        if self.paused:
+            self.resume()
+        else:
+            self.pause()
+        return self.paused
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="DetectionWorker", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        prof = self.profiler
+        next_time = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                if not self._running.wait(0.1):
+                    continue
+                if self.period:
+                    delay = next_time - time.perf_counter()
+                    if delay > 0 and self._stop.wait(delay):
+                        break
+                    next_time = max(next_time + self.period, time.perf_counter())
+
+                if prof is not None:
+                    t = time.perf_counter()
+                ret, frame = self.capture.read(timeout=0.1)
+                if not ret:
+                    if self.capture.ended:
+                        break
+                    continue
+                if prof is not None:
+                    t = prof.lap("read", t)
+                detections = self.detector.detect(frame, self.bg_frame)
+                if prof is not None:
+                    prof.lap("detect", t)
+                    prof.frame_done(self.capture.capture_time)
+                self.latest.publish(frame, detections, self.capture.frame_number,
+                                    self.capture.capture_time)
+                self.frames += 1
+        finally:
+            self.finished.set()
+
+    def stop(self):
+        self._stop.set()
+        self._running.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+
+class PreviewWindow:
+    """
+    Janela de pré-visualização com taxa própria.
+
+    A cada `update`, desenha o resultado mais recente só se ele for novo
+    (outro `seq`) e a janela estiver visível; caso contrário o desenho e o
+    `imshow` são pulados. `wait_key` espera até o próximo quadro da taxa
+    alvo, processando os eventos da janela nesse meio tempo.
+    """
+
+    def __init__(self, name: str, render, fps: float = 30.0, profiler=None):
+        """
+        Parâmetros:
+            name: Título da janela.
+            render: Função (resultado) -> imagem a exibir (anotações, textos...).
+            fps: Taxa alvo de exibição.
+            profiler: `StageProfiler` opcional; mede `render` e `imshow`.
+        """
+        self.name = name
+        self.render = render
+        self.period = 1.0 / fps
+        self.profiler = profiler
+        self._shown_seq = None
+        self._next_time = time.perf_counter()
+
+        # Contadores
+        self.rendered = 0
+        self.skipped_unchanged = 0
+        self.skipped_hidden = 0
+
+    def closed(self) -> bool:
+        """
+        True se a janela já foi mostrada e o usuário a fechou.
+        """
+        if self._shown_seq is None:
+            return False
+        try:
+            # Janela destruída: as propriedades valem -1
+            return cv2.getWindowProperty(self.name, cv2.WND_PROP_AUTOSIZE) < 0
+        except cv2.error:
+            return True
+
+    def visible(self) -> bool:
+        if self._shown_seq is None:
+            return True
+        try:
+            return cv2.getWindowProperty(self.name, cv2.WND_PROP_VISIBLE) >= 1
+        except cv2.error:
+            return False
+
+    def update(self, result: DetectionResult) -> bool:
+        """
+        Mostra `result` se houver algo novo para ver; retorna True se desenhou.
+        """
+        if result is None or result.seq == self._shown_seq:
+            self.skipped_unchanged += 1
+            return False
+        if not self.visible():
+            self.skipped_hidden += 1
+            return False
+
+        prof = self.profiler
+        if prof is not None:
+            t = time.perf_counter()
+        image = self.render(result)
+        if prof is not None:
+            t = prof.lap("render", t)
+        cv2.imshow(self.name, image)
+        if prof is not None:
+            prof.lap("imshow", t)
+        self._shown_seq = result.seq
+        self.rendered += 1
+        return True
+
+    def wait_key(self) -> int:
+        """
+        Processa os eventos da janela até o próximo quadro; retorna a tecla (ou -1).
+        """
+        now = time.perf_counter()
+        self._next_time = max(self._next_time + self.period, now)
+        delay = max(1, int((self._next_time - now) * 1000))
+        key = cv2.waitKey(delay)
+        return key & 0xFF if key >= 0 else -1
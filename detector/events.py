@@ -0,0 +1,167 @@
+import asyncio
+from typing import NamedTuple, Optional
+
+
+class OccupancyEvent(NamedTuple):
+    """
+    Mudança confirmada no estado de uma vaga.
+
+    `old` é None no primeiro estado conhecido da vaga. `frame` e `timestamp`
+    são os do primeiro frame da sequência que confirmou a mudança; `color` é
+    a cor detectada no frame da confirmação (None quando a vaga ficou livre).
+    """
+    spot: int
+    old: Optional[bool]
+    new: bool
+    frame: int
+    timestamp: float
+    color: Optional[tuple]
+
+    def to_record(self) -> dict:
+        """
+        Evento no formato das saídas JSON Lines.
+        """
+        record = self._asdict()
+        record["timestamp"] = round(self.timestamp, 3)
+        record["color"] = list(self.color) if self.color is not None else None
+        return record
+
+
+class OccupancyTracker:
+    """
+    Acompanha a ocupação ao longo dos frames e emite apenas as transições.
+
+    Uma vaga só muda de estado depois de `hysteresis` frames consecutivos no
+    novo estado, o que evita rajadas de eventos quando a detecção oscila.
+    Os eventos são entregues às funções registradas com `subscribe` e às
+    filas asyncio criadas com `subscribe_queue`.
+    """
+
+    def __init__(self, detector=None, hysteresis: int = 3, emit_initial: bool = True):
+        """
+        Parâmetros:
+            detector: Detector usado por `detect` (opcional se só `update` for usado).
+            hysteresis: Frames consecutivos necessários para confirmar uma mudança.
+            emit_initial: Emite um evento (com `old=None`) para o primeiro estado de cada vaga.
+        """
+        self.detector = detector
+        self.hysteresis = max(1, hysteresis)
+        self.emit_initial = emit_initial
+        self.states = None
+        self._pending = {}
+        self._callbacks = []
+        self._queues = []
+
+        # Contadores
+        self.frames = 0
+        self.events = 0
+        self.spot_changes = {}
+
+    def subscribe(self, callback):
+        """
+        Registra `callback(evento)`, chamado a cada transição. Retorna o próprio callback.
+        """
+        self._callbacks.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._callbacks.remove(callback)
+
+    def subscribe_queue(self, maxsize: int = 0, loop=None) -> asyncio.Queue:
+        """
+        Cria uma `asyncio.Queue` que recebe os eventos.
+
+        Deve ser chamada de dentro do loop que vai consumir a fila (ou com
+        `loop`). A entrega é feita com `call_soon_threadsafe`, então o
+        detector pode rodar em outra thread. Se a fila estiver cheia, o
+        evento mais antigo é descartado.
+        """
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize)
+        self._queues.append((loop, queue))
+        return queue
+
+    def unsubscribe_queue(self, queue: asyncio.Queue):
+        self._queues = [(loop, q) for loop, q in self._queues if q is not queue]
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: OccupancyEvent):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def _publish(self, event: OccupancyEvent):
+        self.events += 1
+        for callback in list(self._callbacks):
+            callback(event)
+        for loop, queue in self._queues:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._offer, queue, event)
+
+    def update(self, detections: list, frame_number: int, timestamp: float) -> list:
+        """
+        Atualiza o estado com as detecções de um frame.
+
+        Retorna a lista de eventos emitidos neste frame (normalmente vazia).
+        """
+        self.frames += 1
+        events = []
+
+        if self.states is None or len(self.states) != len(detections):
+            self.states = [bool(occupied) for occupied, _ in detections]
+            self._pending = {}
+            if self.emit_initial:
+                events = [OccupancyEvent(idx, None, bool(occupied), frame_number, timestamp, color)
+                          for idx, (occupied, color) in enumerate(detections)]
+        else:
+            for idx, (occupied, color) in enumerate(detections):
+                occupied = bool(occupied)
+                if occupied == self.states[idx]:
+                    self._pending.pop(idx, None)
+                    continue
+
+                # Sequência no novo estado: (frames, frame inicial, timestamp inicial)
+                count, first_frame, first_timestamp = self._pending.get(idx, (0, frame_number, timestamp))
+                count += 1
+                if count < self.hysteresis:
+                    self._pending[idx] = (count, first_frame, first_timestamp)
+                    continue
+
+                self._pending.pop(idx, None)
+                events.append(OccupancyEvent(idx, self.states[idx], occupied, first_frame,
+                                             first_timestamp, color if occupied else None))
+                self.states[idx] = occupied
+                self.spot_changes[idx] = self.spot_changes.get(idx, 0) + 1
+
+        for event in events:
+            self._publish(event)
+        return events
+
+    def update_record(self, record: dict) -> list:
+        """
+        Atualiza a partir de um registro de `detection_record`.
+        """
+        detections = [(spot["occupied"], spot["color"] and tuple(spot["color"]))
+                      for spot in record["spots"]]
+        return self.update(detections, record["frame"], record["timestamp"])
+
+    def detect(self, frame, bg_frame=None, frame_number: int = None, timestamp: float = None) -> list:
+        """
+        Executa o detector no frame e retorna os eventos emitidos.
+
+        Sem `frame_number`, os frames são numerados a partir de 1; sem
+        `timestamp`, usa o número do frame.
+        """
+        if frame_number is None:
+            frame_number = self.frames + 1
+        if timestamp is None:
+            timestamp = float(frame_number)
+        return self.update(self.detector.detect(frame, bg_frame), frame_number, timestamp)
+
+    def reset(self):
+        """
+        Esquece os estados; o próximo frame define o estado inicial de novo.
+        """
+        self.states = None
+        self._pending = {}
@@ -0,0 +1,226 @@
+import numpy as np
+
+# Quantidade de bits 1 em cada valor de byte (popcount por tabela)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+class OccupancyHistory:
+    """
+    Histórico de ocupação por vaga com memória limitada.
+
+    Os frames recentes (`recent_frames`) ficam em resolução total, um bitset
+    por frame (um bit por vaga) em um array NumPy. Quando ele enche, os
+    frames mais antigos são agregados em janelas de `rollup_seconds`
+    (frames na janela e frames ocupados por vaga) e só as últimas
+    `max_rollups` janelas são mantidas.
+
+    Com os valores padrão (1 h a 30 fps, janelas de 1 min, 1 semana), 500
+    vagas ocupam cerca de 27 MB: 7 MB de bitsets e 20 MB de agregados.
+
+    As consultas combinam as janelas agregadas (incluídas quando o início
+    está no intervalo) e os frames recentes. A ocupação é ponderada por
+    frame.
+    """
+
+    def __init__(self, num_spots: int, recent_frames: int = 30 * 3600,
+                 rollup_seconds: float = 60.0, max_rollups: int = 7 * 24 * 60):
+        """
+        Parâmetros:
+            num_spots: Quantidade de vagas.
+            recent_frames: Frames mantidos em resolução total.
+            rollup_seconds: Duração de cada janela agregada.
+            max_rollups: Janelas agregadas mantidas (as mais antigas são descartadas).
+        """
+        self.num_spots = num_spots
+        self.recent_frames = recent_frames
+        self.rollup_seconds = rollup_seconds
+        self.max_rollups = max_rollups
+
+        self.times = np.zeros(recent_frames, dtype=np.float64)
+        self.bits = np.zeros((recent_frames, (num_spots + 7) // 8), dtype=np.uint8)
+        self.count = 0
+
+        # Janelas agregadas: índice da janela, frames e frames ocupados por vaga
+        self.rollup_ids = np.zeros(0, dtype=np.int64)
+        self.rollup_frames = np.zeros(0, dtype=np.uint32)
+        self.rollup_occupied = np.zeros((0, num_spots), dtype=np.uint32)
+
+    def add(self, detections: list, timestamp: float):
+        """
+        Registra as detecções de um frame (timestamps crescentes).
+        """
+        occupied = np.fromiter((bool(occupied) for occupied, _ in detections), dtype=bool,
+                               count=self.num_spots)
+        if self.count == self.recent_frames:
+            self._evict(max(1, self.recent_frames // 8))
+        self.times[self.count] = timestamp
+        self.bits[self.count] = np.packbits(occupied, bitorder="little")
+        self.count += 1
+
+    def add_record(self, record: dict):
+        """
+        Registra um registro de `detection_record`.
+        """
+        self.add([(spot["occupied"], None) for spot in record["spots"]], record["timestamp"])
+
+    def _unpack(self, bits: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bits, axis=1, count=self.num_spots, bitorder="little").astype(bool)
+
+    def _recent_chunks(self, recent: slice, chunk: int = 4096):
+        """
+        Ocupação (frames x vagas) dos frames recentes, em blocos de `chunk`
+        frames, para não desempacotar tudo de uma vez.
+        """
+        for start in range(recent.start, recent.stop, chunk):
+            yield self._unpack(self.bits[start:min(start + chunk, recent.stop)])
+
+    def _evict(self, frames: int):
+        """
+        Agrega os `frames` mais antigos em janelas e os remove da parte recente.
+        """
+        ids = np.floor(self.times[:frames] / self.rollup_seconds).astype(np.int64)
+        occupied = self._unpack(self.bits[:frames]).astype(np.uint32)
+
+        # Os tempos são crescentes: cada janela é um trecho contíguo
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        new_ids = ids[starts]
+        new_frames = np.diff(np.r_[starts, frames]).astype(np.uint32)
+        new_occupied = np.add.reduceat(occupied, starts, axis=0)
+
+        if len(self.rollup_ids) and self.rollup_ids[-1] == new_ids[0]:
+            self.rollup_frames[-1] += new_frames[0]
+            self.rollup_occupied[-1] += new_occupied[0]
+            new_ids, new_frames, new_occupied = new_ids[1:], new_frames[1:], new_occupied[1:]
+
+        keep = self.max_rollups
+        self.rollup_ids = np.concatenate([self.rollup_ids, new_ids])[-keep:]
+        self.rollup_frames = np.concatenate([self.rollup_frames, new_frames])[-keep:]
+        self.rollup_occupied = np.concatenate([self.rollup_occupied, new_occupied])[-keep:]
+
+        remaining = self.count - frames
+        self.times[:remaining] = self.times[frames:self.count]
+        self.bits[:remaining] = self.bits[frames:self.count]
+        self.count = remaining
+
+    def _select(self, t0: float, t1: float) -> tuple:
+        """
+        (máscara das janelas agregadas, fatia dos frames recentes) em [t0, t1].
+        """
+        t0 = -np.inf if t0 is None else t0
+        t1 = np.inf if t1 is None else t1
+        rollup_starts = self.rollup_ids * self.rollup_seconds
+        rollups = (rollup_starts >= t0) & (rollup_starts <= t1)
+        times = self.times[:self.count]
+        recent = slice(np.searchsorted(times, t0, "left"), np.searchsorted(times, t1, "right"))
+        return rollups, recent
+
+    def occupancy_rate(self, t0: float = None, t1: float = None) -> np.ndarray:
+        """
+        Fração dos frames em [t0, t1] em que cada vaga esteve ocupada.
+
+        Retorna:
+            Array (num_spots,) com valores de 0 a 1 (NaN sem frames no intervalo).
+        """
+        rollups, recent = self._select(t0, t1)
+        frames = int(self.rollup_frames[rollups].sum()) + (recent.stop - recent.start)
+        occupied = self.rollup_occupied[rollups].sum(axis=0, dtype=np.int64)
+        for chunk in self._recent_chunks(recent):
+            occupied += chunk.sum(axis=0)
+        if frames == 0:
+            return np.full(self.num_spots, np.nan)
+        return occupied / frames
+
+    def utilization(self, interval: float = 3600.0, t0: float = None, t1: float = None) -> tuple:
+        """
+        Fração média das vagas ocupadas em cada intervalo de `interval` segundos.
+
+        `interval` deve ser múltiplo de `rollup_seconds` para que cada janela
+        agregada caia inteira em um intervalo.
+
+        Retorna:
+            (início de cada intervalo, utilização de 0 a 1), só intervalos com frames.
+        """
+        rollups, recent = self._select(t0, t1)
+        rollup_bins = np.floor(self.rollup_ids[rollups] * self.rollup_seconds / interval).astype(np.int64)
+        recent_bins = np.floor(self.times[recent] / interval).astype(np.int64)
+        bins = np.concatenate([rollup_bins, recent_bins])
+        if len(bins) == 0:
+            return np.zeros(0), np.zeros(0)
+
+        occupied = np.concatenate([self.rollup_occupied[rollups].sum(axis=1, dtype=np.int64),
+                                   _POPCOUNT[self.bits[recent]].sum(axis=1, dtype=np.int64)])
+        frames = np.concatenate([self.rollup_frames[rollups].astype(np.int64),
+                                 np.ones(recent.stop - recent.start, dtype=np.int64)])
+
+        first = bins.min()
+        occupied_sum = np.bincount(bins - first, weights=occupied)
+        frames_sum = np.bincount(bins - first, weights=frames)
+        used = np.flatnonzero(frames_sum)
+        return (used + first) * interval, occupied_sum[used] / (frames_sum[used] * self.num_spots)
+
+    def longest_free_run(self, t0: float = None, t1: float = None) -> np.ndarray:
+        """
+        Maior período contínuo livre (em segundos) de cada vaga em [t0, t1].
+
+        Nos frames recentes a duração é exata (cada frame dura até o
+        próximo); uma janela agregada conta como livre só se a vaga esteve
+        livre em todos os seus frames.
+
+        Retorna:
+            Array (num_spots,) com a duração em segundos.
+        """
+        rollups, recent = self._select(t0, t1)
+        times = self.times[recent]
+        durations = np.diff(times)
+        if len(times):
+            durations = np.r_[durations, durations[-1] if len(durations) else 0.0]
+
+        # Blocos de (vagas livres, duração de cada linha): janelas agregadas, depois os frames recentes
+        blocks = [(self.rollup_occupied[rollups] == 0,
+                   np.full(int(rollups.sum()), self.rollup_seconds))]
+        offset = recent.start
+        for occupied in self._recent_chunks(recent):
+            blocks.append((~occupied, durations[offset - recent.start:offset - recent.start + len(occupied)]))
+            offset += len(occupied)
+
+        longest = np.zeros(self.num_spots)
+        current = np.zeros(self.num_spots)
+        for free, block_durations in blocks:
+            if len(free) == 0:
+                continue
+            # Soma acumulada das durações livres, zerada a cada período ocupado;
+            # `current` continua a sequência livre do bloco anterior
+            total = np.cumsum(block_durations[:, None] * free, axis=0) + current
+            base = np.maximum.accumulate(np.where(free, 0.0, total), axis=0)
+            runs = total - base
+            longest = np.maximum(longest, runs.max(axis=0))
+            current = runs[-1]
+        return longest
+
+    @property
+    def nbytes(self) -> int:
+        return (self.times.nbytes + self.bits.nbytes + self.rollup_ids.nbytes
+                + self.rollup_frames.nbytes + self.rollup_occupied.nbytes)
+
+    def save(self, path: str):
+        """
+        Salva o histórico em um arquivo .npz.
+        """
+        np.savez(path, times=self.times[:self.count], bits=self.bits[:self.count],
+                 rollup_ids=self.rollup_ids, rollup_frames=self.rollup_frames,
+                 rollup_occupied=self.rollup_occupied,
+                 config=np.array([self.num_spots, self.recent_frames, self.rollup_seconds,
+                                  self.max_rollups], dtype=np.float64))
+
+    @classmethod
+    def load(cls, path: str) -> "OccupancyHistory":
+        with np.load(path) as data:
+            num_spots, recent_frames, rollup_seconds, max_rollups = data["config"]
+            history = cls(int(num_spots), int(recent_frames), float(rollup_seconds), int(max_rollups))
+            history.count = len(data["times"])
+            history.times[:history.count] = data["times"]
+            history.bits[:history.count] = data["bits"]
+            history.rollup_ids = data["rollup_ids"]
+            history.rollup_frames = data["rollup_frames"]
+            history.rollup_occupied = data["rollup_occupied"]
+        return history
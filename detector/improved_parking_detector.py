@@ -1,109 +1,406 @@
+import time
 import cv2
 import numpy as np
 from config import PARKING_SPOTS
-from detector.color_utils import get_dominant_color
+from detector.color_utils import KMeansStats, get_dominant_color
+from detector.batch_utils import filter_stack, gray_stack, pad_rows, run_batches
+from detector.background_utils import BackgroundCache
+from detector.crop_utils import CroppedGray
+from detector.motion import select_spots
+from detector.renderer import AnnotationRenderer
+from detector.scaling import scale_rects
+from detector.calibration import (calibration_key, collect_differences, load_thresholds,
+                                  save_thresholds, spot_differences)
 
 
-class ImprovedParkingDetector:
+class CriterionStats:
+    """
+    Contadores de um critério no modo preguiçoso.
+    """
+
     def __init__(self):
-        self.spots = PARKING_SPOTS
+        self.evaluated = 0
+        self.hits = 0
+        self.total_time = 0.0
+
+    def add(self, seconds: float, hit: bool):
+        self.evaluated += 1
+        self.hits += bool(hit)
+        self.total_time += seconds
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.evaluated if self.evaluated else 0.0
+
+    @property
+    def mean_time(self) -> float:
+        # Critérios ainda não avaliados ficam na ordem inicial (tempo 0)
+        return self.total_time / self.evaluated if self.evaluated else 0.0
+
+
+class BackgroundModel:
+    """
+    Características do fundo usadas pelos critérios, calculadas uma única vez.
+
+    Guarda, por vaga, a ROI do fundo já com o filtro de mediana, sua variância
+    e seu histograma, de forma que a detecção só processe o frame atual.
+    """
+
+    def __init__(self, bg_frame: np.ndarray, spots: list):
+        self.gray = cv2.cvtColor(bg_frame, cv2.COLOR_BGR2GRAY)
+        self.rois = []
+        self.variances = []
+        self.hists = []
+        for x, y, w, h in spots:
+            roi = self.gray[y:y+h, x:x+w]
+            if roi.size:
+                roi = cv2.medianBlur(roi, 5)
+            self.rois.append(roi)
+            self.variances.append(np.var(roi) if roi.size else 0.0)
+            self.hists.append(cv2.calcHist([roi], [0], None, [256], [0, 256]) if roi.size else None)
+
+    def refresh(self, bg_frame: np.ndarray, spots: list, indices):
+        """
+        Recalcula as características das vagas `indices` após mudança no fundo.
+        """
+        for idx in indices:
+            x, y, w, h = spots[idx]
+            roi = self.gray[y:y+h, x:x+w]
+            if roi.size == 0:
+                continue
+            roi[...] = cv2.cvtColor(bg_frame[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY)
+            roi = cv2.medianBlur(roi, 5)
+            self.rois[idx] = roi
+            self.variances[idx] = np.var(roi)
+            self.hists[idx] = cv2.calcHist([roi], [0], None, [256], [0, 256])
+
+
+class ImprovedParkingDetector:
+    def __init__(self, spots=None, spot_gate=None, color_cache=None, bg_frame: np.ndarray = None,
+                 lazy: bool = False, profiler=None, motion_selector=None, layout_cache=None):
+        """
+        Parâmetros:
+            spots: Lista de vagas (x, y, w, h). Padrão: PARKING_SPOTS.
+            spot_gate: `SpotChangeGate` opcional; vagas sem mudança reutilizam o resultado anterior.
+            color_cache: `SpotColorCache` opcional; a cor é calculada uma vez por
+                         ocupação, com o k-means rápido.
+            bg_frame: Frame de fundo opcional, pré-processado já na construção.
+            lazy: Se True, avalia os critérios do mais barato ao mais caro e para
+                  assim que a regra de 2 de 4 está decidida (mesmas decisões).
+            profiler: `StageProfiler` opcional; mede o tempo de cada etapa e de cada vaga.
+            motion_selector: `MotionSpotSelector` opcional; só as vagas tocadas por
+                             regiões com movimento são analisadas.
+            layout_cache: `LayoutCache` opcional com os recortes pré-calculados.
+        """
+        self.spots = spots if spots is not None else PARKING_SPOTS
+        self.spot_gate = spot_gate
+        self.color_cache = color_cache
+        # Chamadas ao k-means deste detector (sem `color_cache`)
+        self.kmeans_stats = KMeansStats()
+        self.profiler = profiler
+        self.motion_selector = motion_selector
+        # Conversão para cinza só na região das vagas
+        self._gray = CroppedGray(self.spots)
+        if layout_cache is not None:
+            layout_cache.check(self.spots)
+            self._gray.preload(layout_cache.frame_shape, layout_cache.crops)
         self.adaptive_thresholds = {}
         self.calibrated = False
+        self.lazy = lazy
+        self.min_pixel_threshold = 5000
+        self.criteria_stats = {name: CriterionStats()
+                               for name in ('pixel', 'texture', 'histogram', 'gradient')}
+        self._background = BackgroundCache(lambda bg: BackgroundModel(bg, self.spots))
+        # Criado no primeiro desenho (o modo headless nunca desenha)
+        self._renderer = None
+        if bg_frame is not None:
+            self.register_background(bg_frame)
+
+    def _build_renderer(self) -> AnnotationRenderer:
+        return AnnotationRenderer(
+            [[(x, y), (x+w, y), (x+w, y+h), (x, y+h)] for x, y, w, h in self.spots],
+            [(x, y-10) for x, y, w, h in self.spots], [(x + 15, y + 15) for x, y, w, h in self.spots],
+            fill_alpha=0)
+
+    def register_background(self, bg_frame: np.ndarray, frame_shape: tuple = None) -> BackgroundModel:
+        """
+        Registra o frame de fundo e pré-calcula suas características por vaga.
+
+        Parâmetros:
+            bg_frame: Frame do estacionamento vazio.
+            frame_shape: Forma dos frames do vídeo. Se for diferente da do fundo,
+                         o fundo é redimensionado uma única vez.
+
+        Retorna:
+            BackgroundModel com as ROIs filtradas, variâncias e histogramas.
+        """
+        if frame_shape is None:
+            frame_shape = bg_frame.shape
+        return self._background.get(bg_frame, frame_shape)
         
+    def scaled_copy(self, scale: float) -> "ImprovedParkingDetector":
+        """
+        Cópia do detector para frames reduzidos por `scale`.
+
+        As vagas são reescaladas e os thresholds em pixels (mínimo e, se
+        houver, os calibrados) multiplicados por scale².
+        O `layout_cache` não é repassado: ele vale só para a geometria e a
+        resolução nativas (a cópia recalcula os recortes).
+        """
+        copy = ImprovedParkingDetector(scale_rects(self.spots, scale), self.spot_gate,
+                                       self.color_cache, lazy=self.lazy, profiler=self.profiler,
+                                       motion_selector=self.motion_selector)
+        copy.min_pixel_threshold = self.min_pixel_threshold * scale * scale
+        copy.kmeans_stats = self.kmeans_stats
+        copy.adaptive_thresholds = {idx: value * scale * scale
+                                    for idx, value in self.adaptive_thresholds.items()}
+        copy.calibrated = self.calibrated
+        return copy
+
+    def refresh_background(self, bg_frame: np.ndarray, indices):
+        """
+        Atualiza o cache do fundo só nas vagas `indices` (fundo alterado no próprio array).
+        """
+        self._background.refresh(bg_frame, lambda model: model.refresh(bg_frame, self.spots, indices))
+        if self.spot_gate is not None:
+            self.spot_gate.invalidate(indices)
+        if self.motion_selector is not None:
+            self.motion_selector.invalidate(indices)
+
     def calibrate_thresholds(self, bg_frame: np.ndarray, sample_frames: list):
         """
         Calibra os thresholds automaticamente baseado em frames de amostra.
         """
-        bg_gray = cv2.cvtColor(bg_frame, cv2.COLOR_BGR2GRAY)
+        background = self.register_background(bg_frame)
+        
+        # Analisa diferenças em múltiplos frames (cada frame convertido uma vez)
+        differences = np.array([spot_differences(frame, background, self.spots)
+                                for frame in sample_frames])
         
+        # Usar percentil 90 como threshold base
+        self._set_thresholds(np.percentile(differences, 90, axis=0))
+        print("Thresholds calibrados:")
+        for idx, threshold in self.adaptive_thresholds.items():
+            print(f"  Vaga {idx + 1}: {threshold:.0f}")
+
+    def calibrate_stream(self, bg_frame: np.ndarray, frames, cache_path: str = None,
+                         reservoir_size: int = 2048, workers: int = 0, seed: int = 0) -> bool:
+        """
+        Calibra sobre um vídeo longo com memória limitada e salva o resultado.
+
+        Cada frame é convertido uma vez e medido em todas as vagas; só uma
+        amostra uniforme de `reservoir_size` medições por vaga é guardada.
+        Com `cache_path`, os thresholds são salvos em JSON sob uma chave
+        formada pelo hash do layout e do fundo, e uma nova chamada com o mesmo
+        layout e fundo apenas os carrega.
+
+        Parâmetros:
+            bg_frame: Frame do estacionamento vazio.
+            frames: Iterável de frames BGR ou caminho/índice de vídeo.
+            cache_path: Arquivo JSON de thresholds (opcional).
+            reservoir_size: Tamanho da amostra de frames.
+            workers: Threads para medir os frames em paralelo.
+            seed: Semente da amostragem.
+
+        Retorna:
+            True se os thresholds vieram do arquivo, False se foram calculados.
+        """
+        key = calibration_key(self.spots, bg_frame)
+        if cache_path is not None:
+            thresholds = load_thresholds(cache_path, key)
+            if thresholds is not None:
+                self.adaptive_thresholds = thresholds
+                self._after_calibration()
+                return True
+
+        background = self.register_background(bg_frame)
+        reservoir = collect_differences(frames, background, self.spots,
+                                        reservoir_size, workers, seed)
+        if reservoir.seen == 0:
+            raise ValueError("Nenhum frame para calibrar")
+        self._set_thresholds(reservoir.percentile(90))
+
+        if cache_path is not None:
+            save_thresholds(cache_path, key, self.adaptive_thresholds)
+        return False
+
+    def _set_thresholds(self, base_thresholds: np.ndarray):
+        """
+        Define os thresholds a partir do percentil das diferenças por vaga.
+        """
         for idx, (x, y, w, h) in enumerate(self.spots):
-            differences = []
-            
-            # Analisa diferenças em múltiplos frames
-            for frame in sample_frames:
-                frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                
-                # Aplicar filtro de mediana para reduzir ruído
-                roi_frame = cv2.medianBlur(frame_gray[y:y+h, x:x+w], 5)
-                roi_bg = cv2.medianBlur(bg_gray[y:y+h, x:x+w], 5)
-                
-                # Calcular diferença
-                diff = cv2.absdiff(roi_bg, roi_frame)
-                non_zero = cv2.countNonZero(diff)
-                differences.append(non_zero)
-            
-            # Usar percentil 90 como threshold base
-            base_threshold = np.percentile(differences, 90)
             # Ajustar baseado no tamanho da vaga
             area = w * h
-            adaptive_threshold = base_threshold + (area * 0.1)  # 10% do tamanho da área
-            
-            self.adaptive_thresholds[idx] = adaptive_threshold
-            
+            self.adaptive_thresholds[idx] = base_thresholds[idx] + (area * 0.1)  # 10% do tamanho da área
+        self._after_calibration()
+
+    def _after_calibration(self):
         self.calibrated = True
-        print("Thresholds calibrados:")
-        for idx, threshold in self.adaptive_thresholds.items():
-            print(f"  Vaga {idx + 1}: {threshold:.0f}")
+        if self.spot_gate is not None:
+            # Os thresholds mudaram: resultados guardados não valem mais
+            self.spot_gate.reset()
+        if self.motion_selector is not None:
+            self.motion_selector.reset()
 
     def detect_with_texture_analysis(self, frame: np.ndarray, bg_frame: np.ndarray) -> list:
         """
         Detecção melhorada usando análise de textura e múltiplos critérios.
         """
-        results = []
-        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        bg_gray = cv2.cvtColor(bg_frame, cv2.COLOR_BGR2GRAY)
+        prof = self.profiler
+        if prof is not None:
+            t = time.perf_counter()
+        frame_gray = self._gray.convert(frame)
+        background = self.register_background(bg_frame, frame.shape)
+        indices, results = select_spots(self.motion_selector, frame, bg_frame, self.spots)
+        if prof is not None:
+            t = prof.lap("gray", t)
+        gate = self.spot_gate
+        if gate is not None:
+            gate.bind(bg_frame)
         
-        for idx, (x, y, w, h) in enumerate(self.spots):
-            # Aplicar filtro de mediana para reduzir ruído
+        for idx in indices:
+            x, y, w, h = self.spots[idx]
+            if prof is not None:
+                spot_start = t
+            if gate is not None:
+                signature, cached = gate.lookup(idx, frame_gray[y:y+h, x:x+w])
+                if prof is not None:
+                    t = prof.lap("gate", t)
+                if cached is not None:
+                    results[idx] = cached
+                    if self.color_cache is not None:
+                        self.color_cache.advance(idx, cached[0])
+                    continue
+
+            # Aplicar filtro de mediana para reduzir ruído (o fundo já vem filtrado)
             roi_frame = cv2.medianBlur(frame_gray[y:y+h, x:x+w], 5)
-            roi_bg = cv2.medianBlur(bg_gray[y:y+h, x:x+w], 5)
-            
-            # Critério 1: Diferença de pixels
-            diff = cv2.absdiff(roi_bg, roi_frame)
-            non_zero_pixels = cv2.countNonZero(diff)
-            
-            # Critério 2: Análise de variância (textura)
-            variance_frame = np.var(roi_frame)
-            variance_bg = np.var(roi_bg)
-            texture_diff = abs(variance_frame - variance_bg)
-            
-            # Critério 3: Análise de gradiente
-            grad_x = cv2.Sobel(roi_frame, cv2.CV_64F, 1, 0, ksize=3)
-            grad_y = cv2.Sobel(roi_frame, cv2.CV_64F, 0, 1, ksize=3)
-            gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
-            gradient_mean = np.mean(gradient_magnitude)
+            if prof is not None:
+                t = prof.lap("roi", t)
+            if self.lazy:
+                occupied = self._lazy_decision(idx, roi_frame, background)
+            else:
+                occupied = self._full_decision(idx, roi_frame, background)
+            if prof is not None:
+                t = prof.lap("criteria", t)
             
-            # Critério 4: Análise de histograma
-            hist_frame = cv2.calcHist([roi_frame], [0], None, [256], [0, 256])
-            hist_bg = cv2.calcHist([roi_bg], [0], None, [256], [0, 256])
-            hist_correlation = cv2.compareHist(hist_frame, hist_bg, cv2.HISTCMP_CORREL)
-            
-            # Decisão baseada em múltiplos critérios
-            occupied = self._make_decision(idx, non_zero_pixels, texture_diff, 
-                                         gradient_mean, hist_correlation)
-            
-            color = None
-            if occupied:
-                spot_img = frame[y:y+h, x:x+w]
-                color = get_dominant_color(spot_img)
+            color = self._spot_color(idx, occupied, frame[y:y+h, x:x+w])
+            if prof is not None:
+                t = prof.lap("color", t)
+                prof.add_spot(idx, t - spot_start)
                 
-            results.append((occupied, color))
+            results[idx] = (occupied, color)
+            if gate is not None:
+                gate.store(idx, signature, results[idx])
             
-        return results
+        return list(results)
+    
+    def _full_decision(self, idx: int, roi_frame: np.ndarray, background: BackgroundModel) -> bool:
+        """
+        Calcula os quatro critérios da vaga e decide pela regra de 2 de 4.
+        """
+        roi_bg = background.rois[idx]
+        
+        # Critério 1: Diferença de pixels
+        diff = cv2.absdiff(roi_bg, roi_frame)
+        non_zero_pixels = cv2.countNonZero(diff)
+        
+        # Critério 2: Análise de variância (textura)
+        variance_frame = np.var(roi_frame)
+        variance_bg = background.variances[idx]
+        texture_diff = abs(variance_frame - variance_bg)
+        
+        # Critério 3: Análise de gradiente
+        grad_x = cv2.Sobel(roi_frame, cv2.CV_64F, 1, 0, ksize=3)
+        grad_y = cv2.Sobel(roi_frame, cv2.CV_64F, 0, 1, ksize=3)
+        gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
+        gradient_mean = np.mean(gradient_magnitude)
+        
+        # Critério 4: Análise de histograma
+        hist_frame = cv2.calcHist([roi_frame], [0], None, [256], [0, 256])
+        hist_correlation = cv2.compareHist(hist_frame, background.hists[idx], cv2.HISTCMP_CORREL)
+        
+        # Decisão baseada em múltiplos critérios
+        return self._make_decision(idx, non_zero_pixels, texture_diff, 
+                                   gradient_mean, hist_correlation)
+
+    def _criterion_pixel(self, idx: int, roi_frame: np.ndarray, background: BackgroundModel) -> bool:
+        diff = cv2.absdiff(background.rois[idx], roi_frame)
+        return cv2.countNonZero(diff) > self._pixel_threshold(idx)
+
+    def _criterion_texture(self, idx: int, roi_frame: np.ndarray, background: BackgroundModel) -> bool:
+        return abs(np.var(roi_frame) - background.variances[idx]) > 50
+
+    def _criterion_gradient(self, idx: int, roi_frame: np.ndarray, background: BackgroundModel) -> bool:
+        """
+        Critério de gradiente com Sobel em int16 e limites pela norma L1.
+
+        Como |g| <= |gx| + |gy| <= sqrt(2) * |g|, a média L1 decide sozinha
+        fora da faixa (10, 10 * sqrt(2)]; dentro dela, a magnitude exata é
+        calculada como em `_full_decision`, então a decisão é a mesma.
+        """
+        grad_x = cv2.Sobel(roi_frame, cv2.CV_16S, 1, 0, ksize=3)
+        grad_y = cv2.Sobel(roi_frame, cv2.CV_16S, 0, 1, ksize=3)
+        l1_mean = (cv2.norm(grad_x, cv2.NORM_L1) + cv2.norm(grad_y, cv2.NORM_L1)) / roi_frame.size
+        if l1_mean <= 10:
+            return False
+        if l1_mean > 10 * np.sqrt(2):
+            return True
+        grad_x = grad_x.astype(np.float64)
+        grad_y = grad_y.astype(np.float64)
+        return np.mean(np.sqrt(grad_x**2 + grad_y**2)) > 10
+
+    def _criterion_histogram(self, idx: int, roi_frame: np.ndarray, background: BackgroundModel) -> bool:
+        hist_frame = cv2.calcHist([roi_frame], [0], None, [256], [0, 256])
+        return cv2.compareHist(hist_frame, background.hists[idx], cv2.HISTCMP_CORREL) < 0.7
+
+    def _lazy_decision(self, idx: int, roi_frame: np.ndarray, background: BackgroundModel) -> bool:
+        """
+        Regra de 2 de 4 avaliando os critérios do mais barato ao mais caro
+        (pelo tempo médio medido) e parando assim que o resultado está decidido.
+        """
+        order = sorted(self.criteria_stats, key=lambda name: self.criteria_stats[name].mean_time)
+        met = 0
+        for remaining, name in zip(range(len(order) - 1, -1, -1), order):
+            stats = self.criteria_stats[name]
+            start = time.perf_counter()
+            hit = getattr(self, f"_criterion_{name}")(idx, roi_frame, background)
+            stats.add(time.perf_counter() - start, hit)
+            met += hit
+            if met >= 2:
+                return True
+            if met + remaining < 2:
+                return False
+        return False
+
+    def criteria_report(self) -> str:
+        """
+        Resumo do modo preguiçoso: avaliações, taxa de acerto e tempo por critério.
+        """
+        lines = ["Critérios (avaliações | atendidos | tempo médio):"]
+        for name, stats in self.criteria_stats.items():
+            lines.append(f"  {name:<10} {stats.evaluated:>8} | {stats.hit_rate:6.1%} | "
+                         f"{stats.mean_time * 1e6:8.1f} us")
+        return "\n".join(lines)
     
+    def _pixel_threshold(self, spot_idx: int) -> float:
+        """
+        Threshold de pixels diferentes para a vaga.
+        """
+        # Usar threshold adaptativo se calibrado
+        if self.calibrated and spot_idx in self.adaptive_thresholds:
+            return self.adaptive_thresholds[spot_idx]
+
+        # Fallback para threshold baseado no tamanho da vaga
+        x, y, w, h = self.spots[spot_idx]
+        area = w * h
+        return max(self.min_pixel_threshold, area * 0.15)  # Mínimo 5000 ou 15% da área
+
     def _make_decision(self, spot_idx: int, pixel_diff: int, texture_diff: float, 
                       gradient_mean: float, hist_correlation: float) -> bool:
         """
         Toma decisão baseada em múltiplos critérios.
         """
-        # Usar threshold adaptativo se calibrado
-        if self.calibrated and spot_idx in self.adaptive_thresholds:
-            threshold = self.adaptive_thresholds[spot_idx]
-        else:
-            # Fallback para threshold baseado no tamanho da vaga
-            x, y, w, h = self.spots[spot_idx]
-            area = w * h
-            threshold = max(5000, area * 0.15)  # Mínimo 5000 ou 15% da área
+        threshold = self._pixel_threshold(spot_idx)
         
         # Critério principal: diferença de pixels
         pixel_criteria = pixel_diff > threshold
@@ -133,15 +430,145 @@ class ImprovedParkingDetector:
             # Fallback para detecção simples
             return self._simple_detect(frame)
     
+    def detect_batch(self, frames, bg_frame: np.ndarray = None, batch_size: int = 32):
+        """
+        Detecta a ocupação em vários frames de uma vez.
+
+        Parâmetros:
+            frames: Array (N, H, W, 3) ou iterável de frames BGR.
+            bg_frame: Frame de fundo (opcional), como em `detect`.
+            batch_size: Quantidade de frames processados por bloco.
+
+        Retorna:
+            Tupla (ocupação, cores): matriz booleana (N, vagas) e, para cada
+            frame, a lista de cores dominantes (None quando a vaga está livre).
+        """
+        return run_batches(lambda stack: self._detect_stack(stack, bg_frame),
+                           frames, len(self.spots), batch_size)
+
+    def _detect_stack(self, stack: np.ndarray, bg_frame: np.ndarray = None):
+        """
+        Aplica os critérios de `detect` a um bloco (N, H, W, 3), vaga a vaga,
+        vetorizando os filtros e estatísticas no eixo dos frames.
+        """
+        n = len(stack)
+        gray = gray_stack(stack)
+        background = self.register_background(bg_frame, stack.shape[1:]) if bg_frame is not None else None
+
+        occupancy = np.zeros((n, len(self.spots)), dtype=bool)
+        for idx, (x, y, w, h) in enumerate(self.spots):
+            rois = gray[:, y:y+h, x:x+w]
+            if rois.size == 0:
+                continue
+            # Vagas cortadas pela borda do frame têm ROI menor que (h, w)
+            h, w = rois.shape[1:3]
+
+            if background is None:
+                variance = rois.reshape(n, -1).var(axis=1)
+                mean_intensity = rois.reshape(n, -1).mean(axis=1)
+                occupancy[:, idx] = (variance > 300) & ((mean_intensity < 60) | (mean_intensity > 120))
+                continue
+
+            # Filtro de mediana em todas as ROIs de uma vez
+            roi_frames = filter_stack(rois, 2, 'edge', lambda img: cv2.medianBlur(img, 5))
+            roi_bg = background.rois[idx]
+
+            # Critério 1: Diferença de pixels
+            pixel_diff = np.count_nonzero(roi_frames != roi_bg, axis=(1, 2))
+
+            # Critério 2: Análise de variância (textura)
+            texture_diff = np.abs(roi_frames.var(axis=(1, 2)) - background.variances[idx])
+
+            # Critério 3: Análise de gradiente (as duas derivadas sobre o mesmo bloco)
+            padded = np.ascontiguousarray(pad_rows(roi_frames, 1, 'reflect')).reshape(-1, w)
+            grad_x = cv2.Sobel(padded, cv2.CV_64F, 1, 0, ksize=3)
+            grad_y = cv2.Sobel(padded, cv2.CV_64F, 0, 1, ksize=3)
+            gradient_magnitude = cv2.magnitude(grad_x, grad_y).reshape(n, h + 2, w)[:, 1:-1]
+            gradient_mean = gradient_magnitude.mean(axis=(1, 2))
+
+            # Critério 4: Análise de histograma (correlação como em compareHist)
+            offsets = (np.arange(n) * 256)[:, None]
+            hist_frames = np.bincount((roi_frames.reshape(n, -1) + offsets).ravel(),
+                                      minlength=256 * n).reshape(n, 256).astype(np.float64)
+            hist_bg = background.hists[idx].ravel().astype(np.float64)
+            hist_correlation = self._hist_correlation(hist_frames, hist_bg)
+
+            criteria_met = ((pixel_diff > self._pixel_threshold(idx)).astype(int)
+                            + (texture_diff > 50) + (gradient_mean > 10)
+                            + (hist_correlation < 0.7))
+            occupancy[:, idx] = criteria_met >= 2
+
+        colors = [[None] * len(self.spots) for _ in range(n)]
+        if self.color_cache is not None:
+            # Em ordem de frame, para o cache acompanhar os episódios de ocupação
+            for frame_idx in range(n):
+                for idx, (x, y, w, h) in enumerate(self.spots):
+                    colors[frame_idx][idx] = self._spot_color(idx, occupancy[frame_idx, idx],
+                                                              stack[frame_idx, y:y+h, x:x+w])
+        else:
+            for frame_idx, idx in zip(*np.nonzero(occupancy)):
+                x, y, w, h = self.spots[idx]
+                colors[frame_idx][idx] = get_dominant_color(stack[frame_idx, y:y+h, x:x+w],
+                                                              stats=self.kmeans_stats)
+
+        return occupancy, colors
+
+    @staticmethod
+    def _hist_correlation(hists: np.ndarray, hist_bg: np.ndarray) -> np.ndarray:
+        """
+        Correlação (HISTCMP_CORREL) entre cada linha de `hists` e `hist_bg`.
+        """
+        bins = hists.shape[1]
+        s1 = hists.sum(axis=1)
+        s11 = (hists * hists).sum(axis=1)
+        s12 = hists @ hist_bg
+        s2 = hist_bg.sum()
+        s22 = hist_bg @ hist_bg
+
+        num = s12 - s1 * s2 / bins
+        denom = (s11 - s1 * s1 / bins) * (s22 - s2 * s2 / bins)
+        correlation = np.ones(len(hists))
+        valid = np.abs(denom) > np.finfo(np.float64).eps
+        correlation[valid] = num[valid] / np.sqrt(denom[valid])
+        return correlation
+
+    def _spot_color(self, idx: int, occupied: bool, spot_img: np.ndarray):
+        """
+        Cor dominante da vaga (None se livre); memoizada por episódio com `color_cache`.
+        """
+        if self.color_cache is not None:
+            return self.color_cache.update(idx, occupied, spot_img)
+        return get_dominant_color(spot_img, stats=self.kmeans_stats) if occupied else None
+
     def _simple_detect(self, frame: np.ndarray) -> list:
         """
         Detecção simples sem frame de background.
         """
-        results = []
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        prof = self.profiler
+        if prof is not None:
+            t = time.perf_counter()
+        gray = self._gray.convert(frame)
+        indices, results = select_spots(self.motion_selector, frame, None, self.spots)
+        if prof is not None:
+            t = prof.lap("gray", t)
+        gate = self.spot_gate
+        if gate is not None:
+            gate.bind(None)
         
-        for idx, (x, y, w, h) in enumerate(self.spots):
+        for idx in indices:
+            x, y, w, h = self.spots[idx]
             roi = gray[y:y+h, x:x+w]
+            if prof is not None:
+                spot_start = t
+            if gate is not None:
+                signature, cached = gate.lookup(idx, roi)
+                if prof is not None:
+                    t = prof.lap("gate", t)
+                if cached is not None:
+                    results[idx] = cached
+                    if self.color_cache is not None:
+                        self.color_cache.advance(idx, cached[0])
+                    continue
             
             # Usar análise de textura para detectar objetos
             variance = np.var(roi)
@@ -150,42 +577,37 @@ class ImprovedParkingDetector:
             # Heurística: áreas com carros tendem a ter mais variância
             # e intensidade diferente do asfalto
             occupied = variance > 300 and (mean_intensity < 60 or mean_intensity > 120)
+            if prof is not None:
+                t = prof.lap("criteria", t)
             
-            color = None
-            if occupied:
-                spot_img = frame[y:y+h, x:x+w]
-                color = get_dominant_color(spot_img)
+            color = self._spot_color(idx, occupied, frame[y:y+h, x:x+w])
+            if prof is not None:
+                t = prof.lap("color", t)
+                prof.add_spot(idx, t - spot_start)
                 
-            results.append((occupied, color))
+            results[idx] = (occupied, color)
+            if gate is not None:
+                gate.store(idx, signature, results[idx])
             
-        return results
+        return list(results)
     
     def draw_annotations(self, frame: np.ndarray, detections: list) -> np.ndarray:
         """
         Desenha anotações no frame com informações detalhadas.
+
+        Usa o mesmo `AnnotationRenderer` do detector de polígonos (sem
+        preenchimento); o threshold calibrado de cada vaga entra como nota.
         """
-        annotated = frame.copy()
-        
-        for idx, ((x, y, w, h), (occupied, color)) in enumerate(zip(self.spots, detections)):
-            # Cor do retângulo
-            rect_color = (0, 0, 255) if occupied else (0, 255, 0)
-            
-            # Desenhar retângulo
-            cv2.rectangle(annotated, (x, y), (x+w, y+h), rect_color, 2)
-            
-            # Label
-            label = f"V{idx+1}: {'OCUPADA' if occupied else 'LIVRE'}"
-            cv2.putText(annotated, label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 
-                       0.6, (255, 255, 255), 2)
-            
-            # Mostrar threshold se calibrado
-            if self.calibrated and idx in self.adaptive_thresholds:
-                threshold_text = f"T: {self.adaptive_thresholds[idx]:.0f}"
-                cv2.putText(annotated, threshold_text, (x, y+h+20), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-            
-            # Círculo da cor dominante
-            if color:
-                cv2.circle(annotated, (x + 15, y + 15), 10, color, -1)
-                
-        return annotated 
\ No newline at end of file
+        if self.profiler is not None:
+            start = time.perf_counter()
+        notes = None
+        if self.calibrated:
+            notes = {idx: (f"T: {self.adaptive_thresholds[idx]:.0f}", (x, y+h+20))
+                     for idx, (x, y, w, h) in enumerate(self.spots) if idx in self.adaptive_thresholds}
+        if self._renderer is None:
+            self._renderer = self._build_renderer()
+        annotated = self._renderer.render(frame, detections, notes)
+
+        if self.profiler is not None:
+            self.profiler.lap("draw", start)
+        return annotated
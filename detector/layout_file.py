@@ -0,0 +1,342 @@
+import hashlib
+import json
+import os
+import struct
+import zipfile
+from typing import NamedTuple
+import numpy as np
+from detector.compiled_layout import CompiledLayout
+
+LAYOUT_VERSION = 1
+# Muda quando o conteúdo do cache (ou o jeito de gerar as máscaras) muda
+CACHE_VERSION = 1
+SPOT_TYPES = ("rect", "polygon")
+
+
+class LayoutFile(NamedTuple):
+    """
+    Layout declarativo lido de um arquivo JSON.
+
+    Formato (versão 1):
+
+        {
+          "version": 1,
+          "resolution": [largura, altura],          (opcional)
+          "zones": {"norte": {...}},                 (opcional; metadados livres)
+          "spots": [
+            {"type": "polygon", "points": [[x, y], ...], "zone": "norte", "id": "N1"},
+            {"type": "rect", "rect": [x, y, w, h]}
+          ]
+        }
+
+    `rects` e `polygons` têm uma entrada por vaga nos dois formatos
+    (bounding box dos polígonos; 4 cantos dos retângulos).
+    """
+    rects: list
+    polygons: list
+    types: list
+    resolution: tuple
+    zones: dict
+    spot_zones: list
+    ids: list
+
+    @property
+    def spots(self) -> list:
+        """
+        Vagas no formato dos detectores: retângulos se todas forem retângulos, senão polígonos.
+        """
+        return self.rects if all(kind == "rect" for kind in self.types) else self.polygons
+
+    @property
+    def frame_shape(self) -> tuple:
+        """
+        (altura, largura) declarada no arquivo, ou None.
+        """
+        if self.resolution is None:
+            return None
+        width, height = self.resolution
+        return (height, width)
+
+
+def _int_list(value, length: int = None, where: str = "") -> list:
+    if not isinstance(value, list) or (length is not None and len(value) != length):
+        raise ValueError(f"{where}: esperado lista de {length or 'N'} inteiros")
+    if not all(isinstance(v, int) and not isinstance(v, bool) for v in value):
+        raise ValueError(f"{where}: esperado lista de inteiros")
+    return value
+
+
+def parse_layout(data: dict) -> LayoutFile:
+    """
+    Valida um layout já decodificado do JSON.
+
+    Erros de formato geram ValueError indicando a vaga/campo.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Layout: esperado um objeto JSON")
+    version = data.get("version", LAYOUT_VERSION)
+    if version != LAYOUT_VERSION:
+        raise ValueError(f"Layout: versão {version} não suportada (esperado {LAYOUT_VERSION})")
+
+    resolution = data.get("resolution")
+    if resolution is not None:
+        width, height = _int_list(resolution, 2, "resolution")
+        if width <= 0 or height <= 0:
+            raise ValueError("resolution: largura e altura devem ser positivas")
+        resolution = (width, height)
+
+    zones = data.get("zones", {})
+    if not isinstance(zones, dict):
+        raise ValueError("zones: esperado um objeto {nome: metadados}")
+
+    spots = data.get("spots")
+    if not isinstance(spots, list) or not spots:
+        raise ValueError("spots: esperado uma lista não vazia de vagas")
+
+    rects, polygons, types, spot_zones, ids = [], [], [], [], []
+    for idx, spot in enumerate(spots):
+        where = f"spots[{idx}]"
+        if not isinstance(spot, dict):
+            raise ValueError(f"{where}: esperado um objeto")
+        kind = spot.get("type")
+        if kind not in SPOT_TYPES:
+            raise ValueError(f"{where}.type: esperado um de {', '.join(SPOT_TYPES)}")
+        if kind == "rect":
+            x, y, w, h = _int_list(spot.get("rect"), 4, f"{where}.rect")
+            if w <= 0 or h <= 0:
+                raise ValueError(f"{where}.rect: largura e altura devem ser positivas")
+            rects.append((x, y, w, h))
+            polygons.append([[x, y], [x + w, y], [x + w, y + h], [x, y + h]])
+        else:
+            points = spot.get("points")
+            if not isinstance(points, list) or len(points) < 3:
+                raise ValueError(f"{where}.points: esperado ao menos 3 pontos [x, y]")
+            points = [_int_list(point, 2, f"{where}.points") for point in points]
+            xs, ys = [p[0] for p in points], [p[1] for p in points]
+            rects.append((min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys)))
+            polygons.append(points)
+
+        zone = spot.get("zone")
+        if zone is not None and zone not in zones:
+            raise ValueError(f"{where}.zone: zona '{zone}' não declarada em zones")
+        spot_id = spot.get("id")
+        if spot_id is not None and spot_id in ids:
+            raise ValueError(f"{where}.id: '{spot_id}' repetido")
+        types.append(kind)
+        spot_zones.append(zone)
+        ids.append(spot_id)
+
+    return LayoutFile(rects, polygons, types, resolution, zones, spot_zones, ids)
+
+
+def load_layout_file(path: str) -> LayoutFile:
+    """
+    Lê e valida um layout JSON.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Layout não encontrado: {path}")
+    with open(path) as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Layout {path}: JSON inválido ({exc})") from exc
+    return parse_layout(data)
+
+
+def save_layout_file(path: str, spots: list, resolution: tuple = None, zones: dict = None,
+                     spot_zones: list = None, ids: list = None):
+    """
+    Grava vagas (retângulos (x, y, w, h) ou polígonos) como layout JSON.
+
+    Parâmetros:
+        path: Arquivo de saída.
+        spots: Lista de vagas; sequências de 4 números são retângulos, de pontos, polígonos.
+        resolution: (largura, altura) dos frames para os quais o layout foi desenhado.
+        zones: Zonas declaradas, {nome: metadados}.
+        spot_zones: Zona de cada vaga (ou None).
+        ids: Identificador de cada vaga (ou None).
+    """
+    entries = []
+    for idx, spot in enumerate(spots):
+        array = np.asarray(spot)
+        if array.ndim == 1:
+            entry = {"type": "rect", "rect": [int(v) for v in array]}
+        else:
+            entry = {"type": "polygon", "points": [[int(x), int(y)] for x, y in array]}
+        if spot_zones and spot_zones[idx] is not None:
+            entry["zone"] = spot_zones[idx]
+        if ids and ids[idx] is not None:
+            entry["id"] = ids[idx]
+        entries.append(entry)
+
+    data = {"version": LAYOUT_VERSION}
+    if resolution is not None:
+        data["resolution"] = [int(resolution[0]), int(resolution[1])]
+    if zones:
+        data["zones"] = zones
+    data["spots"] = entries
+    # Valida antes de gravar (ex.: zona não declarada)
+    parse_layout(data)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        # Uma vaga por linha: legível e com diffs pequenos
+        f.write("{\n")
+        for key, value in data.items():
+            if key == "spots":
+                continue
+            f.write(f'  "{key}": {json.dumps(value, ensure_ascii=False)},\n')
+        f.write('  "spots": [\n')
+        f.write(",\n".join(f"    {json.dumps(entry, ensure_ascii=False)}" for entry in entries))
+        f.write("\n  ]\n}\n")
+    os.replace(tmp_path, path)
+
+
+def layout_hash(spots: list) -> str:
+    """
+    Hash (sha256, hex) da geometria das vagas e da versão do cache.
+    """
+    digest = hashlib.sha256(f"cache-v{CACHE_VERSION}".encode())
+    for spot in spots:
+        array = np.ascontiguousarray(spot, dtype=np.int64)
+        digest.update(np.array(array.shape, dtype=np.int64).tobytes())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def cache_path(layout_path: str, spots: list, frame_shape: tuple) -> str:
+    """
+    Arquivo do cache ao lado do layout, identificado pelo hash e pela resolução.
+    """
+    base = os.path.splitext(layout_path)[0]
+    height, width = frame_shape[:2]
+    return f"{base}.{layout_hash(spots)[:16]}.{width}x{height}.npz"
+
+
+def _mmap_npz(path: str) -> dict:
+    """
+    Abre os arrays de um .npz sem compressão como memmap (somente leitura).
+
+    `np.load` ignora `mmap_mode` em arquivos .npz; como `np.savez` grava os
+    membros sem compressão, cada .npy está inteiro em um trecho do zip e
+    pode ser mapeado direto, a partir do deslocamento do membro.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.load(archive.open(info))
+                continue
+            # Cabeçalho local do zip: 30 bytes + nome + campo extra
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"Cache {path}: arrays de objetos não são suportados")
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                     order="F" if fortran else "C")
+    return arrays
+
+
+class LayoutCache:
+    """
+    Dados de um layout pré-calculados para uma resolução, em um .npz mapeado em memória.
+
+    Guarda os recortes da conversão para cinza (`spot_crops`, o passo mais
+    caro em layouts grandes) e, para polígonos, as bounding boxes, as
+    máscaras no tamanho das ROIs e o layout compilado (índices planos dos
+    pixels de cada vaga, de onde sai o mapa de rótulos). Os detectores
+    recebem o cache no construtor (`layout_cache=`) e usam as views
+    diretamente, sem rasterizar nada; as páginas só são lidas do disco
+    quando usadas.
+    """
+
+    def __init__(self, arrays: dict):
+        self.arrays = arrays
+        self.layout_hash = str(arrays["layout_hash"][()])
+        self.frame_shape = tuple(int(v) for v in arrays["frame_shape"])
+        self.crops = [tuple(int(v) for v in crop) for crop in arrays["crops"]]
+
+    @classmethod
+    def load(cls, path: str) -> "LayoutCache":
+        try:
+            return cls(_mmap_npz(path))
+        except zipfile.BadZipFile as exc:
+            raise ValueError(f"Cache {path}: arquivo inválido ({exc})") from exc
+
+    @property
+    def has_masks(self) -> bool:
+        return "mask_data" in self.arrays
+
+    def check(self, spots: list):
+        """
+        Garante que o cache foi gerado para estas vagas (ValueError caso contrário).
+        """
+        if layout_hash(spots) != self.layout_hash:
+            raise ValueError("Cache de layout não corresponde às vagas do detector")
+
+    def bounding_boxes(self) -> dict:
+        return {idx: tuple(box) for idx, box in enumerate(self.arrays["boxes"].tolist())}
+
+    def masks(self) -> dict:
+        """
+        Máscara de cada vaga no tamanho da sua ROI (views do arquivo).
+        """
+        data = self.arrays["mask_data"]
+        offsets = self.arrays["mask_offsets"].tolist()
+        shapes = self.arrays["mask_shapes"].tolist()
+        return {idx: data[offsets[idx]:offsets[idx + 1]].reshape(shape)
+                for idx, shape in enumerate(shapes)}
+
+    def compiled_layout(self) -> CompiledLayout:
+        arrays = self.arrays
+        return CompiledLayout.from_arrays(arrays["pixel_index"], arrays["mask_pixels"],
+                                          tuple(int(v) for v in arrays["union"]), self.frame_shape)
+
+
+def save_layout_cache(path: str, detector, frame_shape: tuple):
+    """
+    Calcula para `frame_shape` e grava o cache de um detector (escrita atômica).
+    """
+    shape = tuple(frame_shape[:2])
+    arrays = {
+        "layout_hash": np.array(layout_hash(detector.spots)),
+        "frame_shape": np.array(shape, dtype=np.int64),
+        "crops": np.array(detector._gray.crops_for(shape), dtype=np.int64).reshape(-1, 4),
+    }
+    if hasattr(detector, "spot_bounding_boxes"):
+        count = len(detector.spots)
+        masks = detector._masks_for_shape(shape)
+        compiled = detector.compile_layout(shape)
+        sizes = [masks[idx].size for idx in range(count)]
+        arrays.update({
+            "boxes": np.array([detector.spot_bounding_boxes[idx] for idx in range(count)],
+                              dtype=np.int64).reshape(-1, 4),
+            "mask_shapes": np.array([masks[idx].shape[:2] for idx in range(count)],
+                                    dtype=np.int64).reshape(-1, 2),
+            "mask_offsets": np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+            "mask_data": np.concatenate([masks[idx].ravel() for idx in range(count)]
+                                        or [np.zeros(0, dtype=np.uint8)]),
+            "pixel_index": compiled.pixel_index,
+            "mask_pixels": compiled.mask_pixels,
+            "union": np.array(compiled.union, dtype=np.int64),
+        })
+
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    finally:
+        # Falha no meio (ex.: disco cheio): não deixa o temporário para trás
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
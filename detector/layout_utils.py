@@ -0,0 +1,133 @@
+import importlib
+import importlib.util
+import os
+from detector.parking_detector import ParkingDetector
+from detector.improved_parking_detector import ImprovedParkingDetector
+from detector.polygon_parking_detector import PolygonParkingDetector
+from detector.layout_file import LayoutCache, cache_path, load_layout_file, save_layout_cache
+from detector.scaling import ScaledDetector
+
+# Tipos de detector disponíveis nas ferramentas de linha de comando
+DETECTORS = {
+    "rect": ParkingDetector,
+    "improved": ImprovedParkingDetector,
+    "polygon": PolygonParkingDetector,
+}
+
+# Layout usado quando nenhum é informado
+DEFAULT_LAYOUTS = {
+    "rect": "config:PARKING_SPOTS",
+    "improved": "config:PARKING_SPOTS",
+    "polygon": "config_diagonal:PARKING_SPOTS_CUSTOM",
+}
+
+# Variáveis procuradas quando o layout não diz qual usar
+LAYOUT_NAMES = ("PARKING_SPOTS_CUSTOM", "PARKING_SPOTS")
+
+
+def _split_spec(spec: str):
+    """
+    Separa 'origem:VARIAVEL' em (origem, VARIAVEL ou None).
+    """
+    source, sep, name = spec.rpartition(":")
+    if sep and name.isidentifier() and source:
+        return source, name
+    return spec, None
+
+
+def load_layout(spec: str):
+    """
+    Carrega um layout de vagas.
+
+    Parâmetros:
+        spec: 'modulo:VARIAVEL' (ex.: 'config_diagonal:PARKING_SPOTS_CUSTOM'),
+              caminho de um arquivo .py, opcionalmente com ':VARIAVEL', ou
+              caminho de um layout .json (ver `LayoutFile`).
+              Sem variável, usa PARKING_SPOTS_CUSTOM ou PARKING_SPOTS.
+
+    Retorna:
+        A lista de vagas (retângulos ou polígonos) definida no módulo.
+    """
+    if spec.endswith(".json"):
+        return load_layout_file(spec).spots
+
+    source, name = _split_spec(spec)
+
+    if source.endswith(".py") or os.path.sep in source:
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"Layout não encontrado: {source}")
+        module_name = os.path.splitext(os.path.basename(source))[0]
+        module_spec = importlib.util.spec_from_file_location(module_name, source)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(source)
+
+    names = (name,) if name else LAYOUT_NAMES
+    for candidate in names:
+        if hasattr(module, candidate):
+            return getattr(module, candidate)
+    raise ValueError(f"Layout '{spec}' não define {' ou '.join(names)}")
+
+
+def _layout_cache(layout_path: str, spots: list, frame_shape: tuple):
+    """
+    (cache carregado ou None, caminho do arquivo de cache) para um layout .json.
+    """
+    path = cache_path(layout_path, spots, frame_shape)
+    if not os.path.exists(path):
+        return None, path
+    try:
+        return LayoutCache.load(path), path
+    except (OSError, ValueError, KeyError):
+        # Cache corrompido ou de outra versão: é recriado
+        return None, path
+
+
+def create_detector(kind: str, layout=None, spot_gate=None, color_cache=None,
+                    processing_scale: float = 1.0, profiler=None, motion_selector=None):
+    """
+    Cria um detector pelo tipo ('rect', 'improved' ou 'polygon').
+
+    Parâmetros:
+        kind: Tipo do detector.
+        layout: Lista de vagas ou spec aceita por `load_layout`.
+                Padrão: o layout de configuração do tipo.
+        spot_gate: `SpotChangeGate` opcional repassado ao detector.
+        color_cache: `SpotColorCache` opcional repassado ao detector.
+        processing_scale: Se menor que 1, a detecção roda em resolução reduzida
+                          (ver `ScaledDetector`).
+        profiler: `StageProfiler` opcional repassado ao detector.
+        motion_selector: `MotionSpotSelector` opcional repassado ao detector.
+
+    Com um layout .json que declara a resolução, o detector usa o cache
+    pré-calculado ao lado do arquivo (`LayoutCache`); se ele ainda não
+    existir, é gravado a partir do detector recém-criado.
+    """
+    if kind not in DETECTORS:
+        raise ValueError(f"Detector desconhecido: {kind} (opções: {', '.join(DETECTORS)})")
+    if layout is None:
+        layout = DEFAULT_LAYOUTS[kind]
+    layout_cache = cache_file = frame_shape = None
+    if isinstance(layout, str) and layout.endswith(".json"):
+        layout_file = load_layout_file(layout)
+        frame_shape = layout_file.frame_shape
+        # Cada tipo recebe a geometria que entende (polígonos ou bounding boxes)
+        layout_path = layout
+        layout = layout_file.polygons if kind == "polygon" else layout_file.rects
+        if frame_shape is not None:
+            layout_cache, cache_file = _layout_cache(layout_path, layout, frame_shape)
+    elif isinstance(layout, str):
+        layout = load_layout(layout)
+    detector = DETECTORS[kind](layout, spot_gate=spot_gate, color_cache=color_cache,
+                               profiler=profiler, motion_selector=motion_selector,
+                               layout_cache=layout_cache)
+    if cache_file is not None and layout_cache is None:
+        try:
+            save_layout_cache(cache_file, detector, frame_shape)
+        except OSError:
+            # Diretório sem permissão de escrita: segue sem cache
+            pass
+    if processing_scale != 1.0:
+        detector = ScaledDetector(detector, processing_scale)
+    return detector
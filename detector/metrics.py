@@ -0,0 +1,291 @@
+import os
+import threading
+from typing import NamedTuple
+from detector.events import OccupancyTracker
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Metric(NamedTuple):
+    """
+    Família de métricas no modelo do Prometheus.
+
+    `samples` é uma lista de (sufixo do nome, rótulos, valor).
+    """
+    name: str
+    kind: str
+    help: str
+    samples: list
+
+
+def _summary(name: str, help: str, times, labels: dict = None) -> Metric:
+    """
+    Summary (percentis, soma e contagem, em segundos) a partir de um `RollingTimes`.
+    """
+    labels = labels or {}
+    samples = []
+    if times.count:
+        for quantile, ms in zip(QUANTILES, times.percentiles([q * 100 for q in QUANTILES])):
+            samples.append(("", dict(labels, quantile=str(quantile)), ms / 1000))
+    samples.append(("_sum", labels, times.total))
+    samples.append(("_count", labels, times.count))
+    return Metric(name, "summary", help, samples)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Métricas de saúde do detector, no formato texto do Prometheus.
+
+    Os componentes já mantêm seus próprios contadores (`frames_read`,
+    `skipped`, `computed`...), cada um escrito por uma única thread. O
+    registro não muda o caminho quente: ele só guarda referências aos
+    componentes (`watch_*`) e lê os contadores quando as métricas são
+    pedidas (`collect`, `render`, `dump`), sem locks.
+
+    As mudanças de estado por vaga vêm de um `OccupancyTracker` que o
+    processamento já mantém (`watch_tracker`); sem um, `observe_record`
+    acompanha os registros com um tracker próprio.
+    """
+
+    def __init__(self, prefix: str = "parking", labels: dict = None, hysteresis: int = 3):
+        """
+        Parâmetros:
+            prefix: Prefixo do nome das métricas.
+            labels: Rótulos fixos acrescentados a todas as amostras (ex.: {"camera": "entrada"}).
+            hysteresis: Frames para confirmar uma mudança de estado em `observe_record`.
+        """
+        self.prefix = prefix
+        self.labels = labels or {}
+        self.hysteresis = hysteresis
+        self.tracker = None
+        self._owns_tracker = False
+        self._collectors = []
+        self._dump_stop = None
+        self._dump_thread = None
+
+    def add_collector(self, collector):
+        """
+        Registra uma função sem argumentos que retorna uma lista de `Metric`.
+        """
+        self._collectors.append(collector)
+        return collector
+
+    def watch_tracker(self, tracker):
+        """
+        Estado e mudanças confirmadas por vaga, lidos de um `OccupancyTracker` existente.
+        """
+        self.tracker = tracker
+        self._owns_tracker = False
+
+    def observe_record(self, record: dict):
+        """
+        Atualiza os estados por vaga com um registro de `detection_record`.
+
+        Só para quem não tem um tracker próprio: com `watch_tracker`, não faz nada.
+        """
+        if self.tracker is None:
+            self.tracker = OccupancyTracker(hysteresis=self.hysteresis, emit_initial=False)
+            self._owns_tracker = True
+        if self._owns_tracker:
+            self.tracker.update_record(record)
+
+    def _name(self, name: str) -> str:
+        return f"{self.prefix}_{name}"
+
+    def watch_stats(self, stats):
+        """
+        Frames analisados, tempo de detecção e latência desde a captura (ThroughputStats).
+        """
+        def collect():
+            return [
+                Metric(self._name("frames_processed_total"), "counter",
+                       "Frames analisados pelo detector.", [("", {}, stats.frames)]),
+                _summary(self._name("detect_seconds"), "Tempo de detecção por frame.",
+                         stats.detect_times),
+                _summary(self._name("capture_latency_seconds"),
+                         "Latência da captura do frame até o resultado.", stats.latencies),
+            ]
+        return self.add_collector(collect)
+
+    def watch_capture(self, capture):
+        """
+        Frames lidos, pulados e descartados e a profundidade da fila (ThreadedCapture).
+        """
+        def collect():
+            return [
+                Metric(self._name("frames_read_total"), "counter",
+                       "Frames decodificados pela captura.", [("", {}, capture.frames_read)]),
+                Metric(self._name("frames_skipped_total"), "counter",
+                       "Frames pulados pelo passo de amostragem (sem decodificação).",
+                       [("", {}, capture.frames_skipped)]),
+                Metric(self._name("frames_dropped_total"), "counter",
+                       "Frames descartados porque a detecção não acompanhou a captura.",
+                       [("", {}, capture.dropped_frames)]),
+                Metric(self._name("capture_queue_depth"), "gauge",
+                       "Frames decodificados aguardando na fila.", [("", {}, capture.queue_depth)]),
+            ]
+        return self.add_collector(collect)
+
+    def watch_detector(self, detector):
+        """
+        Vagas avaliadas x reaproveitadas, cores e critérios do detector.
+
+        Funciona com os detectores e com os envoltórios (GatedDetector,
+        ScaledDetector), lendo `spot_gate`, `motion_selector`, `color_cache`,
+        `frames_reused`, `kmeans_stats` e `criteria_stats` quando existirem.
+        """
+        def collect():
+            metrics = []
+            gate = getattr(detector, "spot_gate", None)
+            if gate is not None:
+                metrics.append(Metric(self._name("spot_evaluations_total"), "counter",
+                                      "Avaliações de vaga, executadas ou reaproveitadas (SpotChangeGate).",
+                                      [("", {"result": "executed"}, gate.evaluated),
+                                       ("", {"result": "skipped"}, gate.skipped)]))
+            selector = getattr(detector, "motion_selector", None)
+            if selector is not None:
+                metrics.append(Metric(self._name("motion_spot_selections_total"), "counter",
+                                      "Vagas analisadas ou puladas conforme as regiões com movimento.",
+                                      [("", {"result": "evaluated"}, selector.evaluated),
+                                       ("", {"result": "skipped"}, selector.skipped)]))
+                metrics.append(Metric(self._name("motion_regions_total"), "counter",
+                                      "Regiões com movimento (componentes conexos) encontradas.",
+                                      [("", {}, selector.regions)]))
+            cache = getattr(detector, "color_cache", None)
+            kmeans = [stats for stats in (getattr(detector, "kmeans_stats", None),
+                                          getattr(cache, "kmeans_stats", None)) if stats is not None]
+            if kmeans:
+                metrics.append(Metric(self._name("kmeans_calls_total"), "counter",
+                                      "Chamadas ao k-means da cor dominante.",
+                                      [("", {"variant": "full"}, sum(stats.full for stats in kmeans)),
+                                       ("", {"variant": "fast"}, sum(stats.fast for stats in kmeans))]))
+            if cache is not None:
+                metrics.append(Metric(self._name("spot_colors_total"), "counter",
+                                      "Cores de vaga calculadas ou reaproveitadas (SpotColorCache).",
+                                      [("", {"result": "computed"}, cache.computed),
+                                       ("", {"result": "reused"}, cache.reused)]))
+            reused = getattr(detector, "frames_reused", None)
+            if reused is not None:
+                metrics.append(Metric(self._name("frames_reused_total"), "counter",
+                                      "Frames sem movimento que repetiram o resultado anterior.",
+                                      [("", {}, reused)]))
+            criteria = getattr(detector, "criteria_stats", None)
+            if criteria and getattr(detector, "lazy", False):
+                metrics.append(Metric(self._name("criterion_evaluations_total"), "counter",
+                                      "Critérios avaliados no modo preguiçoso.",
+                                      [("", {"criterion": name}, stats.evaluated)
+                                       for name, stats in criteria.items()]))
+            return metrics
+        return self.add_collector(collect)
+
+    def watch_profiler(self, profiler):
+        """
+        Percentis de cada etapa medida por um StageProfiler.
+        """
+        def collect():
+            metrics = []
+            for stage, times in profiler.stage_times().items():
+                metrics.append(_summary(self._name("stage_seconds"), "Tempo por etapa do processamento.",
+                                        times, {"stage": stage}))
+            return metrics
+        return self.add_collector(collect)
+
+    def _builtin(self) -> list:
+        metrics = []
+        states = self.tracker.states if self.tracker is not None else None
+        if states is not None:
+            changes = self.tracker.spot_changes
+            metrics.append(Metric(self._name("spot_state_changes_total"), "counter",
+                                  "Mudanças de estado confirmadas por vaga.",
+                                  [("", {"spot": idx + 1}, changes.get(idx, 0))
+                                   for idx in range(len(states))]))
+            metrics.append(Metric(self._name("spot_occupied"), "gauge",
+                                  "Estado confirmado de cada vaga (1 = ocupada).",
+                                  [("", {"spot": idx + 1}, occupied)
+                                   for idx, occupied in enumerate(states)]))
+        return metrics
+
+    def collect(self) -> list:
+        """
+        Lê todas as métricas agora.
+        """
+        metrics = self._builtin()
+        for collector in self._collectors:
+            metrics.extend(collector())
+
+        # Junta famílias com o mesmo nome (ex.: stage_seconds de várias etapas)
+        merged = {}
+        for metric in metrics:
+            if metric.name in merged:
+                merged[metric.name].samples.extend(metric.samples)
+            else:
+                merged[metric.name] = Metric(metric.name, metric.kind, metric.help, list(metric.samples))
+        return list(merged.values())
+
+    def render(self) -> str:
+        """
+        Métricas no formato texto de exposição do Prometheus (versão 0.0.4).
+        """
+        lines = []
+        for metric in self.collect():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples:
+                labels = dict(self.labels, **labels)
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """
+        Grava as métricas em `path` (ex.: para o textfile collector do node_exporter).
+
+        A escrita é atômica: um arquivo temporário substitui o anterior.
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def start_dumping(self, path: str, interval: float = 10.0):
+        """
+        Grava as métricas em `path` a cada `interval` segundos, em uma thread daemon.
+        """
+        self.stop_dumping()
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.dump(path)
+
+        self._dump_stop = stop
+        self._dump_thread = threading.Thread(target=run, name="metrics-dump", daemon=True)
+        self._dump_thread.start()
+
+    def stop_dumping(self, path: str = None):
+        """
+        Para a gravação periódica (e grava uma última vez em `path`, se informado).
+        """
+        if self._dump_thread is not None:
+            self._dump_stop.set()
+            self._dump_thread.join()
+            self._dump_thread = None
+        if path is not None:
+            self.dump(path)
@@ -0,0 +1,195 @@
+import cv2
+import numpy as np
+from detector.spatial_index import SpotGrid
+
+
+class MotionGate:
+    """
+    Detector de movimento barato, sobre uma versão reduzida do frame em cinza.
+
+    Compara o frame com o último frame em que houve movimento (o último
+    analisado). Assim, mudanças lentas se acumulam até passar do limite em vez
+    de passarem despercebidas entre frames consecutivos.
+    """
+
+    def __init__(self, scale: float = 0.25, pixel_threshold: int = 25,
+                 min_changed_fraction: float = 0.002):
+        """
+        Parâmetros:
+            scale: Fator de redução do frame antes da comparação.
+            pixel_threshold: Diferença mínima de intensidade para um pixel contar como alterado.
+            min_changed_fraction: Fração de pixels alterados que caracteriza movimento.
+        """
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.reference = None
+
+        # Contadores
+        self.frames_checked = 0
+        self.frames_passed = 0
+
+    def _small_gray(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def _changed_fraction(self, small: np.ndarray) -> float:
+        if self.reference is None or self.reference.shape != small.shape:
+            return 1.0
+        diff = cv2.absdiff(self.reference, small)
+        _, changed = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(changed) / changed.size
+
+    def update(self, frame: np.ndarray) -> bool:
+        """
+        Retorna True se houve movimento (e o frame deve ser analisado).
+
+        O primeiro frame sempre passa. A referência só é trocada quando há movimento.
+        """
+        self.frames_checked += 1
+        small = self._small_gray(frame)
+        moved = self._changed_fraction(small) >= self.min_changed_fraction
+
+        if moved:
+            self.reference = small
+            self.frames_passed += 1
+        return moved
+
+    def reset(self):
+        """
+        Esquece a referência; o próximo frame será analisado.
+        """
+        self.reference = None
+
+
+class MotionSpotSelector:
+    """
+    Escolhe, a cada frame, só as vagas tocadas por regiões com movimento.
+
+    Uma vez por frame, a versão reduzida em cinza é comparada com uma
+    referência; os pixels alterados são dilatados e agrupados em componentes
+    conexos, e as bounding boxes dos componentes são consultadas em um
+    `SpotGrid` das vagas. Só as vagas encontradas são analisadas; as demais
+    mantêm o resultado anterior (`results`).
+
+    A referência só é atualizada onde houve mudança, então alterações lentas
+    se acumulam até passar do limite, como no `MotionGate`. No primeiro
+    frame, e sempre que o contexto (ex.: o fundo), o layout ou a resolução
+    mudam, todas as vagas são analisadas.
+    """
+
+    def __init__(self, scale: float = 0.25, pixel_threshold: int = 25, dilate: int = 3,
+                 cell_size: int = 16):
+        """
+        Parâmetros:
+            scale: Fator de redução do frame antes da comparação.
+            pixel_threshold: Diferença mínima de intensidade para um pixel contar como alterado.
+            dilate: Lado do elemento estruturante da dilatação (0 desliga).
+            cell_size: Lado das células do índice, em pixels da imagem reduzida.
+        """
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        self.kernel = np.ones((dilate, dilate), dtype=np.uint8) if dilate > 1 else None
+        self.cell_size = cell_size
+        self.results = []
+        self.reference = None
+        self._grid = None
+        self._boxes = None
+        self._context = None
+        self._pending = set()
+
+        # Contadores
+        self.evaluated = 0
+        self.skipped = 0
+        self.regions = 0
+
+    def _small_gray(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def _reset(self, boxes: list, context, small_shape: tuple):
+        s = self.scale
+        # Caixas na resolução reduzida, arredondadas para fora
+        scaled = [(int(np.floor(x * s)), int(np.floor(y * s)),
+                   int(np.ceil((x + w) * s)) - int(np.floor(x * s)),
+                   int(np.ceil((y + h) * s)) - int(np.floor(y * s)))
+                  for x, y, w, h in boxes]
+        self._grid = SpotGrid(scaled, self.cell_size)
+        self._boxes = boxes
+        self._context = context
+        self.results = [None] * len(boxes)
+        self.reference = None
+        self._pending.clear()
+
+    def reset(self):
+        """
+        Esquece a referência e os resultados; no próximo frame todas as vagas são analisadas.
+        """
+        self.reference = None
+        self._boxes = None
+        self._context = None
+
+    def invalidate(self, indices):
+        """
+        Marca vagas para análise no próximo frame (ex.: fundo atualizado no próprio array).
+        """
+        self._pending.update(int(idx) for idx in indices)
+
+    def select(self, frame: np.ndarray, context, boxes: list) -> np.ndarray:
+        """
+        Índices das vagas a analisar neste frame.
+
+        Parâmetros:
+            frame: Frame atual.
+            context: Objeto de que os resultados dependem (ex.: o frame de fundo).
+            boxes: Bounding boxes (x, y, w, h) das vagas (a mesma lista a cada frame).
+
+        Depois da análise, o chamador grava os novos resultados em `results`.
+        """
+        small = self._small_gray(frame)
+        if (boxes is not self._boxes or context is not self._context or self.reference is None
+                or self.reference.shape != small.shape):
+            self._reset(boxes, context, small.shape)
+            self.reference = small
+            self.evaluated += len(boxes)
+            return np.arange(len(boxes))
+
+        diff = cv2.absdiff(small, self.reference)
+        _, changed = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        if self.kernel is not None:
+            changed = cv2.dilate(changed, self.kernel)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(changed, connectivity=8)
+        self.regions += count - 1
+        indices = self._grid.query_many(stats[1:, :4])
+        if self._pending:
+            indices = np.union1d(indices, [idx for idx in self._pending if idx < len(boxes)])
+            self._pending.clear()
+        if count > 1:
+            np.copyto(self.reference, small, where=changed > 0)
+
+        self.evaluated += len(indices)
+        self.skipped += len(boxes) - len(indices)
+        return indices
+
+    def summary(self) -> str:
+        total = self.evaluated + self.skipped
+        ratio = self.skipped / total if total else 0.0
+        return (f"Vagas com movimento: {self.evaluated} | sem movimento: {self.skipped} "
+                f"({ratio:.0%})")
+
+
+def select_spots(selector, frame: np.ndarray, context, boxes: list) -> tuple:
+    """
+    (índices a analisar, lista de resultados a preencher) para um detector.
+
+    Sem `selector`, todas as vagas são analisadas em uma lista nova; com um
+    `MotionSpotSelector`, a lista é a dele, com os resultados anteriores.
+    """
+    if selector is None:
+        return range(len(boxes)), [None] * len(boxes)
+    indices = selector.select(frame, context, boxes)
+    return indices, selector.results
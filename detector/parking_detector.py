@@ -1,12 +1,44 @@
+import time
 import cv2
 import numpy as np
 from config import PARKING_SPOTS, OCCUPANCY_THRESHOLD
-from detector.color_utils import get_dominant_color
+from detector.color_utils import KMeansStats, get_dominant_color
+from detector.batch_utils import gray_stack, run_batches
+from detector.background_utils import BackgroundCache
+from detector.crop_utils import CroppedGray
+from detector.motion import select_spots
+from detector.scaling import scale_rects
 
 
 class ParkingDetector:
-    def __init__(self):
-        self.spots = PARKING_SPOTS
+    def __init__(self, spots=None, spot_gate=None, color_cache=None, profiler=None,
+                 motion_selector=None, layout_cache=None):
+        """
+        Parâmetros:
+            spots: Lista de vagas (x, y, w, h). Padrão: PARKING_SPOTS.
+            spot_gate: `SpotChangeGate` opcional; vagas sem mudança reutilizam o resultado anterior.
+            color_cache: `SpotColorCache` opcional; a cor é calculada uma vez por
+                         ocupação, com o k-means rápido.
+            profiler: `StageProfiler` opcional; mede o tempo de cada etapa e de cada vaga.
+            motion_selector: `MotionSpotSelector` opcional; só as vagas tocadas por
+                             regiões com movimento são analisadas.
+            layout_cache: `LayoutCache` opcional com os recortes pré-calculados.
+        """
+        self.spots = spots if spots is not None else PARKING_SPOTS
+        self.spot_gate = spot_gate
+        self.color_cache = color_cache
+        # Chamadas ao k-means deste detector (sem `color_cache`)
+        self.kmeans_stats = KMeansStats()
+        self.profiler = profiler
+        self.motion_selector = motion_selector
+        self.occupancy_threshold = OCCUPANCY_THRESHOLD
+        # Conversão para cinza só na região das vagas
+        self._gray = CroppedGray(self.spots)
+        if layout_cache is not None:
+            layout_cache.check(self.spots)
+            self._gray.preload(layout_cache.frame_shape, layout_cache.crops)
+        self._background_gray = BackgroundCache(
+            lambda bg: cv2.cvtColor(bg, cv2.COLOR_BGR2GRAY))
 
     def detect(self, frame: np.ndarray, bg_frame: np.ndarray=None) -> list:
         """
@@ -14,29 +46,147 @@ class ParkingDetector:
           - status: True se ocupada, False caso contrário
           - cor: tupla RGB/HSV da cor dominante quando ocupada
         """
-        results = []
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        for idx, (x, y, w, h) in enumerate(self.spots):
+        prof = self.profiler
+        if prof is not None:
+            t = time.perf_counter()
+        gray = self._gray.convert(frame)
+        indices, results = select_spots(self.motion_selector, frame, bg_frame, self.spots)
+        if prof is not None:
+            t = prof.lap("gray", t)
+        gate = self.spot_gate
+        if gate is not None:
+            gate.bind(bg_frame)
+        for idx in indices:
+            x, y, w, h = self.spots[idx]
             roi = gray[y:y+h, x:x+w]
+            if roi.size == 0:
+                # Vaga fora do frame
+                results[idx] = (False, None)
+                continue
+            if prof is not None:
+                spot_start = t
+            if gate is not None:
+                signature, cached = gate.lookup(idx, roi)
+                if prof is not None:
+                    t = prof.lap("gate", t)
+                if cached is not None:
+                    results[idx] = cached
+                    if self.color_cache is not None:
+                        self.color_cache.advance(idx, cached[0])
+                    continue
             occupied = False
 
             if bg_frame is not None:
                 bg_roi = cv2.cvtColor(bg_frame[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY)
                 diff = cv2.absdiff(bg_roi, roi)
                 non_zero = cv2.countNonZero(diff)
-                occupied = non_zero >= OCCUPANCY_THRESHOLD
+                occupied = non_zero >= self.occupancy_threshold
             else:
                 _, thresh = cv2.threshold(roi, 200, 255, cv2.THRESH_BINARY_INV)
                 non_zero = cv2.countNonZero(thresh)
-                occupied = non_zero >= OCCUPANCY_THRESHOLD
+                occupied = non_zero >= self.occupancy_threshold
+            if prof is not None:
+                t = prof.lap("diff", t)
+
+            color = self._spot_color(idx, occupied, frame[y:y+h, x:x+w])
+            if prof is not None:
+                t = prof.lap("color", t)
+                prof.add_spot(idx, t - spot_start)
+            results[idx] = (occupied, color)
+            if gate is not None:
+                gate.store(idx, signature, results[idx])
+
+        return list(results)
+
+    def _spot_color(self, idx: int, occupied: bool, spot_img: np.ndarray):
+        """
+        Cor dominante da vaga (None se livre); memoizada por episódio com `color_cache`.
+        """
+        if self.color_cache is not None:
+            return self.color_cache.update(idx, occupied, spot_img)
+        return get_dominant_color(spot_img, stats=self.kmeans_stats) if occupied else None
+
+    def scaled_copy(self, scale: float) -> "ParkingDetector":
+        """
+        Cópia do detector para frames reduzidos por `scale` (vagas e threshold reescalados).
+
+        O `layout_cache` não é repassado: ele vale só para a geometria e a
+        resolução nativas (a cópia recalcula os recortes).
+        """
+        copy = ParkingDetector(scale_rects(self.spots, scale), self.spot_gate, self.color_cache,
+                               self.profiler, self.motion_selector)
+        copy.occupancy_threshold = self.occupancy_threshold * scale * scale
+        copy.kmeans_stats = self.kmeans_stats
+        return copy
+
+    def refresh_background(self, bg_frame: np.ndarray, indices):
+        """
+        Atualiza o cache do fundo só nas vagas `indices` (fundo alterado no próprio array).
+        """
+        def update(gray):
+            for idx in indices:
+                x, y, w, h = self.spots[idx]
+                if gray[y:y+h, x:x+w].size:
+                    gray[y:y+h, x:x+w] = cv2.cvtColor(bg_frame[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY)
+
+        self._background_gray.refresh(bg_frame, update)
+        if self.spot_gate is not None:
+            self.spot_gate.invalidate(indices)
+        if self.motion_selector is not None:
+            self.motion_selector.invalidate(indices)
+
+    def detect_batch(self, frames, bg_frame: np.ndarray = None, batch_size: int = 32):
+        """
+        Detecta a ocupação em vários frames de uma vez.
+
+        Parâmetros:
+            frames: Array (N, H, W, 3) ou iterável de frames BGR.
+            bg_frame: Frame de fundo (opcional), como em `detect`.
+            batch_size: Quantidade de frames processados por bloco.
+
+        Retorna:
+            Tupla (ocupação, cores): matriz booleana (N, vagas) e, para cada
+            frame, a lista de cores dominantes (None quando a vaga está livre).
+        """
+        return run_batches(lambda stack: self._detect_stack(stack, bg_frame),
+                           frames, len(self.spots), batch_size)
+
+    def _detect_stack(self, stack: np.ndarray, bg_frame: np.ndarray = None):
+        """
+        Aplica a mesma regra de `detect` a um bloco (N, H, W, 3), vaga a vaga,
+        mas vetorizada no eixo dos frames.
+        """
+        gray = gray_stack(stack)
+        bg_gray = None
+        if bg_frame is not None:
+            bg_gray = self._background_gray.get(bg_frame, stack.shape[1:])
+
+        occupancy = np.zeros((len(stack), len(self.spots)), dtype=bool)
+        for idx, (x, y, w, h) in enumerate(self.spots):
+            rois = gray[:, y:y+h, x:x+w]
+            if rois.size == 0:
+                continue
+            if bg_gray is not None:
+                bg_roi = bg_gray[y:y+h, x:x+w]
+                # Igual a absdiff + countNonZero em uint8, para todos os frames de uma vez
+                non_zero = np.count_nonzero(rois != bg_roi, axis=(1, 2))
+            else:
+                # Equivale a THRESH_BINARY_INV com limiar 200
+                non_zero = np.count_nonzero(rois.reshape(len(rois), -1) <= 200, axis=1)
+            occupancy[:, idx] = np.asarray(non_zero) >= self.occupancy_threshold
 
-            color = None
-            if occupied:
-                spot_img = frame[y:y+h, x:x+w]
-                color = get_dominant_color(spot_img)
-            results.append((occupied, color))
+        colors = [[None] * len(self.spots) for _ in range(len(stack))]
+        if self.color_cache is not None:
+            # Em ordem de frame, para o cache acompanhar os episódios de ocupação
+            for n in range(len(stack)):
+                for idx, (x, y, w, h) in enumerate(self.spots):
+                    colors[n][idx] = self._spot_color(idx, occupancy[n, idx], stack[n, y:y+h, x:x+w])
+        else:
+            for n, idx in zip(*np.nonzero(occupancy)):
+                x, y, w, h = self.spots[idx]
+                colors[n][idx] = get_dominant_color(stack[n, y:y+h, x:x+w], stats=self.kmeans_stats)
 
-        return results
+        return occupancy, colors
 
     def draw_annotations(self, frame: np.ndarray, detections: tuple) -> np.ndarray:
         """
@@ -51,6 +201,8 @@ class ParkingDetector:
         Retorna:
             frame: Frame com as anotações desenhadas.
         """
+        if self.profiler is not None:
+            start = time.perf_counter()
         for idx, ((x, y, w, h), (occupied, color)) in enumerate(zip(self.spots, detections)):
             label = "Ocupada" if occupied else "Livre"
             color_box = (0, 0, 255) if occupied else (0, 255, 0)
@@ -62,4 +214,6 @@ class ParkingDetector:
             if color:
                 cv2.circle(frame, (x + 10, y + 10), 8, color, -1)
 
+        if self.profiler is not None:
+            self.profiler.lap("draw", start)
         return frame
@@ -0,0 +1,227 @@
+import json
+import time
+import cv2
+from detector.profiling import RollingTimes
+
+
+def detection_record(frame_number: int, timestamp: float, detections: list) -> dict:
+    """
+    Monta o registro de um frame no formato das saídas JSON Lines.
+
+    Retorna:
+        {"frame", "timestamp", "spots": [{"occupied", "color"}, ...]}
+    """
+    return {
+        "frame": frame_number,
+        "timestamp": round(timestamp, 3),
+        "spots": [
+            {"occupied": bool(occupied), "color": list(color) if color is not None else None}
+            for occupied, color in detections
+        ],
+    }
+
+
+def capture_fps(capture) -> float:
+    """
+    FPS informado pela origem (0 quando desconhecido, ex.: algumas câmeras).
+    """
+    cap = getattr(capture, "cap", capture)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    return fps if fps and fps > 0 else 0.0
+
+
+def frame_timestamp(fps: float, frame_number: int) -> float:
+    """
+    Tempo do frame em segundos: posição no vídeo quando o FPS é conhecido ou
+    horário atual caso contrário.
+    """
+    if fps > 0:
+        return (frame_number - 1) / fps
+    return time.time()
+
+
+class ThroughputStats:
+    """
+    Acumula o tempo de processamento por frame.
+
+    Guarda também as últimas medições do tempo de detecção e da latência
+    desde a captura, para percentis (ver `RollingTimes`).
+    """
+
+    def __init__(self, window: int = 1024):
+        self.frames = 0
+        self.busy_time = 0.0
+        self.started = time.perf_counter()
+        self.detect_times = RollingTimes(window)
+        self.latencies = RollingTimes(window)
+
+    def add(self, seconds: float, latency: float = None):
+        """
+        Registra um frame: tempo de detecção e, se conhecida, a latência desde a captura.
+        """
+        self.frames += 1
+        self.busy_time += seconds
+        self.detect_times.add(seconds)
+        if latency is not None:
+            self.latencies.add(latency)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def ms_per_frame(self) -> float:
+        return self.busy_time * 1000 / self.frames if self.frames else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.frames} frames em {self.elapsed:.2f}s | "
+                f"{self.fps:.1f} frames/s | {self.ms_per_frame:.2f} ms/frame")
+
+
+class GatedDetector:
+    """
+    Envolve um detector e só executa a detecção quando há movimento na cena.
+
+    Sem movimento (segundo o `MotionGate`), o último resultado é repetido.
+    Os demais atributos (ex.: `spots`, `draw_annotations`) são os do detector.
+    """
+
+    def __init__(self, detector, motion_gate=None):
+        self.detector = detector
+        self.motion_gate = motion_gate
+        self.last_detections = None
+        self.frames_reused = 0
+
+    def __getattr__(self, name):
+        return getattr(self.detector, name)
+
+    def detect(self, frame, bg_frame=None) -> list:
+        moved = True
+        if self.motion_gate is not None:
+            moved = self.motion_gate.update(frame)
+        if not moved and self.last_detections is not None:
+            self.frames_reused += 1
+            return self.last_detections
+
+        self.last_detections = self.detector.detect(frame, bg_frame)
+        return self.last_detections
+
+
+def iter_records(detector, capture, bg_frame=None, stats: ThroughputStats = None,
+                 fill_skipped: bool = True, frame_offset: int = 0, adaptive_background=None,
+                 profiler=None):
+    """
+    Lê e analisa os frames de `capture`, gerando um registro por frame.
+
+    Frames que a captura pulou (passo/`stride` ou descarte em tempo real)
+    recebem, com `fill_skipped`, um registro com o último estado conhecido.
+    `frame_offset` é somado à numeração (ex.: vídeo retomado no meio).
+    Com `adaptive_background` (AdaptiveBackground), o fundo usado é o dele,
+    atualizado a cada frame nas vagas livres.
+    Com `profiler` (StageProfiler), registra a espera pela leitura (`read`),
+    a detecção (`detect`) e a latência desde a captura do frame.
+    """
+    fps = capture_fps(capture)
+    frame_number = frame_offset
+    detections = None
+    while True:
+        if profiler is not None:
+            read_start = time.perf_counter()
+        ret, frame = capture.read()
+        if not ret:
+            break
+        if profiler is not None:
+            profiler.lap("read", read_start)
+        previous_number = frame_number
+        if hasattr(capture, "frame_number"):
+            frame_number = frame_offset + capture.frame_number
+        else:
+            frame_number += 1
+
+        if fill_skipped and detections is not None:
+            for skipped in range(previous_number + 1, frame_number):
+                yield detection_record(skipped, frame_timestamp(fps, skipped), detections)
+
+        start = time.perf_counter()
+        if adaptive_background is not None:
+            bg_frame = adaptive_background.background(frame.shape)
+        detections = detector.detect(frame, bg_frame)
+        if adaptive_background is not None:
+            adaptive_background.update(frame, detections)
+        if stats is not None:
+            capture_time = getattr(capture, "capture_time", None)
+            now = time.perf_counter()
+            stats.add(now - start, now - capture_time if capture_time is not None else None)
+        if profiler is not None:
+            profiler.lap("detect", start)
+            # Sem horário de captura (ex.: VideoCapture direto), a latência conta desde a leitura
+            profiler.frame_done(getattr(capture, "capture_time", None) or read_start)
+
+        yield detection_record(frame_number, frame_timestamp(fps, frame_number), detections)
+
+
+def run_headless(detector, capture, bg_frame=None, sink=None, max_frames: int = None,
+                 fill_skipped: bool = True, tracker=None, adaptive_background=None,
+                 snapshot=None, history=None, profiler=None, metrics=None) -> ThroughputStats:
+    """
+    Processa todos os frames o mais rápido possível, sem janela.
+
+    Parâmetros:
+        detector: Qualquer detector com `detect(frame, bg_frame)`.
+        capture: Objeto com `read()` (ex.: ThreadedCapture).
+        bg_frame: Frame de fundo (opcional).
+        sink: Arquivo de texto onde cada registro é escrito como uma linha JSON.
+        max_frames: Para após analisar essa quantidade de frames (opcional).
+        fill_skipped: Grava também os frames pulados, com o último estado conhecido.
+        tracker: `OccupancyTracker` opcional; se informado, só as transições
+                 são gravadas (e a histerese conta apenas frames analisados).
+        adaptive_background: `AdaptiveBackground` opcional (ver `iter_records`).
+        snapshot: `SnapshotStore` opcional onde cada registro é publicado
+                  (ex.: para o `OccupancyServer`).
+        history: `OccupancyHistory` opcional que recebe todos os registros.
+        profiler: `StageProfiler` opcional (ver `iter_records`).
+        metrics: `MetricsRegistry` opcional; passa a ler as estatísticas desta
+                 execução, a captura, o detector e as mudanças de estado por
+                 vaga (do `tracker`, ou do tracker do `snapshot`, se houver).
+
+    Retorna:
+        ThroughputStats com o total de frames analisados e o tempo gasto.
+    """
+    stats = ThroughputStats()
+    if metrics is not None:
+        metrics.watch_stats(stats)
+        metrics.watch_detector(detector)
+        if hasattr(capture, "queue_depth"):
+            metrics.watch_capture(capture)
+        if profiler is not None:
+            metrics.watch_profiler(profiler)
+    # As mudanças por vaga vêm de um tracker que já roda; só sem nenhum as
+    # métricas acompanham os registros por conta própria
+    existing = tracker if tracker is not None else getattr(snapshot, "tracker", None)
+    observe = metrics is not None and existing is None
+    if metrics is not None and existing is not None:
+        metrics.watch_tracker(existing)
+    if tracker is not None:
+        fill_skipped = False
+        if sink is not None:
+            tracker.subscribe(lambda event: sink.write(json.dumps(event.to_record()) + "\n"))
+
+    for record in iter_records(detector, capture, bg_frame, stats, fill_skipped,
+                               adaptive_background=adaptive_background, profiler=profiler):
+        if snapshot is not None:
+            snapshot.publish_record(record)
+        if history is not None:
+            history.add_record(record)
+        if observe:
+            metrics.observe_record(record)
+        if tracker is not None:
+            tracker.update_record(record)
+        elif sink is not None:
+            sink.write(json.dumps(record) + "\n")
+        if max_frames is not None and stats.frames >= max_frames:
+            break
+    return stats
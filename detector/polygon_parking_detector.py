@@ -1,15 +1,73 @@
+import time
 import cv2
 import numpy as np
 from config_diagonal import PARKING_SPOTS_CUSTOM, POLYGON_OCCUPANCY_THRESHOLD
-from detector.color_utils import get_dominant_color
+from detector.color_utils import get_mean_color
+from detector.background_utils import BackgroundCache
+from detector.crop_utils import CroppedGray
+from detector.motion import select_spots
+from detector.scaling import scale_polygons
+from detector.compiled_layout import CompiledLayout
+from detector.renderer import AnnotationRenderer
+from detector.batch_utils import gray_stack, run_batches
+from detector.layout_file import save_layout_file
+
+# Layout gravado pelo seletor interativo
+CUSTOM_LAYOUT_PATH = "config_custom_polygons.json"
 
 
 class PolygonParkingDetector:
-    def __init__(self, polygons=None):
+    def __init__(self, polygons=None, compiled: bool = False, spot_gate=None, color_cache=None,
+                 profiler=None, motion_selector=None, layout_cache=None):
+        """
+        Parâmetros:
+            polygons: Lista de polígonos (4 pontos cada). Padrão: PARKING_SPOTS_CUSTOM.
+            compiled: Se True, usa o layout compilado (mapa de rótulos) para
+                      avaliar todas as vagas de uma vez na detecção com fundo.
+            spot_gate: `SpotChangeGate` opcional; vagas sem mudança reutilizam o
+                       resultado anterior (não se aplica ao modo compilado).
+            color_cache: `SpotColorCache` opcional; a cor média dentro do polígono
+                         é calculada uma vez por ocupação e reaproveitada.
+            profiler: `StageProfiler` opcional; mede o tempo de cada etapa e de cada vaga.
+            motion_selector: `MotionSpotSelector` opcional; só as vagas tocadas por
+                             regiões com movimento são analisadas (não se aplica
+                             ao modo compilado).
+            layout_cache: `LayoutCache` opcional; bounding boxes, máscaras, layout
+                          compilado e recortes vêm prontos do arquivo, sem
+                          rasterizar os polígonos.
+        """
         self.spots = polygons if polygons is not None else PARKING_SPOTS_CUSTOM
+        self.compiled = compiled
+        self.spot_gate = spot_gate
+        self.color_cache = color_cache
+        self.profiler = profiler
+        self.motion_selector = motion_selector
         self.spot_masks = {}
         self.spot_bounding_boxes = {}
-        self._prepare_masks()
+        self._shape_masks = {}
+        self._compiled_layouts = {}
+        if layout_cache is not None and layout_cache.has_masks:
+            # As máscaras originais (com margem) só são criadas se forem pedidas
+            layout_cache.check(self.spots)
+            self.spot_bounding_boxes = layout_cache.bounding_boxes()
+            self._shape_masks[layout_cache.frame_shape] = layout_cache.masks()
+            self._compiled_layouts[layout_cache.frame_shape] = layout_cache.compiled_layout()
+        else:
+            self._prepare_masks()
+        # Conversão para cinza só na região das vagas
+        self._boxes = [self.spot_bounding_boxes[idx] for idx in range(len(self.spots))]
+        self._gray = CroppedGray(self._boxes)
+        if layout_cache is not None:
+            self._gray.preload(layout_cache.frame_shape, layout_cache.crops)
+        self._background = BackgroundCache(self._build_background)
+        # Criado no primeiro desenho (o modo headless nunca desenha)
+        self._renderer = None
+
+    def _build_renderer(self) -> AnnotationRenderer:
+        polygons = [np.array(polygon) for polygon in self.spots]
+        centers = [(int(np.mean(polygon[:, 0])), int(np.mean(polygon[:, 1]))) for polygon in polygons]
+        return AnnotationRenderer(polygons, [(cx - 50, cy) for cx, cy in centers],
+                                  [(cx, cy - 20) for cx, cy in centers])
         
     def _prepare_masks(self):
         """
@@ -27,26 +85,41 @@ class PolygonParkingDetector:
             y_max = int(np.max(polygon[:, 1]))
             
             self.spot_bounding_boxes[idx] = (x_min, y_min, x_max - x_min, y_max - y_min)
-            
-            # Criar máscara para o polígono
-            mask = np.zeros((y_max - y_min + 50, x_max - x_min + 50), dtype=np.uint8)
-            
-            # Ajustar coordenadas do polígono para a máscara local
-            local_polygon = polygon.copy()
-            local_polygon[:, 0] -= x_min
-            local_polygon[:, 1] -= y_min
-            
-            # Preencher polígono na máscara
-            cv2.fillPoly(mask, [local_polygon.astype(np.int32)], 255)
-            
-            self.spot_masks[idx] = mask
+            self.spot_masks[idx] = self._spot_mask(idx)
+
+    def _spot_mask(self, idx: int) -> np.ndarray:
+        """
+        Máscara original da vaga (com margem), criada na primeira vez que é pedida.
+        """
+        mask = self.spot_masks.get(idx)
+        if mask is not None:
+            return mask
+        polygon = np.array(self.spots[idx])
+        x_min, y_min, w, h = self.spot_bounding_boxes[idx]
+
+        # Criar máscara para o polígono
+        mask = np.zeros((h + 50, w + 50), dtype=np.uint8)
+        
+        # Ajustar coordenadas do polígono para a máscara local
+        local_polygon = polygon.copy()
+        local_polygon[:, 0] -= x_min
+        local_polygon[:, 1] -= y_min
+        
+        # Preencher polígono na máscara
+        cv2.fillPoly(mask, [local_polygon.astype(np.int32)], 255)
+        
+        self.spot_masks[idx] = mask
+        return mask
     
-    def _extract_polygon_roi(self, image, polygon_idx):
+    def _extract_polygon_roi(self, image, polygon_idx, mask=None):
         """
         Extrai a ROI usando a máscara do polígono.
+
+        Se `mask` for informada (já no tamanho da ROI), ela é usada diretamente.
         """
         x, y, w, h = self.spot_bounding_boxes[polygon_idx]
-        mask = self.spot_masks[polygon_idx]
+        if mask is None:
+            mask = self._spot_mask(polygon_idx)
         
         # Extrair região da imagem
         roi = image[y:y+h, x:x+w]
@@ -61,6 +134,104 @@ class PolygonParkingDetector:
         
         return masked_roi, mask
     
+    def _masks_for_shape(self, frame_shape: tuple) -> dict:
+        """
+        Retorna as máscaras já no tamanho das ROIs para a resolução dada.
+
+        O redimensionamento é feito uma vez por resolução, não a cada frame.
+        """
+        shape = tuple(frame_shape[:2])
+        if shape not in self._shape_masks:
+            masks = {}
+            for idx in range(len(self.spots)):
+                x, y, w, h = self.spot_bounding_boxes[idx]
+                roi_h = len(range(shape[0])[y:y+h])
+                roi_w = len(range(shape[1])[x:x+w])
+                mask = self._spot_mask(idx)
+                if (roi_h, roi_w) != mask.shape[:2]:
+                    mask = cv2.resize(mask, (roi_w, roi_h))
+                masks[idx] = mask
+            self._shape_masks[shape] = masks
+        return self._shape_masks[shape]
+
+    def compile_layout(self, frame_shape: tuple) -> CompiledLayout:
+        """
+        Rasteriza todas as vagas em um mapa de rótulos para a resolução dada.
+        """
+        shape = tuple(frame_shape[:2])
+        if shape not in self._compiled_layouts:
+            self._compiled_layouts[shape] = CompiledLayout(
+                self._masks_for_shape(shape), self.spot_bounding_boxes, shape)
+        return self._compiled_layouts[shape]
+
+    def _build_background(self, bg_frame: np.ndarray) -> dict:
+        """
+        Pré-calcula o lado do fundo: cinza, ROIs mascaradas e área das máscaras.
+        """
+        bg_gray = cv2.cvtColor(bg_frame, cv2.COLOR_BGR2GRAY)
+        masks = self._masks_for_shape(bg_gray.shape)
+        rois = {}
+        mask_pixels = {}
+        for idx in range(len(self.spots)):
+            roi_bg, _ = self._extract_polygon_roi(bg_gray, idx, masks[idx])
+            rois[idx] = roi_bg
+            mask_pixels[idx] = cv2.countNonZero(masks[idx])
+
+        return {
+            'gray': bg_gray,
+            'rois': rois,
+            'masks': masks,
+            'mask_pixels': mask_pixels,
+        }
+
+    def register_background(self, bg_frame: np.ndarray, frame_shape: tuple = None) -> dict:
+        """
+        Registra o frame de fundo e pré-calcula tudo que depende só dele.
+
+        Parâmetros:
+            bg_frame: Frame do estacionamento vazio.
+            frame_shape: Forma dos frames do vídeo. Se for diferente da do fundo,
+                         o fundo é redimensionado uma única vez.
+
+        Retorna:
+            Dicionário com o fundo em cinza, as ROIs por vaga, as máscaras e a
+            quantidade de pixels de cada máscara.
+        """
+        if frame_shape is None:
+            frame_shape = bg_frame.shape
+        return self._background.get(bg_frame, frame_shape)
+
+    def scaled_copy(self, scale: float) -> "PolygonParkingDetector":
+        """
+        Cópia do detector para frames reduzidos por `scale` (polígonos e máscaras reescalados).
+
+        O threshold é uma fração da área da vaga, então não muda.
+        O `layout_cache` não é repassado: ele vale só para a geometria e a
+        resolução nativas (a cópia recalcula os recortes e máscaras).
+        """
+        return PolygonParkingDetector(scale_polygons(self.spots, scale), self.compiled,
+                                      self.spot_gate, self.color_cache, self.profiler,
+                                      self.motion_selector)
+
+    def refresh_background(self, bg_frame: np.ndarray, indices):
+        """
+        Atualiza o cache do fundo só nas vagas `indices` (fundo alterado no próprio array).
+        """
+        def update(background):
+            gray = background['gray']
+            for idx in indices:
+                x, y, w, h = self.spot_bounding_boxes[idx]
+                if gray[y:y+h, x:x+w].size == 0:
+                    continue
+                gray[y:y+h, x:x+w] = cv2.cvtColor(bg_frame[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY)
+                background['rois'][idx], _ = self._extract_polygon_roi(gray, idx, background['masks'][idx])
+
+        self._background.refresh(bg_frame, update)
+        if self.spot_gate is not None:
+            self.spot_gate.invalidate(indices)
+        if self.motion_selector is not None:
+            self.motion_selector.invalidate(indices)
+
     def detect(self, frame: np.ndarray, bg_frame: np.ndarray = None) -> list:
         """
         Detecta ocupação usando polígonos.
@@ -76,14 +247,41 @@ class PolygonParkingDetector:
         """
         Detecção usando frame de background.
         """
-        results = []
-        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        bg_gray = cv2.cvtColor(bg_frame, cv2.COLOR_BGR2GRAY)
-        
-        for idx in range(len(self.spots)):
-            # Extrair ROIs
-            roi_frame, mask = self._extract_polygon_roi(frame_gray, idx)
-            roi_bg, _ = self._extract_polygon_roi(bg_gray, idx)
+        prof = self.profiler
+        if prof is not None:
+            t = time.perf_counter()
+        frame_gray = self._gray.convert(frame)
+        background = self.register_background(bg_frame, frame.shape)
+        if prof is not None:
+            t = prof.lap("gray", t)
+        if self.compiled:
+            results = self._detect_compiled(frame, frame_gray, background)
+            if prof is not None:
+                prof.lap("diff", t)
+            return results
+
+        indices, results = select_spots(self.motion_selector, frame, bg_frame, self._boxes)
+        gate = self.spot_gate
+        if gate is not None:
+            gate.bind(bg_frame)
+        for idx in indices:
+            if prof is not None:
+                spot_start = t
+            # Extrair ROIs (o lado do fundo já vem pré-calculado)
+            mask = background['masks'][idx]
+            roi_frame, _ = self._extract_polygon_roi(frame_gray, idx, mask)
+            if prof is not None:
+                t = prof.lap("roi", t)
+            if gate is not None:
+                signature, cached = gate.lookup(idx, roi_frame)
+                if prof is not None:
+                    t = prof.lap("gate", t)
+                if cached is not None:
+                    results[idx] = cached
+                    if self.color_cache is not None:
+                        self.color_cache.advance(idx, cached[0])
+                    continue
+            roi_bg = background['rois'][idx]
             
             # Calcular diferença
             diff = cv2.absdiff(roi_bg, roi_frame)
@@ -95,12 +293,18 @@ class PolygonParkingDetector:
             non_zero_pixels = cv2.countNonZero(diff_masked)
             
             # Determinar ocupação (usando porcentagem da área)
-            total_pixels = cv2.countNonZero(mask)
+            total_pixels = background['mask_pixels'][idx]
             occupied = (non_zero_pixels / total_pixels) >= POLYGON_OCCUPANCY_THRESHOLD if total_pixels > 0 else False
+            if prof is not None:
+                t = prof.lap("diff", t)
             
             # Extrair cor dominante se ocupado
             color = None
-            if occupied:
+            if self.color_cache is not None:
+                x, y, w, h = self.spot_bounding_boxes[idx]
+                color = self.color_cache.update(idx, occupied, frame[y:y+h, x:x+w], mask,
+                                                engine=get_mean_color)
+            elif occupied:
                 x, y, w, h = self.spot_bounding_boxes[idx]
                 spot_img = frame[y:y+h, x:x+w]
                 
@@ -113,20 +317,129 @@ class PolygonParkingDetector:
                     non_zero_pixels_color = spot_img_masked[mask > 0]
                     if len(non_zero_pixels_color) > 0:
                         color = tuple(map(int, np.mean(non_zero_pixels_color, axis=0)))
+            if prof is not None:
+                t = prof.lap("color", t)
+                prof.add_spot(idx, t - spot_start)
             
-            results.append((occupied, color))
+            results[idx] = (occupied, color)
+            if gate is not None:
+                gate.store(idx, signature, results[idx])
         
-        return results
+        return list(results)
     
+    def _detect_compiled(self, frame: np.ndarray, frame_gray: np.ndarray, background: dict) -> list:
+        """
+        Detecção com fundo avaliando todas as vagas em uma única passada.
+        """
+        layout = self.compile_layout(frame.shape)
+        occupied = layout.occupancy(frame_gray, background['gray'], POLYGON_OCCUPANCY_THRESHOLD)
+
+        if self.color_cache is not None:
+            masks = self._masks_for_shape(frame.shape)
+            results = []
+            for idx in range(len(self.spots)):
+                x, y, w, h = self.spot_bounding_boxes[idx]
+                color = self.color_cache.update(idx, occupied[idx], frame[y:y+h, x:x+w], masks[idx],
+                                                engine=get_mean_color)
+                results.append((bool(occupied[idx]), color))
+            return results
+
+        colors = None
+        if occupied.any() and frame.ndim == 3:
+            colors = layout.mean_colors(frame)
+
+        results = []
+        for idx in range(len(self.spots)):
+            color = None
+            if occupied[idx] and colors is not None and layout.mask_pixels[idx] > 0:
+                color = tuple(map(int, colors[idx]))
+            results.append((bool(occupied[idx]), color))
+        return results
+
+    def detect_batch(self, frames, bg_frame: np.ndarray = None, batch_size: int = 32):
+        """
+        Detecta a ocupação em vários frames de uma vez.
+
+        Com fundo, usa sempre o layout compilado, vetorizado nos eixos dos
+        frames e das vagas.
+
+        Parâmetros:
+            frames: Array (N, H, W, 3) ou iterável de frames BGR.
+            bg_frame: Frame de fundo (opcional), como em `detect`.
+            batch_size: Quantidade de frames processados por bloco.
+
+        Retorna:
+            Tupla (ocupação, cores): matriz booleana (N, vagas) e, para cada
+            frame, a lista de cores médias (None quando a vaga está livre).
+        """
+        return run_batches(lambda stack: self._detect_stack(stack, bg_frame),
+                           frames, len(self.spots), batch_size)
+
+    def _detect_stack(self, stack: np.ndarray, bg_frame: np.ndarray = None):
+        """
+        Aplica a regra de `detect` a um bloco (N, H, W, 3).
+        """
+        gray = gray_stack(stack)
+        shape = stack.shape[1:]
+
+        if bg_frame is not None:
+            background = self.register_background(bg_frame, shape)
+            layout = self.compile_layout(shape)
+            occupancy = layout.occupancy(gray, background['gray'], POLYGON_OCCUPANCY_THRESHOLD)
+            means = layout.mean_colors_batch(stack) if occupancy.any() else None
+        else:
+            masks = self._masks_for_shape(shape)
+            occupancy = np.zeros((len(stack), len(self.spots)), dtype=bool)
+            means = np.zeros((len(stack), len(self.spots), 3), dtype=np.float64)
+            for idx in range(len(self.spots)):
+                x, y, w, h = self.spot_bounding_boxes[idx]
+                inside = masks[idx] > 0
+                pixels = gray[:, y:y+h, x:x+w][:, inside]
+                if pixels.shape[1] == 0:
+                    continue
+                variance = pixels.var(axis=1)
+                mean_intensity = pixels.mean(axis=1)
+                occupancy[:, idx] = (variance > 300) & ((mean_intensity < 60) | (mean_intensity > 120))
+                if occupancy[:, idx].any():
+                    means[:, idx] = stack[:, y:y+h, x:x+w][:, inside].mean(axis=1)
+
+        colors = [[None] * len(self.spots) for _ in range(len(stack))]
+        for frame_idx, idx in zip(*np.nonzero(occupancy)):
+            colors[frame_idx][idx] = tuple(map(int, means[frame_idx, idx]))
+
+        return occupancy, colors
+
     def _detect_simple(self, frame: np.ndarray) -> list:
         """
         Detecção simples sem background.
         """
-        results = []
-        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        prof = self.profiler
+        if prof is not None:
+            t = time.perf_counter()
+        frame_gray = self._gray.convert(frame)
+        masks = self._masks_for_shape(frame_gray.shape)
+        indices, results = select_spots(self.motion_selector, frame, None, self._boxes)
+        if prof is not None:
+            t = prof.lap("gray", t)
+        gate = self.spot_gate
+        if gate is not None:
+            gate.bind(None)
         
-        for idx in range(len(self.spots)):
-            roi, mask = self._extract_polygon_roi(frame_gray, idx)
+        for idx in indices:
+            if prof is not None:
+                spot_start = t
+            roi, mask = self._extract_polygon_roi(frame_gray, idx, masks[idx])
+            if prof is not None:
+                t = prof.lap("roi", t)
+            if gate is not None:
+                signature, cached = gate.lookup(idx, roi)
+                if prof is not None:
+                    t = prof.lap("gate", t)
+                if cached is not None:
+                    results[idx] = cached
+                    if self.color_cache is not None:
+                        self.color_cache.advance(idx, cached[0])
+                    continue
             
             # Aplicar máscara
             roi_masked = cv2.bitwise_and(roi, roi, mask=mask)
@@ -137,10 +450,16 @@ class PolygonParkingDetector:
             
             # Heurística para detecção
             occupied = variance > 300 and (mean_intensity < 60 or mean_intensity > 120)
+            if prof is not None:
+                t = prof.lap("diff", t)
             
             # Extrair cor se ocupado
             color = None
-            if occupied:
+            if self.color_cache is not None:
+                x, y, w, h = self.spot_bounding_boxes[idx]
+                color = self.color_cache.update(idx, occupied, frame[y:y+h, x:x+w], mask,
+                                                engine=get_mean_color)
+            elif occupied:
                 x, y, w, h = self.spot_bounding_boxes[idx]
                 spot_img = frame[y:y+h, x:x+w]
                 
@@ -150,45 +469,30 @@ class PolygonParkingDetector:
                     
                     if len(non_zero_pixels_color) > 0:
                         color = tuple(map(int, np.mean(non_zero_pixels_color, axis=0)))
+            if prof is not None:
+                t = prof.lap("color", t)
+                prof.add_spot(idx, t - spot_start)
             
-            results.append((occupied, color))
+            results[idx] = (occupied, color)
+            if gate is not None:
+                gate.store(idx, signature, results[idx])
         
-        return results
+        return list(results)
     
     def draw_annotations(self, frame: np.ndarray, detections: list) -> np.ndarray:
         """
         Desenha anotações com polígonos.
+
+        O preenchimento, os contornos e os rótulos ficam em camadas guardadas
+        pelo `AnnotationRenderer`; só as vagas que mudaram são redesenhadas.
         """
-        annotated = frame.copy()
-        
-        for idx, (polygon, (occupied, color)) in enumerate(zip(self.spots, detections)):
-            # Converter para numpy array se necessário
-            if isinstance(polygon, list):
-                polygon = np.array(polygon)
-            
-            # Cor do polígono
-            poly_color = (0, 0, 255) if occupied else (0, 255, 0)
-            
-            # Desenhar polígono
-            cv2.polylines(annotated, [polygon.astype(np.int32)], True, poly_color, 2)
-            
-            # Preencher polígono com transparência
-            overlay = annotated.copy()
-            cv2.fillPoly(overlay, [polygon.astype(np.int32)], poly_color)
-            cv2.addWeighted(annotated, 0.7, overlay, 0.3, 0, annotated)
-            
-            # Adicionar label
-            center_x = int(np.mean(polygon[:, 0]))
-            center_y = int(np.mean(polygon[:, 1]))
-            
-            label = f"V{idx+1}: {'OCUPADA' if occupied else 'LIVRE'}"
-            cv2.putText(annotated, label, (center_x - 50, center_y), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # Círculo da cor dominante
-            if color:
-                cv2.circle(annotated, (center_x, center_y - 20), 10, color, -1)
-        
+        if self.profiler is not None:
+            start = time.perf_counter()
+        if self._renderer is None:
+            self._renderer = self._build_renderer()
+        annotated = self._renderer.render(frame, detections)
+        if self.profiler is not None:
+            self.profiler.lap("draw", start)
         return annotated
     
     def get_interactive_selector(self, frame: np.ndarray):
@@ -234,7 +538,7 @@ class PolygonParkingDetector:
             if key == ord('q'):
                 break
             elif key == ord('s'):
-                self._save_polygons(params['polygons'])
+                self._save_polygons(params['polygons'], frame.shape)
                 print("Polígonos salvos!")
             elif key == ord('r'):
                 params['polygons'] = []
@@ -246,24 +550,13 @@ class PolygonParkingDetector:
         cv2.destroyAllWindows()
         return params['polygons']
     
-    def _save_polygons(self, polygons):
+    def _save_polygons(self, polygons, frame_shape: tuple = None):
         """
-        Salva os polígonos em um arquivo de configuração.
+        Salva os polígonos em um layout JSON (ver `LayoutFile`).
+
+        Com `frame_shape`, a resolução do frame é gravada junto, o que permite
+        o cache pré-calculado ao carregar o layout.
         """
-        config_text = "# Configuração gerada automaticamente\n"
-        config_text += "import numpy as np\n\n"
-        config_text += "PARKING_SPOTS_CUSTOM = [\n"
-        
-        for i, polygon in enumerate(polygons):
-            config_text += f"    # Vaga {i+1}\n"
-            config_text += "    np.array([\n"
-            for point in polygon:
-                config_text += f"        [{point[0]}, {point[1]}],\n"
-            config_text += "    ]),\n\n"
-        
-        config_text += "]\n"
-        
-        with open('config_custom_polygons.py', 'w') as f:
-            f.write(config_text)
-        
-        print("Configuração salva em 'config_custom_polygons.py'") 
\ No newline at end of file
+        resolution = (frame_shape[1], frame_shape[0]) if frame_shape is not None else None
+        save_layout_file(CUSTOM_LAYOUT_PATH, polygons, resolution)
+        print(f"Configuração salva em '{CUSTOM_LAYOUT_PATH}'")
@@ -0,0 +1,204 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+import numpy as np
+
+
+class RollingTimes:
+    """
+    Últimas `window` medições de tempo (buffer circular) e totais acumulados.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float):
+        self.samples[self.count % len(self.samples)] = seconds
+        self.count += 1
+        self.total += seconds
+
+    def copy(self) -> "RollingTimes":
+        copy = RollingTimes(len(self.samples))
+        copy.samples[:] = self.samples
+        copy.count = self.count
+        copy.total = self.total
+        return copy
+
+    @property
+    def recent(self) -> np.ndarray:
+        return self.samples[:min(self.count, len(self.samples))]
+
+    def percentiles(self, qs=(50, 95, 99)) -> list:
+        """
+        Percentis (em ms) das medições na janela.
+        """
+        if self.count == 0:
+            return [0.0] * len(qs)
+        return list(np.percentile(self.recent, qs) * 1000)
+
+
+class StageProfiler:
+    """
+    Tempo gasto em cada etapa do processamento de um frame.
+
+    Os detectores recebem o profiler no construtor (`profiler=`) e registram
+    as etapas por frame (`gray`, `draw`) e por vaga (`roi`, `diff` ou
+    `criteria`, `color`), além do tempo total de cada vaga. Os laços de
+    vídeo registram `read`, `detect`, `imshow` e, com `frame_done`, a
+    latência da captura até o resultado. Sem profiler (o padrão), o custo
+    nos detectores é um teste de `None` por etapa.
+
+    Cada etapa guarda as últimas `window` medições, de onde saem p50/p95/p99.
+    O mesmo profiler pode ser usado por várias threads (ex.: a detecção e a
+    janela em `main.py`): os registros passam por um lock.
+
+    `start_window(frames)` liga o cProfile e o tracemalloc durante os
+    próximos `frames` frames; o relatório fica em `window_report`.
+    """
+
+    def __init__(self, window: int = 1024, spot_window: int = 256):
+        """
+        Parâmetros:
+            window: Medições guardadas por etapa.
+            spot_window: Medições guardadas por vaga.
+        """
+        self.window = window
+        self.spot_window = spot_window
+        self.stages = {}
+        self.spots = {}
+        self.frames = 0
+        self.window_report = None
+        self._window_frames = 0
+        self._window_path = None
+        self._cprofile = None
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            times = self.stages.get(stage)
+            if times is None:
+                times = self.stages[stage] = RollingTimes(self.window)
+            times.add(seconds)
+
+    def add_spot(self, idx: int, seconds: float):
+        with self._lock:
+            times = self.spots.get(idx)
+            if times is None:
+                times = self.spots[idx] = RollingTimes(self.spot_window)
+            times.add(seconds)
+
+    def stage_times(self) -> dict:
+        """
+        Cópia das medições de cada etapa ({etapa: RollingTimes}), tirada sob
+        o lock, para leitura por outra thread (ex.: métricas).
+        """
+        with self._lock:
+            return {stage: times.copy() for stage, times in self.stages.items()}
+
+    def lap(self, stage: str, start: float) -> float:
+        """
+        Registra o tempo desde `start` em `stage` e retorna o instante atual
+        (início da próxima etapa).
+        """
+        now = time.perf_counter()
+        self.add(stage, now - start)
+        return now
+
+    def frame_done(self, capture_time: float = None):
+        """
+        Marca o fim de um frame.
+
+        Parâmetros:
+            capture_time: `time.perf_counter()` de quando o frame foi lido
+                          (ex.: `ThreadedCapture.capture_time`); registra a
+                          latência em `latency`.
+        """
+        with self._lock:
+            self.frames += 1
+        if capture_time is not None:
+            self.add("latency", time.perf_counter() - capture_time)
+        if self._window_frames > 0:
+            self._window_frames -= 1
+            if self._window_frames == 0:
+                self._stop_window()
+
+    def start_window(self, frames: int, path: str = None, memory: bool = True):
+        """
+        Liga o cProfile (e o tracemalloc, com `memory`) pelos próximos `frames` frames.
+
+        Parâmetros:
+            frames: Duração da janela em frames (contados em `frame_done`).
+            path: Arquivo onde as estatísticas do cProfile são gravadas (opcional,
+                  para `python -m pstats` ou snakeviz).
+            memory: Também mede as alocações com tracemalloc.
+        """
+        if self._cprofile is not None:
+            return
+        self._window_frames = max(1, frames)
+        self._window_path = path
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+
+    def _stop_window(self):
+        self._cprofile.disable()
+        stream = io.StringIO()
+        stats = pstats.Stats(self._cprofile, stream=stream)
+        stats.sort_stats("cumulative").print_stats(15)
+        if self._window_path:
+            stats.dump_stats(self._window_path)
+        self._cprofile = None
+
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            tracemalloc.stop()
+            stream.write(f"Memória: atual {current / 2**20:.1f} MB | pico {peak / 2**20:.1f} MB\n")
+            for stat in top:
+                stream.write(f"  {stat}\n")
+        self.window_report = stream.getvalue()
+
+    def report(self) -> dict:
+        """
+        Resumo por etapa e por vaga.
+
+        Retorna:
+            {"frames", "stages": {etapa: {count, total_ms, p50, p95, p99}},
+             "spots": {vaga: {count, p50, p95, p99}}}; tempos em ms.
+        """
+        with self._lock:
+            return self._report()
+
+    def _report(self) -> dict:
+        stages = {}
+        for stage, times in self.stages.items():
+            p50, p95, p99 = times.percentiles()
+            stages[stage] = {"count": times.count, "total_ms": times.total * 1000,
+                             "p50": p50, "p95": p95, "p99": p99}
+        spots = {}
+        for idx, times in sorted(self.spots.items()):
+            p50, p95, p99 = times.percentiles()
+            spots[idx] = {"count": times.count, "p50": p50, "p95": p95, "p99": p99}
+        return {"frames": self.frames, "stages": stages, "spots": spots}
+
+    def summary(self, slowest_spots: int = 5) -> str:
+        """
+        Tabela das etapas (da mais custosa para a mais barata) e das vagas mais lentas.
+        """
+        report = self.report()
+        frames = max(1, report["frames"])
+        lines = [f"{'etapa':<10} {'ms/frame':>9} {'p50':>8} {'p95':>8} {'p99':>8}"]
+        for stage, row in sorted(report["stages"].items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append(f"{stage:<10} {row['total_ms'] / frames:9.3f} {row['p50']:8.3f} "
+                         f"{row['p95']:8.3f} {row['p99']:8.3f}")
+        spots = sorted(report["spots"].items(), key=lambda item: -item[1]["p95"])[:slowest_spots]
+        if spots:
+            lines.append("Vagas mais lentas (p95 ms): " +
+                         ", ".join(f"V{idx + 1}={row['p95']:.3f}" for idx, row in spots))
+        return "\n".join(lines)
@@ -0,0 +1,252 @@
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FREE_COLOR = (0, 255, 0)
+OCCUPIED_COLOR = (0, 0, 255)
+TEXT_COLOR = (255, 255, 255)
+# Passo da quantização da cor dominante no círculo (níveis por canal)
+COLOR_STEP = 16
+
+
+def quantize_color(color):
+    """
+    Centro do degrau de `COLOR_STEP` de cada canal (None continua None).
+    """
+    if color is None:
+        return None
+    return tuple(int(c) // COLOR_STEP * COLOR_STEP + COLOR_STEP // 2 for c in color)
+
+
+class AnnotationRenderer:
+    """
+    Desenha as anotações das vagas em uma única passada sobre o frame.
+
+    Tudo o que depende só do estado das vagas fica em duas camadas do tamanho
+    do frame, guardadas entre chamadas: o preenchimento dos polígonos (cor de
+    livre/ocupada) e a "tinta" opaca (contorno, rótulo, nota e círculo da
+    cor dominante), cada uma com sua máscara. A cada frame, o preenchimento
+    é misturado com um único `addWeighted` restrito à região das vagas e a
+    tinta é copiada por cima.
+
+    Quando o estado de uma vaga muda, só a região dela (antes e depois) é
+    apagada e redesenhada, junto com as vagas vizinhas que a tocam; os
+    textos e seus tamanhos são calculados uma vez. A cor do círculo é
+    quantizada (`COLOR_STEP`), então a oscilação normal da cor dominante de
+    um frame para outro não conta como mudança.
+    """
+
+    def __init__(self, polygons: list, label_origins: list, circle_centers: list,
+                 fill_alpha: float = 0.3, font_scale: float = 0.6, circle_radius: int = 10,
+                 note_scale: float = 0.4):
+        """
+        Parâmetros:
+            polygons: Polígono (pontos x, y) de cada vaga.
+            label_origins: Origem (x, y) do rótulo "Vn: OCUPADA/LIVRE" de cada vaga.
+            circle_centers: Centro do círculo da cor dominante de cada vaga.
+            fill_alpha: Opacidade do preenchimento (0 desliga o preenchimento).
+            font_scale: Escala da fonte dos rótulos.
+            circle_radius: Raio do círculo da cor dominante.
+            note_scale: Escala da fonte das notas (ex.: threshold calibrado).
+        """
+        self.polygons = [np.asarray(polygon, dtype=np.int32).reshape(-1, 2) for polygon in polygons]
+        self.label_origins = [tuple(map(int, origin)) for origin in label_origins]
+        self.circle_centers = [tuple(map(int, center)) for center in circle_centers]
+        self.fill_alpha = fill_alpha
+        self.font_scale = font_scale
+        self.circle_radius = circle_radius
+        self.note_scale = note_scale
+        self.labels = [(f"V{idx+1}: LIVRE", f"V{idx+1}: OCUPADA") for idx in range(len(self.polygons))]
+        self._text_sizes = {}
+
+        # Contorno e círculo não mudam de lugar com o estado
+        boxes = []
+        for polygon, (cx, cy) in zip(self.polygons, self.circle_centers):
+            x0, y0 = polygon.min(axis=0) - 2
+            x1, y1 = polygon.max(axis=0) + 3
+            r = self.circle_radius + 1
+            boxes.append((min(x0, cx - r), min(y0, cy - r), max(x1, cx + r + 1), max(y1, cy + r + 1)))
+        self._static_extents = np.array(boxes, dtype=np.int64).reshape(-1, 4)
+
+        self._shape = None
+        self._states = None
+        self._extents = None
+        self._fill = None
+        self._fill_mask = None
+        self._ink = None
+        self._ink_mask = None
+
+        # Contadores
+        self.frames = 0
+        self.spots_redrawn = 0
+
+    def invalidate(self):
+        """
+        Descarta as camadas; o próximo frame é desenhado do zero.
+        """
+        self._shape = None
+
+    def _text_box(self, text: str, origin: tuple, scale: float, thickness: int) -> tuple:
+        key = (text, scale, thickness)
+        size = self._text_sizes.get(key)
+        if size is None:
+            size = self._text_sizes[key] = cv2.getTextSize(text, FONT, scale, thickness)
+        (w, h), baseline = size
+        x, y = origin
+        pad = 2 * thickness
+        return x - pad, y - h - pad, x + w + pad, y + baseline + pad
+
+    def _extent(self, idx: int, state: tuple) -> tuple:
+        """
+        Retângulo (x0, y0, x1, y1) que a vaga ocupa nas camadas com o estado dado.
+        """
+        if state is None:
+            return tuple(self._static_extents[idx])
+        occupied, _, note = state
+        boxes = [tuple(self._static_extents[idx]),
+                 self._text_box(self.labels[idx][bool(occupied)], self.label_origins[idx],
+                                self.font_scale, 2)]
+        if note is not None:
+            text, origin = note
+            boxes.append(self._text_box(text, origin, self.note_scale, 1))
+        boxes = np.array(boxes)
+        return (*boxes[:, :2].min(axis=0), *boxes[:, 2:].max(axis=0))
+
+    def _rebuild(self, frame_shape: tuple, states: list):
+        height, width = frame_shape[:2]
+        self._shape = frame_shape
+        self._states = states
+        self._extents = np.array([self._extent(idx, state) for idx, state in enumerate(states)],
+                                 dtype=np.int64).reshape(-1, 4)
+        self._fill = np.zeros((height, width, 3), dtype=np.uint8)
+        self._ink = np.zeros((height, width, 3), dtype=np.uint8)
+        self._ink_mask = np.zeros((height, width), dtype=np.uint8)
+        # A área preenchida é a união dos polígonos, qualquer que seja o estado
+        self._fill_mask = np.zeros((height, width), dtype=np.uint8)
+        if self.fill_alpha > 0:
+            drawn = [polygon for polygon, state in zip(self.polygons, states) if state is not None]
+            if drawn:
+                cv2.fillPoly(self._fill_mask, drawn, 255)
+        self._redraw((0, 0, width, height))
+
+    def _redraw(self, box: tuple):
+        """
+        Apaga e redesenha, dentro de `box`, todas as vagas que o tocam (em ordem de índice).
+
+        As vagas são desenhadas inteiras em uma área auxiliar que as contém e
+        só `box` é copiado de volta: recortar as primitivas na borda de `box`
+        mudaria a rasterização das linhas em relação ao desenho completo.
+        """
+        height, width = self._shape[:2]
+        x0, y0 = max(0, int(box[0])), max(0, int(box[1]))
+        x1, y1 = min(width, int(box[2])), min(height, int(box[3]))
+        if x0 >= x1 or y0 >= y1:
+            return
+        ext = self._extents
+        touching = np.flatnonzero((ext[:, 0] < x1) & (ext[:, 2] > x0) & (ext[:, 1] < y1) & (ext[:, 3] > y0))
+        touching = [idx for idx in touching if self._states[idx] is not None]
+
+        full = (x0, y0, x1, y1) == (0, 0, width, height)
+        if full:
+            ax0, ay0, ax1, ay1 = x0, y0, x1, y1
+            fill, ink, ink_mask = self._fill, self._ink, self._ink_mask
+            ink[:] = 0
+            ink_mask[:] = 0
+        else:
+            ax0, ay0 = max(0, min(x0, int(ext[touching, 0].min(initial=x0)))), \
+                max(0, min(y0, int(ext[touching, 1].min(initial=y0))))
+            ax1, ay1 = min(width, max(x1, int(ext[touching, 2].max(initial=x1)))), \
+                min(height, max(y1, int(ext[touching, 3].max(initial=y1))))
+            fill = self._fill[ay0:ay1, ax0:ax1].copy()
+            ink = np.zeros_like(self._ink[ay0:ay1, ax0:ax1])
+            ink_mask = np.zeros_like(self._ink_mask[ay0:ay1, ax0:ax1])
+        offset = np.array([ax0, ay0], dtype=np.int32)
+
+        # Todos os preenchimentos primeiro, depois a tinta por cima
+        if self.fill_alpha > 0:
+            for idx in touching:
+                occupied = self._states[idx][0]
+                cv2.fillPoly(fill, [self.polygons[idx] - offset],
+                             OCCUPIED_COLOR if occupied else FREE_COLOR)
+        for idx in touching:
+            occupied, color, note = self._states[idx]
+            polygon = [self.polygons[idx] - offset]
+            label = self.labels[idx][bool(occupied)]
+            lx, ly = self.label_origins[idx]
+            for target, outline, text_color, dot_color in (
+                    (ink, OCCUPIED_COLOR if occupied else FREE_COLOR, TEXT_COLOR, color),
+                    (ink_mask, 255, 255, 255)):
+                cv2.polylines(target, polygon, True, outline, 2)
+                cv2.putText(target, label, (lx - ax0, ly - ay0), FONT, self.font_scale, text_color, 2)
+                if note is not None:
+                    text, (nx, ny) = note
+                    cv2.putText(target, text, (nx - ax0, ny - ay0), FONT, self.note_scale, text_color, 1)
+                if color:
+                    cx, cy = self.circle_centers[idx]
+                    cv2.circle(target, (cx - ax0, cy - ay0), self.circle_radius, dot_color, -1)
+        self.spots_redrawn += len(touching)
+
+        if not full:
+            inner = (slice(y0 - ay0, y1 - ay0), slice(x0 - ax0, x1 - ax0))
+            self._fill[y0:y1, x0:x1] = fill[inner]
+            self._ink[y0:y1, x0:x1] = ink[inner]
+            self._ink_mask[y0:y1, x0:x1] = ink_mask[inner]
+
+    def _update(self, states: list):
+        """
+        Redesenha só as regiões das vagas cujo estado mudou.
+        """
+        changed = [idx for idx, state in enumerate(states) if state != self._states[idx]]
+        if not changed:
+            return
+        # Vagas que passam a ser (ou deixam de ser) desenhadas mudam a área preenchida
+        if (len(changed) > len(states) // 4
+                or any((states[idx] is None) != (self._states[idx] is None) for idx in changed)):
+            self._rebuild(self._shape, states)
+            return
+        dirty = []
+        for idx in changed:
+            old = self._extents[idx].copy()
+            self._extents[idx] = self._extent(idx, states[idx])
+            new = self._extents[idx]
+            dirty.append((min(old[0], new[0]), min(old[1], new[1]),
+                          max(old[2], new[2]), max(old[3], new[3])))
+        self._states = states
+        for box in dirty:
+            self._redraw(box)
+
+    def render(self, frame: np.ndarray, detections: list, notes: dict = None) -> np.ndarray:
+        """
+        Retorna uma cópia do frame com as anotações.
+
+        Parâmetros:
+            frame: Frame BGR.
+            detections: Lista de tuplas (status, cor) por vaga.
+            notes: Texto extra por vaga, {idx: (texto, (x, y))} (opcional).
+        """
+        notes = notes or {}
+        # Vagas sem detecção (lista mais curta que o layout) não são desenhadas
+        states = [None] * len(self.polygons)
+        for idx, (occupied, color) in enumerate(detections[:len(states)]):
+            states[idx] = (bool(occupied), quantize_color(color), notes.get(idx))
+
+        if self._shape != frame.shape:
+            self._rebuild(frame.shape, states)
+        else:
+            self._update(states)
+        self.frames += 1
+
+        annotated = frame.copy()
+        if not len(self._extents):
+            return annotated
+        ext = self._extents
+        x0, y0 = max(0, int(ext[:, 0].min())), max(0, int(ext[:, 1].min()))
+        x1, y1 = int(ext[:, 2].max()), int(ext[:, 3].max())
+        # cv2.copyTo escreve direto na região (uma view de `annotated`)
+        region = annotated[y0:y1, x0:x1]
+        if self.fill_alpha > 0:
+            blended = cv2.addWeighted(region, 1 - self.fill_alpha, self._fill[y0:y1, x0:x1],
+                                      self.fill_alpha, 0)
+            cv2.copyTo(blended, self._fill_mask[y0:y1, x0:x1], region)
+        cv2.copyTo(self._ink[y0:y1, x0:x1], self._ink_mask[y0:y1, x0:x1], region)
+        return annotated
@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+
+
+def scale_rects(spots: list, scale: float) -> list:
+    """
+    Reescala vagas retangulares (x, y, w, h) para outra resolução.
+    """
+    return [(int(round(x * scale)), int(round(y * scale)),
+             max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+            for x, y, w, h in spots]
+
+
+def scale_polygons(polygons: list, scale: float) -> list:
+    """
+    Reescala polígonos (listas de pontos [x, y]) para outra resolução.
+    """
+    return [[[int(round(x * scale)), int(round(y * scale))] for x, y in polygon]
+            for polygon in polygons]
+
+
+def scale_frame(frame: np.ndarray, scale: float) -> np.ndarray:
+    """
+    Reduz o frame pelo fator `scale` (INTER_AREA, sem serrilhado).
+    """
+    height, width = frame.shape[:2]
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+class ScaledDetector:
+    """
+    Executa a detecção em resolução reduzida.
+
+    O frame (e o fundo, uma vez por fundo) é reduzido por `scale` e analisado
+    por uma cópia do detector com layout, máscaras e thresholds em pixels
+    reescalados (`detector.scaled_copy`). Como o resultado é uma lista por
+    vaga, ele vale diretamente para o layout nativo; `draw_annotations` e os
+    demais atributos são os do detector original, em resolução nativa.
+    A calibração (`calibrate_thresholds`, `calibrate_stream`) roda no detector
+    nativo e os thresholds são repassados, reescalados, à cópia reduzida.
+
+    Com scale=0.5 são analisados 4x menos pixels. Critérios que dependem da
+    escala (ex.: gradiente) podem mudar um pouco a decisão nas bordas.
+    """
+
+    def __init__(self, detector, scale: float):
+        """
+        Parâmetros:
+            detector: Detector no layout nativo.
+            scale: Fator de redução (0 < scale <= 1).
+        """
+        if not 0 < scale <= 1:
+            raise ValueError(f"processing_scale deve estar em (0, 1]: {scale}")
+        self.detector = detector
+        self.scale = scale
+        self.scaled = detector.scaled_copy(scale)
+        self._bg_source = None
+        self._bg_scaled = None
+
+    def __getattr__(self, name):
+        return getattr(self.detector, name)
+
+    def calibrate_thresholds(self, bg_frame: np.ndarray, sample_frames: list):
+        """
+        Calibra o detector nativo e atualiza os thresholds da cópia reduzida.
+        """
+        self.detector.calibrate_thresholds(bg_frame, sample_frames)
+        self._copy_calibration()
+
+    def calibrate_stream(self, bg_frame: np.ndarray, frames, *args, **kwargs) -> bool:
+        """
+        Como `calibrate_stream` do detector nativo (mesmo cache de thresholds),
+        atualizando depois os thresholds da cópia reduzida.
+        """
+        loaded = self.detector.calibrate_stream(bg_frame, frames, *args, **kwargs)
+        self._copy_calibration()
+        return loaded
+
+    def _copy_calibration(self):
+        # Thresholds em pixels: escalam com a área
+        area = self.scale * self.scale
+        self.scaled.adaptive_thresholds = {idx: value * area
+                                           for idx, value in self.detector.adaptive_thresholds.items()}
+        self.scaled._after_calibration()
+
+    def _scaled_background(self, bg_frame: np.ndarray, frame_shape: tuple) -> np.ndarray:
+        """
+        Fundo reduzido para a resolução de processamento, refeito só quando o fundo muda.
+        """
+        if bg_frame is None:
+            return None
+        height, width = frame_shape[:2]
+        if (bg_frame is not self._bg_source or self._bg_scaled is None
+                or self._bg_scaled.shape[:2] != (height, width)):
+            self._bg_scaled = cv2.resize(bg_frame, (width, height), interpolation=cv2.INTER_AREA)
+            self._bg_source = bg_frame
+        return self._bg_scaled
+
+    def refresh_background(self, bg_frame: np.ndarray, indices):
+        """
+        Fundo alterado no próprio array (ex.: AdaptiveBackground): reduz de novo e
+        atualiza o cache do detector reduzido só nas vagas `indices`.
+        """
+        if bg_frame is not self._bg_source or self._bg_scaled is None:
+            return
+        height, width = self._bg_scaled.shape[:2]
+        cv2.resize(bg_frame, (width, height), dst=self._bg_scaled, interpolation=cv2.INTER_AREA)
+        self.scaled.refresh_background(self._bg_scaled, indices)
+
+    def detect(self, frame: np.ndarray, bg_frame: np.ndarray = None) -> list:
+        small = scale_frame(frame, self.scale)
+        return self.scaled.detect(small, self._scaled_background(bg_frame, small.shape))
+
+    def detect_batch(self, frames, bg_frame: np.ndarray = None, batch_size: int = 32):
+        """
+        Como `detect_batch` do detector, com os frames reduzidos.
+        """
+        small_frames = (scale_frame(frame, self.scale) for frame in frames)
+        small_bg = scale_frame(bg_frame, self.scale) if bg_frame is not None else None
+        return self.scaled.detect_batch(small_frames, small_bg, batch_size)
@@ -0,0 +1,404 @@
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import numpy as np
+from detector.events import OccupancyTracker
+
+# Cabeçalho do formato binário: frame (uint64), timestamp (float64),
+# total de vagas (uint16), vagas livres (uint16); segue o bitset de ocupação
+BINARY_HEADER = struct.Struct("<QdHH")
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC11B85"
+
+STATUS_TEXT = {
+    200: "OK", 101: "Switching Protocols", 304: "Not Modified", 400: "Bad Request",
+    404: "Not Found", 405: "Method Not Allowed",
+}
+
+
+class OccupancySnapshot:
+    """
+    Estado das vagas em um frame. Imutável depois de criado.
+
+    As representações servidas (JSON e binária) são geradas na primeira
+    requisição e reaproveitadas por todos os leitores seguintes.
+    """
+
+    __slots__ = ("version", "frame", "timestamp", "occupied", "colors", "_json", "_binary")
+
+    def __init__(self, version: int, frame: int, timestamp: float, occupied: tuple, colors: tuple):
+        self.version = version
+        self.frame = frame
+        self.timestamp = timestamp
+        self.occupied = occupied
+        self.colors = colors
+        self._json = None
+        self._binary = None
+
+    @property
+    def total(self) -> int:
+        return len(self.occupied)
+
+    @property
+    def free(self) -> int:
+        return self.total - sum(self.occupied)
+
+    def to_record(self) -> dict:
+        return {
+            "version": self.version,
+            "frame": self.frame,
+            "timestamp": round(self.timestamp, 3),
+            "total": self.total,
+            "free": self.free,
+            "spots": [
+                {"occupied": occupied, "color": list(color) if color is not None else None}
+                for occupied, color in zip(self.occupied, self.colors)
+            ],
+        }
+
+    def to_json(self) -> bytes:
+        if self._json is None:
+            self._json = json.dumps(self.to_record()).encode()
+        return self._json
+
+    def to_binary(self) -> bytes:
+        """
+        Cabeçalho `BINARY_HEADER` seguido de um bit por vaga (vaga i no bit
+        i % 8 do byte i // 8; 1 = ocupada).
+        """
+        if self._binary is None:
+            bits = np.packbits(np.array(self.occupied, dtype=bool), bitorder="little")
+            header = BINARY_HEADER.pack(self.frame, self.timestamp, self.total, self.free)
+            self._binary = header + bits.tobytes()
+        return self._binary
+
+
+def decode_binary(data: bytes) -> tuple:
+    """
+    Lê uma resposta binária.
+
+    Retorna:
+        (frame, timestamp, free, lista de ocupação por vaga)
+    """
+    frame, timestamp, total, free = BINARY_HEADER.unpack_from(data)
+    bits = np.frombuffer(data, dtype=np.uint8, offset=BINARY_HEADER.size)
+    occupied = np.unpackbits(bits, count=total, bitorder="little").astype(bool)
+    return frame, timestamp, free, occupied.tolist()
+
+
+class SnapshotStore:
+    """
+    Último estado publicado pelo laço de detecção.
+
+    `publish` monta um novo `OccupancySnapshot` e troca a referência de uma
+    vez; os leitores pegam a referência atual e nunca veem um estado pela
+    metade, sem lock e sem esperar pela detecção.
+    """
+
+    def __init__(self, tracker: OccupancyTracker = None):
+        """
+        Parâmetros:
+            tracker: Se informado, também é atualizado a cada `publish`
+                     (transições enviadas pelo servidor).
+        """
+        self.tracker = tracker
+        self.current = None
+        self._version = 0
+
+    def publish(self, detections: list, frame_number: int, timestamp: float) -> OccupancySnapshot:
+        self._version += 1
+        occupied = tuple(bool(occupied) for occupied, _ in detections)
+        colors = tuple(tuple(int(c) for c in color) if color is not None else None
+                       for _, color in detections)
+        self.current = OccupancySnapshot(self._version, frame_number, timestamp, occupied, colors)
+        if self.tracker is not None:
+            self.tracker.update(detections, frame_number, timestamp)
+        return self.current
+
+    def publish_record(self, record: dict) -> OccupancySnapshot:
+        """
+        Publica um registro de `detection_record`.
+        """
+        detections = [(spot["occupied"], spot["color"]) for spot in record["spots"]]
+        return self.publish(detections, record["frame"], record["timestamp"])
+
+
+def _websocket_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """
+    Frame WebSocket do servidor (sem máscara, não fragmentado).
+    """
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def _read_websocket_frame(reader: asyncio.StreamReader) -> tuple:
+    """
+    Lê um frame do cliente. Retorna (opcode, payload).
+    """
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length, = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack("!Q", await reader.readexactly(8))
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask is not None:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return first & 0x0F, payload
+
+
+class OccupancyServer:
+    """
+    Servidor HTTP/WebSocket (asyncio, só biblioteca padrão) da ocupação.
+
+    Rotas:
+        GET /occupancy      Último estado em JSON (vagas, livres, cores).
+        GET /occupancy.bin  Último estado no formato binário compacto
+                            (ver `OccupancySnapshot.to_binary`).
+        GET /events         WebSocket (ou Server-Sent Events sem `Upgrade`):
+                            envia o estado atual e depois cada transição.
+        GET /metrics        Métricas no formato do Prometheus (com `metrics`).
+
+    As respostas de estado levam `ETag` com a versão do snapshot; com
+    `If-None-Match` igual, a resposta é 304 sem corpo. O servidor só lê
+    `store.current`, então nunca bloqueia a thread de captura e detecção.
+    As transições vêm de `tracker` (o da store, se não informado); cada
+    cliente tem uma fila limitada e, se ficar para trás, perde os eventos
+    mais antigos.
+    """
+
+    def __init__(self, store: SnapshotStore, tracker: OccupancyTracker = None,
+                 host: str = "127.0.0.1", port: int = 8080, client_queue_size: int = 256,
+                 metrics=None):
+        """
+        Parâmetros:
+            store: SnapshotStore alimentada pelo laço de detecção.
+            tracker: OccupancyTracker cujas transições são enviadas em /events.
+            host: Endereço de escuta.
+            port: Porta (0 escolhe uma livre; ver `port` depois de `start`).
+            client_queue_size: Eventos pendentes por cliente de /events.
+            metrics: `MetricsRegistry` servido em /metrics (opcional).
+        """
+        self.store = store
+        self.tracker = tracker if tracker is not None else store.tracker
+        self.host = host
+        self.port = port
+        self.client_queue_size = client_queue_size
+        self.metrics = metrics
+        self._server = None
+        self._loop = None
+        self._thread = None
+        self._clients = set()
+        self._callback = None
+
+        # Contadores
+        self.requests = 0
+        self.connections = 0
+
+    async def start(self):
+        """
+        Começa a escutar no loop atual.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.tracker is not None:
+            self._callback = self.tracker.subscribe(self._on_event)
+
+    async def close(self):
+        if self.tracker is not None and self._callback is not None:
+            self.tracker.unsubscribe(self._callback)
+            self._callback = None
+        if self._server is not None:
+            self._server.close()
+            for queue in list(self._clients):
+                OccupancyTracker._offer(queue, None)
+            await self._server.wait_closed()
+            self._server = None
+
+    def start_in_thread(self) -> "OccupancyServer":
+        """
+        Roda o servidor em uma thread própria (daemon) e retorna quando ele
+        já está escutando.
+        """
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+            loop.run_until_complete(self.close())
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name="occupancy-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """
+        Para o servidor iniciado com `start_in_thread`.
+        """
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    def _on_event(self, event):
+        # Chamado na thread de detecção: só agenda o envio no loop do servidor
+        if self._clients and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._broadcast, event)
+
+    def _broadcast(self, event):
+        message = json.dumps(dict(event.to_record(), type="event")).encode()
+        for queue in self._clients:
+            OccupancyTracker._offer(queue, message)
+
+    def _snapshot_message(self) -> bytes:
+        snapshot = self.store.current
+        record = snapshot.to_record() if snapshot is not None else {"spots": []}
+        return json.dumps(dict(record, type="snapshot")).encode()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            # Conexões persistentes: várias requisições na mesma conexão
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                self.requests += 1
+                lines = head.decode("latin-1").split("\r\n")
+                parts = lines[0].split(" ")
+                if len(parts) != 3:
+                    await self._respond(writer, 400, b"", close=True)
+                    break
+                method, path, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                path = path.split("?", 1)[0]
+                if method != "GET":
+                    await self._respond(writer, 405, b"", close=True)
+                    break
+                if path == "/events":
+                    if headers.get("upgrade", "").lower() == "websocket":
+                        await self._websocket(reader, writer, headers)
+                    else:
+                        await self._event_stream(writer)
+                    break
+                if path in ("/occupancy", "/occupancy.bin"):
+                    await self._respond_snapshot(writer, path, headers, keep_alive)
+                elif path == "/metrics" and self.metrics is not None:
+                    await self._respond(writer, 200, self.metrics.render().encode(),
+                                        "text/plain; version=0.0.4", close=not keep_alive)
+                else:
+                    await self._respond(writer, 404, b"", close=not keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status: int, body: bytes, content_type: str = "application/json",
+                       close: bool = False, extra: str = ""):
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                f"Cache-Control: no-cache\r\n{extra}"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+    async def _respond_snapshot(self, writer, path: str, headers: dict, keep_alive: bool):
+        snapshot = self.store.current
+        if snapshot is None:
+            body = b'{"spots": []}'
+            await self._respond(writer, 200, body, close=not keep_alive)
+            return
+
+        etag = f'"{snapshot.version}"'
+        if headers.get("if-none-match") == etag:
+            await self._respond(writer, 304, b"", close=not keep_alive, extra=f"ETag: {etag}\r\n")
+            return
+        if path == "/occupancy.bin":
+            body, content_type = snapshot.to_binary(), "application/octet-stream"
+        else:
+            body, content_type = snapshot.to_json(), "application/json"
+        await self._respond(writer, 200, body, content_type, close=not keep_alive,
+                            extra=f"ETag: {etag}\r\n")
+
+    async def _websocket(self, reader, writer, headers: dict):
+        key = headers.get("sec-websocket-key")
+        if key is None:
+            await self._respond(writer, 400, b"", close=True)
+            return
+        accept = base64.b64encode(hashlib.sha1(key.encode() + WEBSOCKET_GUID).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+
+        queue = asyncio.Queue(self.client_queue_size)
+        self._clients.add(queue)
+
+        async def receive():
+            # Responde a pings e encerra no close (ou quando o cliente cai)
+            try:
+                while True:
+                    opcode, payload = await _read_websocket_frame(reader)
+                    if opcode == 0x8:
+                        break
+                    if opcode == 0x9:
+                        writer.write(_websocket_frame(payload, 0xA))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            OccupancyTracker._offer(queue, None)
+
+        receiver = asyncio.ensure_future(receive())
+        try:
+            writer.write(_websocket_frame(self._snapshot_message()))
+            await writer.drain()
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                writer.write(_websocket_frame(message))
+                await writer.drain()
+            writer.write(_websocket_frame(b"", 0x8))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(queue)
+            receiver.cancel()
+
+    async def _event_stream(self, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        queue = asyncio.Queue(self.client_queue_size)
+        self._clients.add(queue)
+        try:
+            message = self._snapshot_message()
+            while message is not None:
+                writer.write(b"data: " + message + b"\n\n")
+                await writer.drain()
+                message = await queue.get()
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(queue)
@@ -0,0 +1,263 @@
+import time
+from multiprocessing import resource_tracker, shared_memory
+import cv2
+import numpy as np
+
+# Campos do cabeçalho (int64)
+_WRITE_CURSOR = 0   # último número de sequência publicado
+_READ_CURSOR = 1    # último número de sequência liberado pelo leitor
+_CLOSED = 2         # 1 quando o escritor terminou
+_SLOTS = 3
+_HEIGHT = 4
+_WIDTH = 5
+_CHANNELS = 6
+_HEADER_FIELDS = 8
+_ALIGN = 64
+
+
+class SharedFrameRing:
+    """
+    Buffer circular de frames em memória compartilhada entre processos.
+
+    O decodificador escreve cada frame diretamente em um slot e o publica com
+    um número de sequência (1, 2, 3, ...). O detector lê o slot como um
+    `np.ndarray` somente leitura que aponta para a memória compartilhada, sem
+    cópia nem pickle. Cada slot guarda o número de sequência do frame que
+    contém (negativo enquanto está sendo escrito), o que permite ao leitor
+    verificar se o frame foi sobrescrito durante o processamento.
+
+    Com `overwrite=True` (streams ao vivo) o escritor nunca espera: quando o
+    buffer está cheio, o frame mais antigo é sobrescrito. Com
+    `overwrite=False` (arquivos) o escritor espera o leitor liberar um slot.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        self.slots = int(header[_SLOTS])
+        self.frame_shape = tuple(int(v) for v in header[_HEIGHT:_CHANNELS + 1] if v > 0)
+        self._header = header
+        self._seqs = np.ndarray((self.slots,), dtype=np.int64, buffer=shm.buf,
+                                offset=_HEADER_FIELDS * 8)
+        self._frames = np.ndarray((self.slots,) + self.frame_shape, dtype=np.uint8,
+                                  buffer=shm.buf, offset=self._data_offset(self.slots))
+        # Contador local de frames que o leitor perdeu por sobrescrita
+        self.missed = 0
+        # Sequência que o slot reservado por `begin_write` continha (para `abort_write`)
+        self._previous_seq = 0
+
+    @staticmethod
+    def _data_offset(slots: int) -> int:
+        offset = (_HEADER_FIELDS + slots) * 8
+        return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+    @classmethod
+    def create(cls, frame_shape: tuple, slots: int = 4, name: str = None):
+        """
+        Cria um novo buffer para frames com a forma dada (ex.: (1080, 1920, 3)).
+        """
+        frame_shape = tuple(int(v) for v in frame_shape)
+        size = cls._data_offset(slots) + slots * int(np.prod(frame_shape))
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_SLOTS] = slots
+        header[_HEIGHT:_HEIGHT + len(frame_shape)] = frame_shape
+        np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=_HEADER_FIELDS * 8)[:] = 0
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str):
+        """
+        Conecta-se a um buffer já criado por outro processo.
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13: o resource_tracker removeria a memória quando
+            # este processo terminasse, mesmo sem ser o criador
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def write_cursor(self) -> int:
+        return int(self._header[_WRITE_CURSOR])
+
+    @property
+    def read_cursor(self) -> int:
+        return int(self._header[_READ_CURSOR])
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._header[_CLOSED])
+
+    # --- Escritor ---
+
+    def begin_write(self, overwrite: bool = True, timeout: float = None):
+        """
+        Reserva o próximo slot e retorna (seq, view gravável do slot).
+
+        Sem `overwrite`, espera até o leitor liberar espaço (ou `timeout`,
+        retornando (None, None)).
+        """
+        seq = self.write_cursor + 1
+        if not overwrite:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while seq - self.read_cursor > self.slots:
+                if deadline is not None and time.monotonic() > deadline:
+                    return None, None
+                time.sleep(0.0005)
+
+        slot = seq % self.slots
+        self._previous_seq = int(self._seqs[slot])
+        self._seqs[slot] = -seq
+        return seq, self._frames[slot]
+
+    def abort_write(self, seq: int):
+        """
+        Desiste do slot reservado por `begin_write` (ex.: fim do vídeo).
+
+        O slot volta a indicar o frame que continha; só é exato se nada foi
+        escrito nele ainda (`cap.read` que falhou não escreve no buffer).
+        """
+        slot = seq % self.slots
+        if int(self._seqs[slot]) == -seq:
+            self._seqs[slot] = self._previous_seq
+
+    def commit(self, seq: int):
+        """
+        Publica o frame escrito no slot reservado por `begin_write`.
+        """
+        self._seqs[seq % self.slots] = seq
+        self._header[_WRITE_CURSOR] = seq
+
+    def write(self, frame: np.ndarray, overwrite: bool = True, timeout: float = None) -> int:
+        """
+        Copia um frame para o próximo slot e o publica. Retorna o número de sequência.
+        """
+        seq, view = self.begin_write(overwrite, timeout)
+        if seq is None:
+            return None
+        np.copyto(view, frame)
+        self.commit(seq)
+        return seq
+
+    def close_writer(self):
+        """
+        Indica aos leitores que não haverá mais frames.
+        """
+        self._header[_CLOSED] = 1
+
+    # --- Leitor ---
+
+    def _view(self, seq: int) -> np.ndarray:
+        view = self._frames[seq % self.slots].view()
+        view.flags.writeable = False
+        return view
+
+    def is_valid(self, seq: int) -> bool:
+        """
+        True se o slot ainda contém o frame `seq` (não foi sobrescrito).
+        """
+        return int(self._seqs[seq % self.slots]) == seq
+
+    def read(self, timeout: float = None):
+        """
+        Retorna (seq, frame) do próximo frame ainda não liberado pelo leitor.
+
+        Se o escritor já sobrescreveu esse frame, pula para o mais antigo
+        disponível e soma os frames perdidos em `missed`. Retorna (None, None)
+        quando o escritor terminou ou o `timeout` expirou.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            seq = self.read_cursor + 1
+            latest = self.write_cursor
+            if seq <= latest:
+                oldest = latest - self.slots + 1
+                if seq < oldest:
+                    self.missed += oldest - seq
+                    self._header[_READ_CURSOR] = oldest - 1
+                    continue
+                current = int(self._seqs[seq % self.slots])
+                if current == seq:
+                    return seq, self._view(seq)
+                if abs(current) > seq:
+                    # Slot sendo reescrito (ou já reescrito) com um frame mais novo
+                    self.missed += 1
+                    self._header[_READ_CURSOR] = seq
+                    continue
+                if self.closed:
+                    return None, None
+            elif self.closed:
+                return None, None
+
+            if deadline is not None and time.monotonic() > deadline:
+                return None, None
+            time.sleep(0.0005)
+
+    def read_latest(self):
+        """
+        Retorna (seq, frame) do frame publicado mais recentemente, ou (None, None).
+        """
+        seq = self.write_cursor
+        if seq == 0 or not self.is_valid(seq):
+            return None, None
+        return seq, self._view(seq)
+
+    def release(self, seq: int):
+        """
+        Libera o slot do frame `seq` (e dos anteriores) para o escritor.
+        """
+        if seq > self.read_cursor:
+            self._header[_READ_CURSOR] = seq
+
+    def close(self):
+        """
+        Fecha o mapeamento; o criador também remove a memória compartilhada.
+
+        Views retornadas por `read` precisam ter sido descartadas antes.
+        """
+        self._frames = None
+        self._seqs = None
+        self._header = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def decode_to_ring(source, ring_name: str, overwrite: bool = None):
+    """
+    Processo decodificador: lê `source` e escreve cada frame direto no buffer.
+
+    O frame é decodificado no próprio slot (`cap.read(view)`), sem cópia
+    intermediária. Por padrão, câmeras (índice inteiro) sobrescrevem frames
+    antigos e arquivos esperam o leitor.
+    """
+    ring = SharedFrameRing.attach(ring_name)
+    if overwrite is None:
+        overwrite = isinstance(source, int)
+    cap = cv2.VideoCapture(source)
+    try:
+        while cap.isOpened():
+            seq, view = ring.begin_write(overwrite)
+            ret, frame = cap.read(view)
+            if not ret:
+                ring.abort_write(seq)
+                break
+            if frame.shape != view.shape:
+                ring.abort_write(seq)
+                raise ValueError(f"Frame {frame.shape} não cabe no buffer {view.shape}")
+            if not np.shares_memory(frame, view):
+                np.copyto(view, frame)
+            ring.commit(seq)
+    finally:
+        ring.close_writer()
+        cap.release()
+        ring.close()
@@ -0,0 +1,77 @@
+import numpy as np
+
+
+class SpotGrid:
+    """
+    Índice espacial das vagas em uma grade uniforme.
+
+    Cada célula de `cell_size` pixels guarda as vagas cuja bounding box a
+    toca (em arrays no formato CSR). Uma consulta visita só as células do
+    retângulo pedido e confirma a interseção com as bounding boxes, então o
+    custo depende da área consultada, não do total de vagas.
+    """
+
+    def __init__(self, boxes: list, cell_size: int = 64):
+        """
+        Parâmetros:
+            boxes: Bounding boxes (x, y, w, h) das vagas.
+            cell_size: Lado de cada célula da grade, em pixels.
+        """
+        self.cell_size = max(1, int(cell_size))
+        boxes = np.array([tuple(box) for box in boxes], dtype=np.int64).reshape(-1, 4)
+        self.x0, self.y0 = boxes[:, 0], boxes[:, 1]
+        self.x1, self.y1 = boxes[:, 0] + boxes[:, 2], boxes[:, 1] + boxes[:, 3]
+
+        # Células tocadas por cada vaga (caixas vazias não entram no índice)
+        valid = (self.x1 > self.x0) & (self.y1 > self.y0)
+        cx0 = np.maximum(self.x0, 0) // self.cell_size
+        cy0 = np.maximum(self.y0, 0) // self.cell_size
+        cx1 = np.maximum(self.x1 - 1, 0) // self.cell_size
+        cy1 = np.maximum(self.y1 - 1, 0) // self.cell_size
+        self.cols = int(cx1.max()) + 1 if len(boxes) else 1
+        self.rows = int(cy1.max()) + 1 if len(boxes) else 1
+
+        cells, spots = [], []
+        for idx in np.flatnonzero(valid):
+            ys, xs = np.mgrid[cy0[idx]:cy1[idx] + 1, cx0[idx]:cx1[idx] + 1]
+            cells.append((ys * self.cols + xs).ravel())
+            spots.append(np.full(ys.size, idx))
+        cells = np.concatenate(cells) if cells else np.zeros(0, dtype=np.int64)
+        spots = np.concatenate(spots) if spots else np.zeros(0, dtype=np.int64)
+
+        order = np.argsort(cells, kind="stable")
+        self._spots = spots[order]
+        self._starts = np.searchsorted(cells[order], np.arange(self.rows * self.cols + 1))
+
+    def __len__(self) -> int:
+        return len(self.x0)
+
+    def query(self, x: int, y: int, w: int, h: int) -> np.ndarray:
+        """
+        Índices (ordenados) das vagas cuja bounding box intercepta o retângulo.
+        """
+        if w <= 0 or h <= 0:
+            return np.zeros(0, dtype=np.int64)
+        c = self.cell_size
+        cx0, cy0 = max(0, x // c), max(0, y // c)
+        cx1, cy1 = min(self.cols - 1, (x + w - 1) // c), min(self.rows - 1, (y + h - 1) // c)
+        if cx0 > cx1 or cy0 > cy1:
+            return np.zeros(0, dtype=np.int64)
+
+        parts = []
+        for row in range(cy0, cy1 + 1):
+            first = row * self.cols
+            parts.append(self._spots[self._starts[first + cx0]:self._starts[first + cx1 + 1]])
+        candidates = np.unique(np.concatenate(parts))
+        hits = ((self.x0[candidates] < x + w) & (self.x1[candidates] > x)
+                & (self.y0[candidates] < y + h) & (self.y1[candidates] > y))
+        return candidates[hits]
+
+    def query_many(self, rects) -> np.ndarray:
+        """
+        União (ordenada) das vagas que interceptam algum dos retângulos (x, y, w, h).
+        """
+        parts = [self.query(int(x), int(y), int(w), int(h)) for x, y, w, h in rects]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts))
@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+
+
+class SpotChangeGate:
+    """
+    Evita reanalisar vagas cuja imagem não mudou.
+
+    Para cada vaga guarda uma assinatura barata (miniatura em cinza de
+    `size` x `size`) do último frame em que a vaga foi analisada, junto com o
+    resultado `(ocupada, cor)`. Se a miniatura do frame atual difere da
+    assinatura em média menos que `tolerance` níveis de cinza, o resultado
+    anterior é reutilizado. Como a comparação é sempre contra o último frame
+    analisado, mudanças lentas se acumulam até forçar uma nova análise.
+    """
+
+    def __init__(self, tolerance: float = 2.0, size: int = 16):
+        """
+        Parâmetros:
+            tolerance: Diferença absoluta média (0-255) abaixo da qual a vaga é considerada igual.
+            size: Lado da miniatura usada como assinatura.
+        """
+        self.tolerance = tolerance
+        self.size = size
+        self._signatures = {}
+        self._results = {}
+        self._context = None
+
+        # Contadores
+        self.evaluated = 0
+        self.skipped = 0
+
+    def signature(self, roi: np.ndarray) -> np.ndarray:
+        """
+        Miniatura da ROI (em cinza) usada para comparar frames.
+        """
+        h, w = roi.shape[:2]
+        if h == 0 or w == 0:
+            return roi
+        size = (min(self.size, w), min(self.size, h))
+        return cv2.resize(roi, size, interpolation=cv2.INTER_AREA)
+
+    def bind(self, context):
+        """
+        Associa o cache a um contexto (ex.: o frame de fundo).
+
+        Os resultados dependem do contexto; se ele mudar, o cache é descartado.
+        """
+        if context is not self._context:
+            self.reset()
+            self._context = context
+
+    def lookup(self, idx: int, roi: np.ndarray):
+        """
+        Retorna (assinatura, resultado anterior ou None) para a vaga `idx`.
+
+        Quando o resultado anterior é retornado, a análise pode ser pulada;
+        caso contrário, o chamador analisa a vaga e chama `store`.
+        """
+        signature = self.signature(roi)
+        previous = self._signatures.get(idx)
+        if (previous is not None and previous.shape == signature.shape
+                and signature.size > 0
+                and cv2.norm(signature, previous, cv2.NORM_L1) <= self.tolerance * signature.size):
+            self.skipped += 1
+            return signature, self._results[idx]
+        return signature, None
+
+    def store(self, idx: int, signature: np.ndarray, result: tuple):
+        """
+        Registra o resultado da análise completa da vaga `idx`.
+        """
+        self.evaluated += 1
+        self._signatures[idx] = signature
+        self._results[idx] = result
+
+    def invalidate(self, indices):
+        """
+        Esquece as vagas `indices` (ex.: fundo atualizado no próprio array,
+        sem mudar o contexto); elas serão analisadas no próximo frame.
+        """
+        for idx in indices:
+            self._signatures.pop(int(idx), None)
+            self._results.pop(int(idx), None)
+
+    def reset(self):
+        """
+        Esquece todas as assinaturas; as próximas vagas serão analisadas.
+        """
+        self._signatures.clear()
+        self._results.clear()
+        self._context = None
+
+    def summary(self) -> str:
+        total = self.evaluated + self.skipped
+        ratio = self.skipped / total if total else 0.0
+        return f"Vagas analisadas: {self.evaluated} | reaproveitadas: {self.skipped} ({ratio:.0%})"
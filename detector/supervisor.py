@@ -0,0 +1,256 @@
+import json
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+import cv2
+from detector.capture import ThreadedCapture
+from detector.layout_utils import create_detector
+from detector.motion import MotionGate
+from detector.pipeline import GatedDetector, ThroughputStats, iter_records
+from detector.spot_gate import SpotChangeGate
+
+
+def load_manifest(path: str) -> list:
+    """
+    Lê o manifesto de câmeras.
+
+    O arquivo JSON é uma lista (ou {"cameras": [...]}) de entradas com:
+        name: Identificador da câmera (padrão: cam<N>).
+        source: Vídeo, URL ou índice da câmera.
+        background: Imagem do estacionamento vazio (opcional).
+        layout: Spec do layout (opcional, ver `load_layout`).
+        detector: 'rect', 'improved' ou 'polygon' (padrão: 'polygon').
+        stride / sample_hz: Amostragem dos frames (opcional, ver ThreadedCapture).
+        motion_gate: Se true, só analisa quando há movimento (opcional).
+        spot_tolerance: Tolerância do `SpotChangeGate` por vaga (opcional).
+        processing_scale: Fator de redução dos frames antes da detecção (padrão: 1).
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    if isinstance(manifest, dict):
+        manifest = manifest["cameras"]
+
+    cameras = []
+    for i, entry in enumerate(manifest):
+        camera = {
+            "name": entry.get("name", f"cam{i + 1}"),
+            "source": entry["source"],
+            "background": entry.get("background"),
+            "layout": entry.get("layout"),
+            "detector": entry.get("detector", "polygon"),
+            "stride": entry.get("stride", 1),
+            "sample_hz": entry.get("sample_hz"),
+            "motion_gate": entry.get("motion_gate", False),
+            "spot_tolerance": entry.get("spot_tolerance"),
+            "processing_scale": entry.get("processing_scale", 1.0),
+        }
+        cameras.append(camera)
+    return cameras
+
+
+def _pin_to_cpu(cpu: int):
+    """
+    Fixa o processo atual em um núcleo (quando o sistema permite).
+    """
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except OSError:
+            pass
+
+
+def camera_worker(camera: dict, out_queue, cpu: int = None, start_frame: int = 0,
+                  report_interval: float = 5.0):
+    """
+    Processo de uma câmera: lê, detecta e envia os registros para `out_queue`.
+
+    Mensagens enviadas (tuplas):
+        ("record", nome, registro)
+        ("stats", nome, {"frames", "fps"})
+        ("done", nome, None)
+    """
+    _pin_to_cpu(cpu)
+    # Um núcleo por câmera: evita que o OpenCV dispute núcleos entre workers
+    cv2.setNumThreads(1)
+    name = camera["name"]
+
+    bg_frame = None
+    if camera.get("background"):
+        bg_frame = cv2.imread(camera["background"])
+        if bg_frame is None:
+            raise RuntimeError(f"{name}: não foi possível carregar o frame de fundo")
+
+    source = camera["source"]
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    capture = ThreadedCapture(source, stride=camera.get("stride", 1),
+                              sample_hz=camera.get("sample_hz"))
+    if not capture.isOpened():
+        raise RuntimeError(f"{name}: não foi possível abrir o vídeo")
+    if start_frame and not isinstance(source, int):
+        # Reinício: retoma o arquivo a partir do último frame entregue
+        capture.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    spot_gate = None
+    if camera.get("spot_tolerance") is not None:
+        spot_gate = SpotChangeGate(camera["spot_tolerance"])
+    detector = create_detector(camera["detector"], camera.get("layout"), spot_gate,
+                               processing_scale=camera.get("processing_scale", 1.0))
+    if camera.get("motion_gate"):
+        detector = GatedDetector(detector, MotionGate())
+
+    stats = ThroughputStats()
+    window_frames = 0
+    window_start = time.perf_counter()
+
+    def report():
+        elapsed = time.perf_counter() - window_start
+        out_queue.put(("stats", name, {"frames": stats.frames,
+                                       "fps": (stats.frames - window_frames) / elapsed if elapsed > 0 else 0.0}))
+
+    with capture:
+        for record in iter_records(detector, capture, bg_frame, stats, frame_offset=start_frame):
+            out_queue.put(("record", name, record))
+
+            if time.perf_counter() - window_start >= report_interval:
+                report()
+                window_frames = stats.frames
+                window_start = time.perf_counter()
+
+    if stats.frames > window_frames:
+        report()
+    out_queue.put(("done", name, None))
+
+
+class Supervisor:
+    """
+    Executa um processo por câmera e junta os resultados em uma única saída.
+
+    Cada câmera roda em seu próprio processo, fixado em um núcleo (as câmeras
+    são distribuídas entre os núcleos disponíveis), de forma que o trabalho
+    do OpenCV não fica serializado atrás de um único interpretador. Workers
+    que morrem são reiniciados, retomando arquivos a partir do último frame
+    recebido. Registros que o worker morto deixou na fila e que o novo worker
+    repete (frame menor ou igual ao último gravado) são descartados.
+    """
+
+    def __init__(self, cameras: list, sink=None, max_restarts: int = 5,
+                 report_interval: float = 5.0, log=sys.stderr):
+        """
+        Parâmetros:
+            cameras: Entradas do manifesto (ver `load_manifest`).
+            sink: Arquivo onde os registros (com o campo "camera") são gravados em JSONL.
+            max_restarts: Reinícios permitidos por câmera antes de desistir.
+            report_interval: Intervalo, em segundos, dos relatórios de FPS.
+            log: Onde imprimir relatórios e avisos (None para silenciar).
+        """
+        self.cameras = {camera["name"]: camera for camera in cameras}
+        self.sink = sink
+        self.max_restarts = max_restarts
+        self.report_interval = report_interval
+        self.log = log
+
+        self.queue = mp.Queue(maxsize=1024)
+        self.processes = {}
+        self.restarts = {name: 0 for name in self.cameras}
+        self.last_frame = {name: 0 for name in self.cameras}
+        self.duplicates = {name: 0 for name in self.cameras}
+        self.worker_fps = {}
+        self.finished = set()
+        self.failed = set()
+
+        if hasattr(os, "sched_getaffinity"):
+            self._cpus = sorted(os.sched_getaffinity(0))
+        else:
+            self._cpus = list(range(os.cpu_count() or 1))
+
+    def _print(self, message: str):
+        if self.log is not None:
+            print(message, file=self.log, flush=True)
+
+    def _start(self, name: str):
+        index = list(self.cameras).index(name)
+        cpu = self._cpus[index % len(self._cpus)]
+        process = mp.Process(
+            target=camera_worker,
+            args=(self.cameras[name], self.queue, cpu, self.last_frame[name], self.report_interval),
+            name=f"camera-{name}",
+            daemon=True)
+        process.start()
+        self.processes[name] = process
+
+    def _handle(self, message):
+        kind, name, payload = message
+        if kind == "record":
+            if payload["frame"] <= self.last_frame[name]:
+                self.duplicates[name] += 1
+                return
+            self.last_frame[name] = payload["frame"]
+            if self.sink is not None:
+                self.sink.write(json.dumps({"camera": name, **payload}) + "\n")
+        elif kind == "stats":
+            self.worker_fps[name] = payload["fps"]
+            self._print(f"[{name}] {payload['frames']} frames | {payload['fps']:.1f} frames/s")
+        elif kind == "done":
+            self.finished.add(name)
+
+    def _check_workers(self):
+        for name, process in list(self.processes.items()):
+            if process.is_alive() or name in self.finished or name in self.failed:
+                continue
+            process.join()
+            if process.exitcode == 0:
+                # Terminou normalmente; o "done" ainda pode estar na fila
+                self.finished.add(name)
+                continue
+            if self.restarts[name] >= self.max_restarts:
+                self.failed.add(name)
+                self._print(f"[{name}] worker terminou (código {process.exitcode}); desistindo")
+                continue
+            self.restarts[name] += 1
+            self._print(f"[{name}] worker terminou (código {process.exitcode}); "
+                        f"reiniciando ({self.restarts[name]}/{self.max_restarts})")
+            self._start(name)
+
+    def _pending(self) -> bool:
+        return len(self.finished) + len(self.failed) < len(self.cameras)
+
+    def run(self):
+        """
+        Inicia todos os workers e processa as mensagens até todos terminarem.
+        """
+        for name in self.cameras:
+            self._start(name)
+
+        try:
+            last_check = time.monotonic()
+            while self._pending():
+                try:
+                    self._handle(self.queue.get(timeout=0.2))
+                except queue.Empty:
+                    pass
+                if time.monotonic() - last_check >= 0.2:
+                    self._check_workers()
+                    last_check = time.monotonic()
+
+            # Mensagens que chegaram depois do "done"
+            while True:
+                try:
+                    self._handle(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+        finally:
+            self.stop()
+
+        return self
+
+    def stop(self):
+        """
+        Encerra os workers ainda vivos.
+        """
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout=2)
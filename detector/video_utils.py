@@ -1,10 +1,16 @@
+import time
 import cv2
 from detector.parking_detector import ParkingDetector
+from detector.capture import ThreadedCapture, PREFETCH
 
 
-def process_video() -> None:
+def process_video(profiler=None) -> None:
     """
     Processa o vídeo e detecta vagas de estacionamento.
+
+    Parâmetros:
+        profiler: `StageProfiler` opcional; mede leitura, detecção, desenho,
+                  imshow e a latência desde a captura de cada frame.
     """
     bg_frame = cv2.imread("assets/EstacionamentoVazio.png")
     if bg_frame is None:
@@ -20,20 +26,34 @@ def process_video() -> None:
     # bg_frame = cv2.resize(bg_frame, (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(
     #     cap.get(cv2.CAP_PROP_FRAME_HEIGHT))))
 
-    detector = ParkingDetector()
+    # Decodificação em thread separada, sem perder frames
+    capture = ThreadedCapture(cap, policy=PREFETCH).start()
+
+    detector = ParkingDetector(profiler=profiler)
     while True:
-        ret, frame = cap.read()
+        if profiler is not None:
+            t = time.perf_counter()
+        ret, frame = capture.read()
         if not ret:
             break
+        if profiler is not None:
+            t = profiler.lap("read", t)
 
         detections = detector.detect(frame, bg_frame=bg_frame)
+        if profiler is not None:
+            profiler.lap("detect", t)
         annotated = detector.draw_annotations(frame, detections)
 
+        if profiler is not None:
+            t = time.perf_counter()
         cv2.imshow("Parking Spot Detector", annotated)
+        if profiler is not None:
+            profiler.lap("imshow", t)
+            profiler.frame_done(capture.capture_time)
         key = cv2.waitKey(30) & 0xFF
         # ESC para sair
         if key == 27:
             break
 
-    cap.release()
+    capture.release()
     cv2.destroyAllWindows()
\ No newline at end of file
@@ -0,0 +1,168 @@
+import argparse
+import sys
+import cv2
+from detector.adaptive_background import AdaptiveBackground
+from detector.capture import ThreadedCapture
+from detector.color_utils import SpotColorCache
+from detector.events import OccupancyTracker
+from detector.history import OccupancyHistory
+from detector.layout_utils import DETECTORS, create_detector
+from detector.metrics import MetricsRegistry
+from detector.motion import MotionGate, MotionSpotSelector
+from detector.pipeline import GatedDetector, run_headless
+from detector.profiling import StageProfiler
+from detector.server import OccupancyServer, SnapshotStore
+from detector.spot_gate import SpotChangeGate
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Detecta vagas sem interface gráfica e grava a ocupação por frame em JSON Lines.")
+    parser.add_argument("--detector", choices=sorted(DETECTORS), default="polygon",
+                        help="Tipo de detector (padrão: polygon)")
+    parser.add_argument("--layout", default=None,
+                        help="Layout como 'modulo:VARIAVEL', caminho de um arquivo .py ou de "
+                             "um layout .json (com 'resolution', grava ao lado o cache "
+                             "layout.<hash>.<L>x<A>.npz das máscaras; padrão: o layout de "
+                             "configuração do detector)")
+    parser.add_argument("--video", default="assets/Estacionamento.mp4",
+                        help="Vídeo, URL ou índice da câmera")
+    parser.add_argument("--background", default="assets/EstacionamentoVazio.png",
+                        help="Imagem do estacionamento vazio ('' para não usar fundo)")
+    parser.add_argument("--output", default="-",
+                        help="Arquivo JSONL de saída ('-' para a saída padrão)")
+    parser.add_argument("--max-frames", type=int, default=None,
+                        help="Para após analisar N frames")
+    parser.add_argument("--stride", type=int, default=1,
+                        help="Analisa um a cada N frames; os demais não são decodificados")
+    parser.add_argument("--sample-hz", type=float, default=None,
+                        help="Analisa N frames por segundo de vídeo (alternativa a --stride)")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="Só executa o detector quando há movimento na cena")
+    parser.add_argument("--motion-threshold", type=float, default=0.002,
+                        help="Fração de pixels alterados que conta como movimento (padrão: 0.002)")
+    parser.add_argument("--motion-regions", action="store_true",
+                        help="Só analisa as vagas tocadas por regiões com movimento; "
+                             "as demais repetem o resultado anterior")
+    parser.add_argument("--spot-tolerance", type=float, default=None,
+                        help="Reaproveita o resultado de vagas cuja miniatura mudou menos que "
+                             "N níveis de cinza em média (padrão: analisa todas)")
+    parser.add_argument("--processing-scale", type=float, default=1.0,
+                        help="Analisa os frames reduzidos por este fator (ex.: 0.5 = 4x menos pixels)")
+    parser.add_argument("--fast-colors", action="store_true",
+                        help="Calcula a cor uma vez por ocupação, com o k-means rápido")
+    parser.add_argument("--color-refresh", type=int, default=None,
+                        help="Com --fast-colors, recalcula a cor a cada N frames ocupados")
+    parser.add_argument("--adaptive-background", type=float, default=None, metavar="ALPHA",
+                        help="Atualiza o fundo com média ponderada (peso ALPHA) nas vagas livres")
+    parser.add_argument("--events", action="store_true",
+                        help="Grava só as mudanças de estado das vagas em vez de um registro por frame")
+    parser.add_argument("--hysteresis", type=int, default=3,
+                        help="Frames consecutivos para confirmar uma mudança com --events (padrão: 3)")
+    parser.add_argument("--serve", default=None, metavar="HOST:PORT",
+                        help="Serve a ocupação atual por HTTP/WebSocket enquanto processa "
+                             "(ex.: 127.0.0.1:8080)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Coleta métricas (frames, latência, descartes, k-means...); "
+                             "com --serve, expostas em /metrics")
+    parser.add_argument("--metrics-file", default=None, metavar="ARQUIVO.prom",
+                        help="Grava as métricas no formato do Prometheus periodicamente (implica --metrics)")
+    parser.add_argument("--metrics-interval", type=float, default=10.0,
+                        help="Segundos entre gravações de --metrics-file (padrão: 10)")
+    parser.add_argument("--history", default=None, metavar="ARQUIVO.npz",
+                        help="Guarda o histórico de ocupação por vaga (bitsets e agregados por minuto)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Mede cada etapa (leitura, cinza, ROI, diferença, cor...) e mostra p50/p95/p99")
+    parser.add_argument("--profile-window", type=int, default=None, metavar="N",
+                        help="Roda cProfile e tracemalloc nos primeiros N frames (implica --profile)")
+    parser.add_argument("--profile-output", default=None, metavar="ARQUIVO.prof",
+                        help="Com --profile-window, grava as estatísticas do cProfile")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """
+    Processa o vídeo o mais rápido possível, sem janela nem espera entre frames.
+    """
+    args = parse_args(argv)
+
+    bg_frame = None
+    if args.background:
+        bg_frame = cv2.imread(args.background)
+        if bg_frame is None:
+            print("Erro: Não foi possível carregar o frame de fundo.", file=sys.stderr)
+            return 1
+
+    source = int(args.video) if args.video.isdigit() else args.video
+    capture = ThreadedCapture(source, stride=args.stride, sample_hz=args.sample_hz)
+    if not capture.isOpened():
+        print("Erro: Não foi possível abrir o vídeo.", file=sys.stderr)
+        return 1
+
+    spot_gate = None
+    if args.spot_tolerance is not None:
+        spot_gate = SpotChangeGate(args.spot_tolerance)
+    color_cache = None
+    if args.fast_colors:
+        color_cache = SpotColorCache(args.color_refresh)
+    profiler = None
+    if args.profile or args.profile_window:
+        profiler = StageProfiler()
+        if args.profile_window:
+            profiler.start_window(args.profile_window, args.profile_output)
+    motion_selector = MotionSpotSelector() if args.motion_regions else None
+    detector = create_detector(args.detector, args.layout, spot_gate, color_cache,
+                               args.processing_scale, profiler, motion_selector)
+    if args.motion_gate:
+        detector = GatedDetector(detector, MotionGate(min_changed_fraction=args.motion_threshold))
+
+    server = None
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        with capture:
+            tracker = OccupancyTracker(hysteresis=args.hysteresis) if args.events else None
+            adaptive = None
+            if args.adaptive_background is not None and bg_frame is not None:
+                adaptive = AdaptiveBackground(bg_frame, detector, args.adaptive_background)
+            metrics = None
+            if args.metrics or args.metrics_file:
+                metrics = MetricsRegistry(hysteresis=args.hysteresis)
+                if args.metrics_file:
+                    metrics.start_dumping(args.metrics_file, args.metrics_interval)
+            store = None
+            if args.serve:
+                # Com --events, o servidor envia as mesmas transições gravadas
+                store = SnapshotStore(None if tracker else OccupancyTracker(hysteresis=args.hysteresis))
+                host, _, port = args.serve.rpartition(":")
+                server = OccupancyServer(store, tracker, host or "127.0.0.1", int(port), metrics=metrics)
+                server.start_in_thread()
+                print(f"Servindo em http://{server.host}:{server.port}/occupancy", file=sys.stderr)
+            history = OccupancyHistory(len(detector.spots)) if args.history else None
+            stats = run_headless(detector, capture, bg_frame, sink, args.max_frames, tracker=tracker,
+                                 adaptive_background=adaptive, snapshot=store, history=history,
+                                 profiler=profiler, metrics=metrics)
+            if metrics is not None and args.metrics_file:
+                metrics.stop_dumping(args.metrics_file)
+            if history is not None:
+                history.save(args.history)
+    finally:
+        if server is not None:
+            server.stop()
+        if sink is not sys.stdout:
+            sink.close()
+
+    # O resumo vai para stderr para não misturar com o JSONL na saída padrão
+    print(stats.summary(), file=sys.stderr)
+    if spot_gate is not None:
+        print(spot_gate.summary(), file=sys.stderr)
+    if motion_selector is not None:
+        print(motion_selector.summary(), file=sys.stderr)
+    if profiler is not None:
+        print(profiler.summary(), file=sys.stderr)
+        if profiler.window_report:
+            print(profiler.window_report, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,68 @@
+import argparse
 import cv2
 from detector.polygon_parking_detector import PolygonParkingDetector
+from detector.capture import ThreadedCapture
+from detector.display import DetectionWorker, PreviewWindow
+from detector.profiling import StageProfiler
 from config_diagonal import PARKING_SPOTS_CUSTOM
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Detector de vagas com layout personalizado.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Mede cada etapa (leitura, detecção, desenho, imshow) e mostra p50/p95/p99 ao sair")
+    parser.add_argument("--profile-window", type=int, default=None, metavar="N",
+                        help="Roda cProfile e tracemalloc nos primeiros N frames (implica --profile)")
+    parser.add_argument("--display-fps", type=float, default=30.0,
+                        help="Taxa de atualização da janela (padrão: 30)")
+    parser.add_argument("--detect-fps", type=float, default=30.0,
+                        help="Taxa máxima de análise dos frames; 0 analisa o mais rápido possível "
+                             "(padrão: 30)")
+    return parser.parse_args(argv)
+
+
+def draw_hud(annotated, frame_num: int, detections: list):
+    """
+    Escreve no frame o número do frame, o status de cada vaga e o resumo.
+    """
+    info_text = f"Frame: {frame_num} | Layout: Personalizado"
+    cv2.putText(annotated, info_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
+               0.7, (255, 255, 255), 2)
+    
+    # Status das vagas
+    status_text = "Status: "
+    occupied_count = 0
+    for i, (occupied, _) in enumerate(detections):
+        status = 'O' if occupied else 'L'
+        status_text += f"V{i+1}:{status} "
+        if occupied:
+            occupied_count += 1
+    
+    cv2.putText(annotated, status_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 
+               0.6, (255, 255, 255), 2)
+    
+    # Contador de vagas
+    summary_text = f"Ocupadas: {occupied_count}/{len(detections)} | Livres: {len(detections) - occupied_count}"
+    cv2.putText(annotated, summary_text, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 
+               0.6, (0, 255, 255), 2)
+    
+    # Instruções
+    cv2.putText(annotated, "q:sair p:pausar r:reiniciar", (10, annotated.shape[0] - 20), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return annotated
+
+
+def main(argv=None):
     """
     Função principal para detectar vagas de estacionamento usando layout personalizado.
     """
+    args = parse_args(argv)
+    profiler = None
+    if args.profile or args.profile_window:
+        profiler = StageProfiler()
+        if args.profile_window:
+            profiler.start_window(args.profile_window)
+
     # Carregar imagens
     bg_frame = cv2.imread("assets/EstacionamentoVazio.png")
     if bg_frame is None:
@@ -18,8 +74,11 @@ def main():
         print("Erro: Não foi possível abrir o vídeo.")
         return
 
+    # Decodificação em thread separada; o vídeo recomeça ao chegar no fim
+    capture = ThreadedCapture(cap, loop=True).start()
+
     # Criar detector com layout personalizado
-    detector = PolygonParkingDetector(PARKING_SPOTS_CUSTOM)
+    detector = PolygonParkingDetector(PARKING_SPOTS_CUSTOM, profiler=profiler)
     
     print("=== DETECTOR DE VAGAS - LAYOUT PERSONALIZADO ===")
     print("V1: Formato trapézio (topo maior que base)")
@@ -30,68 +89,41 @@ def main():
     print("- 'q' ou ESC: Sair")
     print("- 'p': Pausar/Despausar")
     print("- 'r': Reiniciar vídeo")
+    print("- Fechar a janela: Sair")
     print("-" * 50)
     
-    paused = False
-    frame_num = 0
+    # A análise roda em uma thread própria, na sua taxa; a janela mostra o
+    # resultado mais recente na taxa dela e só redesenha quando há um novo
+    worker = DetectionWorker(capture, detector, bg_frame, fps=args.detect_fps,
+                             profiler=profiler).start()
+    preview = PreviewWindow(
+        "Parking Spot Detector - Layout Personalizado",
+        lambda result: draw_hud(detector.draw_annotations(result.frame, result.detections),
+                                result.frame_number, result.detections),
+        fps=args.display_fps, profiler=profiler)
     
-    while True:
-        if not paused:
-            ret, frame = cap.read()
-            if not ret:
-                # Reiniciar vídeo automaticamente
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                frame_num = 0
-                continue
-            frame_num += 1
-        
-        # Detecção
-        detections = detector.detect(frame, bg_frame)
-        annotated = detector.draw_annotations(frame, detections)
-        
-        # Informações na tela
-        info_text = f"Frame: {frame_num} | Layout: Personalizado"
-        cv2.putText(annotated, info_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                   0.7, (255, 255, 255), 2)
-        
-        # Status das vagas
-        status_text = "Status: "
-        occupied_count = 0
-        for i, (occupied, _) in enumerate(detections):
-            status = 'O' if occupied else 'L'
-            status_text += f"V{i+1}:{status} "
-            if occupied:
-                occupied_count += 1
-        
-        cv2.putText(annotated, status_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 
-                   0.6, (255, 255, 255), 2)
-        
-        # Contador de vagas
-        summary_text = f"Ocupadas: {occupied_count}/{len(detections)} | Livres: {len(detections) - occupied_count}"
-        cv2.putText(annotated, summary_text, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 
-                   0.6, (0, 255, 255), 2)
-        
-        # Instruções
-        cv2.putText(annotated, "q:sair p:pausar r:reiniciar", (10, annotated.shape[0] - 20), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-        
-        cv2.imshow("Parking Spot Detector - Layout Personalizado", annotated)
+    while not worker.finished.is_set():
+        preview.update(worker.latest.get())
         
-        key = cv2.waitKey(30 if not paused else 0) & 0xFF
-        if key == ord('q') or key == 27:  # 'q' ou ESC
+        key = preview.wait_key()
+        if key == ord('q') or key == 27 or preview.closed():  # 'q', ESC ou janela fechada
             break
         elif key == ord('p'):
-            paused = not paused
+            paused = worker.toggle_pause()
             status = "PAUSADO" if paused else "EXECUTANDO"
             print(f"Status: {status}")
         elif key == ord('r'):
-            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            frame_num = 0
+            capture.restart()
             print("Vídeo reiniciado")
     
     # Cleanup
-    cap.release()
+    worker.stop()
+    capture.release()
     cv2.destroyAllWindows()
+    if profiler is not None:
+        print(profiler.summary())
+        if profiler.window_report:
+            print(profiler.window_report)
     print("Detector finalizado.")
 
 
@@ -0,0 +1,40 @@
+import argparse
+import sys
+from detector.supervisor import Supervisor, load_manifest
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Executa um detector por câmera, em processos separados, "
+                    "e junta a ocupação de todas em um único JSONL.")
+    parser.add_argument("manifest", help="Arquivo JSON com as câmeras")
+    parser.add_argument("--output", default="-",
+                        help="Arquivo JSONL de saída ('-' para a saída padrão)")
+    parser.add_argument("--max-restarts", type=int, default=5,
+                        help="Reinícios permitidos por câmera (padrão: 5)")
+    parser.add_argument("--report-interval", type=float, default=5.0,
+                        help="Intervalo dos relatórios de FPS em segundos (padrão: 5)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    cameras = load_manifest(args.manifest)
+
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        supervisor = Supervisor(cameras, sink, args.max_restarts, args.report_interval).run()
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+
+    for name in supervisor.cameras:
+        fps = supervisor.worker_fps.get(name, 0.0)
+        status = "falhou" if name in supervisor.failed else "ok"
+        print(f"[{name}] {status} | {supervisor.last_frame[name]} frames | {fps:.1f} frames/s",
+              file=sys.stderr)
+    return 1 if supervisor.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
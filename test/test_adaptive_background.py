@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from detector.adaptive_background import AdaptiveBackground
+from detector.improved_parking_detector import ImprovedParkingDetector
+from detector.parking_detector import ParkingDetector
+from detector.polygon_parking_detector import PolygonParkingDetector
+from detector.spot_gate import SpotChangeGate
+
+
+def test_free_spots_follow_lighting_drift():
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    detector = PolygonParkingDetector()
+    adaptive = AdaptiveBackground(bg, detector, alpha=0.5, refresh_interval=1)
+
+    car_box = (slice(150, 430), slice(460, 660))
+    frame = np.full_like(bg, 100)
+    frame[car_box] = 0
+    occupancy = [(False, None), (False, None), (True, None), (False, None)]
+    for _ in range(10):
+        adaptive.update(frame, occupancy)
+    detections = detector.detect(frame, adaptive.frame)
+
+    assert [occupied for occupied, _ in detections] == [False, False, True, False]
+    # O fundo não absorveu o carro nem mudou fora das vagas
+    assert adaptive.frame[300, 560, 0] == 90
+    assert adaptive.frame[470, 890, 0] == 90
+    assert bg[0, 0, 0] == 90
+    assert PolygonParkingDetector().detect(frame, bg)[0][0] is True
+
+
+def test_incremental_refresh_matches_rebuild():
+    rng = np.random.default_rng(0)
+    bg = rng.integers(60, 120, (480, 900, 3), dtype=np.uint8)
+    frame = rng.integers(60, 120, bg.shape, dtype=np.uint8)
+    for detector in (ImprovedParkingDetector(), PolygonParkingDetector(), ParkingDetector()):
+        adaptive = AdaptiveBackground(bg, detector, alpha=0.3, refresh_interval=2)
+        detections = [(idx % 2 == 1, None) for idx in range(len(detector.spots))]
+        detector.detect(frame, adaptive.frame)
+        for _ in range(4):
+            adaptive.update(frame, detections)
+
+        fresh = type(detector)()
+        occupancy = [o for o, _ in detector.detect(frame, adaptive.frame)]
+        assert occupancy == [o for o, _ in fresh.detect(frame, adaptive.frame.copy())]
+        if isinstance(detector, ImprovedParkingDetector):
+            cached = detector.register_background(adaptive.frame)
+            rebuilt = fresh.register_background(adaptive.frame.copy())
+            assert all(np.array_equal(a, b) for a, b in zip(cached.rois, rebuilt.rois))
+            assert cached.variances == rebuilt.variances
+
+
+@pytest.mark.parametrize("detector_cls", [ParkingDetector, ImprovedParkingDetector, PolygonParkingDetector])
+def test_refresh_invalidates_spot_gate(detector_cls):
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    frame = bg.copy()
+    frame[150:430, 460:660] = 0
+    detector = detector_cls(spot_gate=SpotChangeGate())
+    detector.detect(frame, bg)
+
+    # Fundo alterado no próprio array: o mesmo objeto, mas os resultados antigos não valem
+    bg[:] = frame
+    indices = list(range(len(detector.spots)))
+    detector.refresh_background(bg, indices)
+    skipped = detector.spot_gate.skipped
+    assert detector.detect(frame, bg) == detector_cls().detect(frame, bg.copy())
+    assert detector.spot_gate.skipped == skipped
+
+
+@pytest.mark.parametrize("detector_cls", [ImprovedParkingDetector, PolygonParkingDetector])
+def test_resized_background_is_refreshed_in_place(detector_cls):
+    bg = np.full((240, 450, 3), 90, dtype=np.uint8)
+    frame = np.full((480, 900, 3), 100, dtype=np.uint8)
+    frame[150:430, 460:660] = 0
+    detector = detector_cls()
+    adaptive = AdaptiveBackground(bg, detector, alpha=0.5, refresh_interval=2)
+    cache = detector._background
+    builds = []
+    build = cache._build
+    cache._build = lambda resized: builds.append(resized.shape) or build(resized)
+
+    for _ in range(6):
+        background = adaptive.background(frame.shape)
+        detections = detector.detect(frame, background)
+        adaptive.update(frame, detections)
+
+    # Redimensionado uma vez; depois só as vagas alteradas são recalculadas
+    assert builds == [(480, 900, 3)]
+    assert cache._source is adaptive.frame
+    assert detector.detect(frame, adaptive.frame) == detector_cls().detect(frame, adaptive.frame.copy())
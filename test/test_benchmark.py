@@ -0,0 +1,40 @@
+import json
+import numpy as np
+import benchmark
+from detector.benchmark import compare, run_suite, synthetic_scene
+from detector.polygon_parking_detector import PolygonParkingDetector
+
+
+def test_synthetic_scene_is_reproducible_and_detectable():
+    scene = synthetic_scene(12, (240, 320), num_frames=3, seed=5)
+    again = synthetic_scene(12, (240, 320), num_frames=3, seed=5)
+    assert len(scene.rects) == len(scene.polygons) == 12
+    assert all(np.array_equal(a, b) for a, b in zip(scene.frames, again.frames))
+    for x, y, w, h in scene.rects:
+        assert x >= 0 and y >= 0 and x + w <= 320 and y + h <= 240
+
+    detector = PolygonParkingDetector(scene.polygons)
+    for frame, expected in zip(scene.frames, scene.occupancy):
+        assert [occupied for occupied, _ in detector.detect(frame, scene.background)] == list(expected)
+
+
+def test_suite_output_and_baseline_comparison(tmp_path):
+    results = run_suite((4,), ((120, 160),), ("polygon.detect", "get_dominant_color"),
+                        repeat=3, stages=True)
+    entry = results["results"]["polygon.detect@(120, 160)/4"]
+    assert entry["samples"] == 3 and entry["p50_ms"] <= entry["p99_ms"]
+    assert entry["peak_memory_mb"] > 0 and "diff" in entry["stages_p50_ms"]
+
+    slower = json.loads(json.dumps(results))
+    for row in slower["results"].values():
+        row["p50_ms"] = row["p50_ms"] * 2 + 1
+    assert not any(row.regressed for row in compare(results, results))
+    assert all(row.regressed for row in compare(slower, results))
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"meta": {}, "results": {
+        "polygon.detect@480p/4": {"p50_ms": 1e-6}}}))
+    argv = ["--spots", "4", "--resolutions", "480p", "--functions", "polygon.detect",
+            "--repeat", "2", "--no-memory", "--output", str(tmp_path / "out.json")]
+    assert benchmark.main(argv + ["--baseline", str(baseline)]) == 1
+    assert "polygon.detect@480p/4" in json.loads((tmp_path / "out.json").read_text())["results"]
@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+from detector.calibration import SampleReservoir
+from detector.improved_parking_detector import ImprovedParkingDetector
+
+
+def sample_frames(count=12):
+    rng = np.random.default_rng(0)
+    bg = rng.integers(60, 120, (480, 900, 3), dtype=np.uint8)
+    frames = []
+    for n in range(count):
+        frame = np.clip(bg.astype(int) + rng.integers(-n, n + 1, bg.shape), 0, 255).astype(np.uint8)
+        frames.append(frame)
+    return bg, frames
+
+
+def test_stream_matches_list_calibration(tmp_path):
+    bg, frames = sample_frames()
+    reference = ImprovedParkingDetector()
+    reference.calibrate_thresholds(bg, frames)
+
+    detector = ImprovedParkingDetector()
+    assert detector.calibrate_stream(bg, iter(frames), workers=3) is False
+    assert detector.adaptive_thresholds == reference.adaptive_thresholds
+
+    # Vídeo lido direto do arquivo
+    video = str(tmp_path / "v.avi")
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"FFV1"), 10, (900, 480))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    from_file = ImprovedParkingDetector()
+    from_file.calibrate_stream(bg, video)
+    assert from_file.adaptive_thresholds == reference.adaptive_thresholds
+
+
+def test_thresholds_persisted_by_layout_and_background(tmp_path):
+    bg, frames = sample_frames(4)
+    cache = str(tmp_path / "thresholds.json")
+    first = ImprovedParkingDetector()
+    assert first.calibrate_stream(bg, frames, cache) is False
+
+    restarted = ImprovedParkingDetector()
+    assert restarted.calibrate_stream(bg, [], cache) is True
+    assert restarted.calibrated
+    assert restarted.adaptive_thresholds == first.adaptive_thresholds
+
+    # Outro fundo: não reaproveita
+    other = ImprovedParkingDetector()
+    assert other.calibrate_stream(bg + 1, frames, cache) is False
+
+
+def test_reservoir_memory_is_bounded():
+    reservoir = SampleReservoir(16, 2)
+    for n in range(1000):
+        reservoir.add(np.array([n, -n]))
+    assert reservoir.seen == 1000
+    assert reservoir.filled.shape == (16, 2)
+    assert 200 < reservoir.percentile(50)[0] < 800
+
+
+def test_corrupt_thresholds_cache_is_recalibrated(tmp_path):
+    bg, frames = sample_frames(4)
+    cache = tmp_path / "thresholds.json"
+    cache.write_text('{"abc": {"0": 1.')
+
+    detector = ImprovedParkingDetector()
+    assert detector.calibrate_stream(bg, frames, str(cache)) is False
+    assert detector.calibrated
+
+    restarted = ImprovedParkingDetector()
+    assert restarted.calibrate_stream(bg, [], str(cache)) is True
+    assert restarted.adaptive_thresholds == detector.adaptive_thresholds
@@ -0,0 +1,80 @@
+import threading
+import time
+import cv2
+import numpy as np
+import pytest
+from detector.capture import ThreadedCapture, PREFETCH, LATEST, _END, default_policy
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = str(tmp_path / "video.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for i in range(20):
+        frame = np.full((48, 64, 3), i * 10, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def test_prefetch_delivers_every_frame_in_order(video_path):
+    with ThreadedCapture(video_path, queue_size=4) as capture:
+        assert capture.policy == PREFETCH
+        numbers = []
+        while True:
+            ret, frame = capture.read(timeout=5)
+            if not ret:
+                break
+            numbers.append(capture.frame_number)
+        assert numbers == list(range(1, 21))
+        assert capture.dropped_frames == 0
+        # O fim do vídeo continua sendo reportado
+        assert capture.read(timeout=1) == (False, None)
+
+
+def test_latest_drops_oldest_frames(video_path):
+    with ThreadedCapture(video_path, policy=LATEST, queue_size=2) as capture:
+        # Deixa a thread decodificar tudo antes de consumir
+        deadline = time.time() + 5
+        while capture.frames_read < 20 and time.time() < deadline:
+            time.sleep(0.01)
+
+        delivered = []
+        while True:
+            ret, _ = capture.read(timeout=5)
+            if not ret:
+                break
+            delivered.append(capture.frame_number)
+
+        assert capture.dropped_frames > 0
+        assert len(delivered) + capture.dropped_frames == 20
+        assert delivered[-1] == 20
+
+
+def test_default_policy():
+    assert default_policy(0) == LATEST
+    assert default_policy("rtsp://camera/stream") == LATEST
+    assert default_policy("assets/Estacionamento.mp4") == PREFETCH
+
+
+def test_restart_while_decoder_is_finishing(video_path):
+    class SlowEnd(ThreadedCapture):
+        def _put(self, item):
+            if item is _END:
+                # Janela entre ver o fim do vídeo e enfileirar o marcador
+                finishing.set()
+                time.sleep(0.2)
+            super()._put(item)
+
+    finishing = threading.Event()
+    with SlowEnd(video_path, queue_size=32) as capture:
+        assert finishing.wait(5)
+        capture.restart()
+        numbers = []
+        while True:
+            ret, _ = capture.read(timeout=5)
+            if not ret:
+                break
+            numbers.append(capture.frame_number)
+        assert numbers == list(range(1, 21))
+        assert capture.ended
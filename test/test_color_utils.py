@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+import pytest
+from detector.color_utils import SpotColorCache, get_dominant_color, get_dominant_color_fast
+from detector.improved_parking_detector import ImprovedParkingDetector
+from detector.parking_detector import ParkingDetector
+from detector.polygon_parking_detector import PolygonParkingDetector
+from detector.spot_gate import SpotChangeGate
+
+
+def car_roi(body, seed=0):
+    rng = np.random.default_rng(seed)
+    roi = np.full((150, 90, 3), 80, dtype=np.uint8)
+    roi[20:130, 10:80] = np.clip(np.asarray(body) + rng.normal(0, 8, (110, 70, 3)), 0, 255)
+    roi[40:60, 15:75] = (30, 30, 30)
+    return roi
+
+
+def test_fast_color_within_tolerance_of_kmeans():
+    for seed, body in enumerate([(200, 40, 40), (40, 160, 220), (230, 230, 230)]):
+        roi = car_roi(body, seed)
+        expected = get_dominant_color(roi)
+        fast = get_dominant_color_fast(roi)
+        assert max(abs(a - b) for a, b in zip(expected, fast)) <= 2
+        assert get_dominant_color_fast(roi) == fast
+
+
+def test_fast_color_leaves_opencv_rng_alone():
+    cv2.setRNGSeed(123)
+    expected = cv2.randu(np.zeros(8, dtype=np.float32), 0, 1).copy()
+    cv2.setRNGSeed(123)
+    get_dominant_color_fast(car_roi((200, 40, 40)))
+    assert np.array_equal(cv2.randu(np.zeros(8, dtype=np.float32), 0, 1), expected)
+
+
+def test_fast_color_respects_mask():
+    roi = np.zeros((40, 40, 3), dtype=np.uint8)
+    roi[:, 30:] = (10, 200, 10)
+    mask = np.zeros((40, 40), dtype=np.uint8)
+    mask[:, 30:] = 255
+    assert get_dominant_color_fast(roi, mask) == (10, 200, 10)
+    assert get_dominant_color_fast(roi, np.zeros_like(mask)) is None
+
+
+def test_color_memoized_per_occupancy_episode():
+    calls = []
+    cache = SpotColorCache(refresh_interval=3, engine=lambda image, mask: calls.append(1) or len(calls))
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    colors = [cache.update(0, occupied, image) for occupied in (True, True, True, True, False, True)]
+    assert colors == [1, 1, 1, 2, None, 3]
+    assert (cache.computed, cache.reused) == (3, 2)
+
+
+def test_detectors_use_color_cache():
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    car = bg.copy()
+    car[150:430, 460:660] = (0, 0, 200)
+
+    # O polígono mantém a cor média: mesmo resultado que sem cache
+    polygon = PolygonParkingDetector(color_cache=SpotColorCache())
+    expected = PolygonParkingDetector().detect(car, bg)
+    for _ in range(3):
+        assert polygon.detect(car, bg) == expected
+    assert expected[2][0] and polygon.color_cache.computed == 1
+    compiled = PolygonParkingDetector(compiled=True, color_cache=SpotColorCache())
+    assert compiled.detect(car, bg) == PolygonParkingDetector(compiled=True).detect(car, bg)
+
+    rect = ParkingDetector(color_cache=SpotColorCache())
+    rect.detect(car, bg)
+    rect.detect(car, bg)
+    assert rect.color_cache.reused == rect.color_cache.computed
+
+
+@pytest.mark.parametrize("detector_cls", [ParkingDetector, ImprovedParkingDetector, PolygonParkingDetector])
+def test_gated_frames_count_towards_color_refresh(detector_cls):
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    car = bg.copy()
+    car[150:430, 460:660] = (0, 0, 200)
+    detector = detector_cls(spot_gate=SpotChangeGate(), color_cache=SpotColorCache(refresh_interval=3))
+
+    # Três frames ocupados, dois deles reaproveitados pelo gate
+    for _ in range(3):
+        detector.detect(car, bg)
+    assert detector.color_cache.computed == 1
+
+    car[150:430, 460:660] = (200, 0, 0)
+    assert detector.detect(car, bg)[2][0]
+    assert detector.color_cache.computed == 2
@@ -0,0 +1,37 @@
+import numpy as np
+from detector.polygon_parking_detector import PolygonParkingDetector
+
+POLYGONS = [
+    np.array([[5, 140], [170, 160], [155, 440], [15, 440]]),
+    # Sobrepõe a vaga anterior
+    np.array([[100, 150], [360, 140], [360, 440], [200, 440]]),
+    np.array([[450, 140], [660, 150], [680, 440], [450, 440]]),
+    # Encosta na borda do frame
+    np.array([[700, 140], [899, 150], [899, 479], [700, 425]]),
+]
+
+
+def random_scene(seed):
+    rng = np.random.default_rng(seed)
+    bg = rng.integers(0, 255, (480, 900, 3), dtype=np.uint8)
+    frame = bg.copy()
+    for _ in range(4):
+        x, y = rng.integers(0, 800), rng.integers(0, 400)
+        frame[y:y+rng.integers(10, 300), x:x+rng.integers(10, 300)] = rng.integers(0, 255, 3)
+    return bg, frame
+
+
+def test_compiled_matches_per_spot_loop():
+    for seed in range(10):
+        bg, frame = random_scene(seed)
+        expected = PolygonParkingDetector(POLYGONS).detect(frame, bg)
+        assert PolygonParkingDetector(POLYGONS, compiled=True).detect(frame, bg) == expected
+
+
+def test_overlapping_spots_keep_their_full_area():
+    detector = PolygonParkingDetector(POLYGONS, compiled=True)
+    layout = detector.compile_layout((480, 900))
+    masks = detector._masks_for_shape((480, 900))
+    for idx, mask in masks.items():
+        assert layout.mask_pixels[idx] == np.count_nonzero(mask)
+    assert layout.pixel_index.size > np.count_nonzero(layout.label_map())
@@ -0,0 +1,27 @@
+import cv2
+import numpy as np
+from detector.crop_utils import CroppedGray, spot_crops
+
+
+def test_compact_layout_becomes_union():
+    boxes = [(100 + i * 70, 900 + j * 130, 60, 120) for i in range(10) for j in range(2)]
+    assert spot_crops(boxes, (2160, 3840)) == [(100, 900, 690, 250)]
+
+
+def test_scattered_layout_keeps_disjoint_crops():
+    boxes = [(0, 0, 100, 100), (110, 0, 100, 100), (3000, 2000, 100, 100), (3700, 2100, 200, 200)]
+    crops = spot_crops(boxes, (2160, 3840))
+    assert sorted(crops) == [(0, 0, 210, 100), (3000, 2000, 100, 100), (3700, 2100, 140, 60)]
+
+
+def test_cropped_gray_matches_full_conversion_inside_spots():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (480, 900, 3), dtype=np.uint8)
+    boxes = [(10, 20, 50, 60), (700, 400, 300, 300)]
+    cropped = CroppedGray(boxes)
+    gray = cropped.convert(frame)
+    full = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    assert np.array_equal(gray[20:80, 10:60], full[20:80, 10:60])
+    assert np.array_equal(gray[400:, 700:], full[400:, 700:])
+    assert cropped.coverage < 0.2
+
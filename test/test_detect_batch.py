@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from detector.parking_detector import ParkingDetector
+from detector.improved_parking_detector import ImprovedParkingDetector
+from detector.polygon_parking_detector import PolygonParkingDetector
+
+
+def make_frames(count=6, seed=0):
+    rng = np.random.default_rng(seed)
+    bg = rng.integers(60, 120, (480, 900, 3), dtype=np.uint8)
+    frames = []
+    for _ in range(count):
+        frame = bg.copy()
+        for _ in range(3):
+            x, y = rng.integers(0, 800), rng.integers(100, 400)
+            frame[y:y+rng.integers(40, 300), x:x+rng.integers(40, 250)] = rng.integers(0, 255, 3)
+        frames.append(frame)
+    return bg, np.stack(frames)
+
+
+@pytest.mark.parametrize("detector_cls", [ParkingDetector, ImprovedParkingDetector, PolygonParkingDetector])
+@pytest.mark.parametrize("with_background", [True, False])
+def test_batch_matches_single_frame(detector_cls, with_background):
+    bg, frames = make_frames()
+    bg_frame = bg if with_background else None
+    detector = detector_cls()
+
+    occupancy, colors = detector.detect_batch(frames, bg_frame, batch_size=4)
+    assert occupancy.shape == (len(frames), len(detector.spots))
+    assert len(colors) == len(frames)
+
+    for frame, row, row_colors in zip(frames, occupancy, colors):
+        expected = detector.detect(frame, bg_frame)
+        assert list(row) == [occupied for occupied, _ in expected]
+        assert [c is not None for c in row_colors] == list(row)
+        if detector_cls is PolygonParkingDetector:
+            assert row_colors == [color for _, color in expected]
+
+
+def test_batch_accepts_iterator_and_empty_input():
+    bg, frames = make_frames(3)
+    detector = PolygonParkingDetector()
+    occupancy, _ = detector.detect_batch(iter(list(frames)), bg, batch_size=2)
+    expected, _ = detector.detect_batch(frames, bg)
+    assert np.array_equal(occupancy, expected)
+
+    occupancy, colors = detector.detect_batch(iter([]), bg)
+    assert occupancy.shape == (0, len(detector.spots))
+    assert colors == []
+
+
+@pytest.mark.parametrize("detector_cls", [ParkingDetector, ImprovedParkingDetector])
+def test_batch_handles_spot_past_frame_edge(detector_cls):
+    bg, frames = make_frames()
+    # Vaga que passa da borda direita: a ROI fica mais estreita que w
+    detector = detector_cls(spots=[(880, 200, 60, 40), (100, 200, 60, 40)])
+    occupancy, _ = detector.detect_batch(frames, bg, batch_size=4)
+    for frame, row in zip(frames, occupancy):
+        assert list(row) == [occupied for occupied, _ in detector.detect(frame, bg)]
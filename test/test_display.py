@@ -0,0 +1,82 @@
+import time
+import cv2
+import numpy as np
+import pytest
+from detector import display
+from detector.capture import ThreadedCapture
+from detector.display import DetectionWorker, LatestResult, PreviewWindow
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = str(tmp_path / "video.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for i in range(20):
+        writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+class CountingDetector:
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, frame, bg_frame=None):
+        self.calls += 1
+        return [(bool(frame.mean() > 100), None)]
+
+
+def test_worker_analyzes_each_frame_once(video_path):
+    detector = CountingDetector()
+    with ThreadedCapture(video_path) as capture:
+        worker = DetectionWorker(capture, detector).start()
+        assert worker.finished.wait(5)
+        worker.stop()
+    assert detector.calls == worker.frames == 20
+    result = worker.latest.get()
+    assert result.seq == 20 and result.frame_number == 20
+    assert capture.ended
+
+
+def test_paused_worker_does_not_detect(video_path):
+    detector = CountingDetector()
+    with ThreadedCapture(video_path, loop=True) as capture:
+        worker = DetectionWorker(capture, detector, fps=200).start()
+        while worker.latest.get() is None:
+            time.sleep(0.01)
+        assert worker.toggle_pause()
+        time.sleep(0.05)
+        calls = detector.calls
+        time.sleep(0.2)
+        assert detector.calls == calls
+        worker.resume()
+        time.sleep(0.1)
+        assert detector.calls > calls
+        worker.stop()
+
+
+def test_preview_renders_only_new_results(monkeypatch):
+    shown = []
+    monkeypatch.setattr(display.cv2, "imshow", lambda name, image: shown.append(image))
+    monkeypatch.setattr(display.cv2, "getWindowProperty", lambda name, prop: 1.0)
+    latest = LatestResult()
+    preview = PreviewWindow("preview", lambda result: result.frame, fps=10)
+
+    assert not preview.update(latest.get())
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    latest.publish(frame, [(False, None)])
+    assert preview.update(latest.get())
+    # Mesmo resultado (ex.: pausado): nada é redesenhado
+    assert not preview.update(latest.get())
+    latest.publish(frame + 1, [(True, None)])
+    assert preview.update(latest.get())
+    assert len(shown) == preview.rendered == 2
+    assert preview.skipped_unchanged == 2
+
+    # Janela oculta: o desenho é pulado
+    monkeypatch.setattr(display.cv2, "getWindowProperty", lambda name, prop: 0.0)
+    latest.publish(frame, [(False, None)])
+    assert not preview.update(latest.get())
+    assert preview.skipped_hidden == 1 and not preview.closed()
+    monkeypatch.setattr(display.cv2, "getWindowProperty", lambda name, prop: -1.0)
+    assert preview.closed()
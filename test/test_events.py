@@ -0,0 +1,72 @@
+import asyncio
+import json
+import cv2
+import numpy as np
+import headless
+from detector.events import OccupancyEvent, OccupancyTracker
+from detector.polygon_parking_detector import PolygonParkingDetector
+
+FREE = [(False, None)] * 3
+
+
+def with_car(spot=1, color=(1, 2, 3)):
+    detections = list(FREE)
+    detections[spot] = (True, color)
+    return detections
+
+
+def test_hysteresis_filters_flicker():
+    tracker = OccupancyTracker(hysteresis=3)
+    received = []
+    tracker.subscribe(received.append)
+
+    initial = tracker.update(FREE, 1, 0.0)
+    assert [e.old for e in initial] == [None] * 3
+
+    sequence = [with_car(), FREE, with_car(), with_car(), with_car(), FREE]
+    events = [tracker.update(d, n, n / 10) for n, d in enumerate(sequence, start=2)]
+    assert events[:4] == [[], [], [], []]
+    assert events[4] == [OccupancyEvent(1, False, True, 4, 0.4, (1, 2, 3))]
+    assert events[5] == []
+    assert received == initial + events[4]
+    assert tracker.states == [False, True, False]
+
+
+def test_asyncio_queue_and_detector():
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    car = bg.copy()
+    car[150:430, 460:660] = (0, 0, 0)
+
+    async def consume():
+        tracker = OccupancyTracker(PolygonParkingDetector(), hysteresis=1, emit_initial=False)
+        queue = tracker.subscribe_queue()
+        tracker.detect(bg, bg)
+        tracker.detect(car, bg)
+        return await asyncio.wait_for(queue.get(), 1)
+
+    event = asyncio.run(consume())
+    assert (event.spot, event.old, event.new, event.frame) == (2, False, True, 2)
+    assert event.color is not None
+
+
+def test_headless_events(tmp_path):
+    video = str(tmp_path / "video.avi")
+    background = str(tmp_path / "bg.png")
+    output = tmp_path / "events.jsonl"
+
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    cv2.imwrite(background, bg)
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"FFV1"), 10, (900, 480))
+    for n in range(8):
+        frame = bg.copy()
+        if n >= 3:
+            frame[150:430, 460:660] = (0, 0, 0)
+        writer.write(frame)
+    writer.release()
+
+    assert headless.main(["--video", video, "--background", background,
+                          "--output", str(output), "--events", "--hysteresis", "2"]) == 0
+    events = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(events) == 5
+    assert events[-1]["spot"] == 2 and events[-1]["new"] is True
+    assert events[-1]["frame"] == 4 and events[-1]["timestamp"] == 0.3
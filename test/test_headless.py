@@ -0,0 +1,41 @@
+import json
+import cv2
+import numpy as np
+import headless
+from detector.layout_utils import create_detector, load_layout
+
+
+def test_headless_writes_one_record_per_frame(tmp_path, capsys):
+    video = str(tmp_path / "video.avi")
+    background = str(tmp_path / "bg.png")
+    output = tmp_path / "out.jsonl"
+
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    cv2.imwrite(background, bg)
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"MJPG"), 10, (900, 480))
+    for _ in range(5):
+        frame = bg.copy()
+        frame[150:430, 460:660] = (20, 20, 220)
+        writer.write(frame)
+    writer.release()
+
+    code = headless.main(["--detector", "polygon", "--video", video,
+                          "--background", background, "--output", str(output)])
+    assert code == 0
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r["frame"] for r in records] == [1, 2, 3, 4, 5]
+    assert records[1]["timestamp"] == 0.1
+    assert len(records[0]["spots"]) == 4
+    assert records[0]["spots"][2]["occupied"] is True
+    assert "frames/s" in capsys.readouterr().err
+
+
+def test_layout_loading(tmp_path):
+    layout_file = tmp_path / "my_layout.py"
+    layout_file.write_text("PARKING_SPOTS = [(0, 0, 10, 10)]\n")
+    assert load_layout(str(layout_file)) == [(0, 0, 10, 10)]
+    assert len(load_layout("config_diagonal:PARKING_SPOTS_CUSTOM")) == 4
+
+    detector = create_detector("rect", str(layout_file))
+    assert detector.spots == [(0, 0, 10, 10)]
@@ -0,0 +1,60 @@
+import numpy as np
+from detector.history import OccupancyHistory
+
+
+def simulate(history, occupancy, times):
+    for row, timestamp in zip(occupancy, times):
+        history.add([(occupied, None) for occupied in row], timestamp)
+
+
+def longest_free(column, durations):
+    best = run = 0.0
+    for free, duration in zip(~column, durations):
+        run = run + duration if free else 0.0
+        best = max(best, run)
+    return best
+
+
+def test_queries_match_full_resolution():
+    rng = np.random.default_rng(0)
+    # 10 fps, 20 vagas, 300 s; ocupação em blocos para haver sequências livres longas
+    times = np.arange(3000) / 10
+    occupancy = np.repeat(rng.random((60, 20)) < 0.4, 50, axis=0)
+
+    full = OccupancyHistory(20, recent_frames=4000)
+    rolled = OccupancyHistory(20, recent_frames=800, rollup_seconds=5.0)
+    simulate(full, occupancy, times)
+    simulate(rolled, occupancy, times)
+    assert full.count == 3000 and len(rolled.rollup_ids) > 0 and rolled.count <= 800
+
+    expected = occupancy.mean(axis=0)
+    assert np.allclose(full.occupancy_rate(), expected)
+    assert np.allclose(rolled.occupancy_rate(), expected)
+    assert np.allclose(rolled.occupancy_rate(100, 199.9), occupancy[1000:2000].mean(axis=0))
+
+    starts, utilization = rolled.utilization(interval=60)
+    assert np.allclose(starts, [0, 60, 120, 180, 240])
+    assert np.allclose(utilization, [occupancy[i:i + 600].mean() for i in range(0, 3000, 600)])
+
+    # Blocos de 5 s coincidem com as janelas agregadas: resultado exato
+    durations = np.full(3000, 0.1)
+    expected = [longest_free(occupancy[:, spot], durations) for spot in range(20)]
+    assert np.allclose(full.longest_free_run(), expected)
+    assert np.allclose(rolled.longest_free_run(), expected)
+
+
+def test_memory_bounded_and_save(tmp_path):
+    history = OccupancyHistory(500)
+    # Uma semana a 30 fps: 1 h de bitsets mais 1 semana de janelas de 1 min
+    rollups = history.max_rollups * (8 + 4 + 500 * 4)
+    assert history.nbytes + rollups < 32 * 1024 * 1024
+
+    history = OccupancyHistory(3, recent_frames=16, rollup_seconds=1.0, max_rollups=4)
+    simulate(history, [(n % 2 == 0, False, True) for n in range(100)], np.arange(100) / 4)
+    assert len(history.rollup_ids) == 4 and history.rollup_ids[-1] < history.times[0]
+
+    path = str(tmp_path / "history.npz")
+    history.save(path)
+    loaded = OccupancyHistory.load(path)
+    assert np.allclose(loaded.occupancy_rate(), history.occupancy_rate())
+    assert np.allclose(loaded.occupancy_rate(), [0.5, 0.0, 1.0])
@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+from detector.improved_parking_detector import BackgroundModel, ImprovedParkingDetector
+
+
+def test_background_model_built_once():
+    rng = np.random.default_rng(0)
+    bg = rng.integers(60, 120, (480, 900, 3), dtype=np.uint8)
+    detector = ImprovedParkingDetector(bg_frame=bg)
+    model = detector.register_background(bg)
+    assert isinstance(model, BackgroundModel)
+
+    x, y, w, h = detector.spots[0]
+    roi = cv2.medianBlur(cv2.cvtColor(bg, cv2.COLOR_BGR2GRAY)[y:y+h, x:x+w], 5)
+    assert np.array_equal(model.rois[0], roi)
+    assert model.variances[0] == np.var(roi)
+
+    detector.detect(bg, bg)
+    detector.detect(bg.copy(), bg.copy())
+    assert detector.register_background(bg) is model
+
+    detector.calibrate_thresholds(bg, [bg])
+    assert detector.register_background(bg) is model
+    assert detector.register_background(bg + 1) is not model
+
+
+def test_lazy_mode_matches_full_evaluation():
+    rng = np.random.default_rng(1)
+    bg = rng.integers(60, 120, (480, 900, 3), dtype=np.uint8)
+    eager = ImprovedParkingDetector()
+    lazy = ImprovedParkingDetector(lazy=True)
+    for t in range(6):
+        frame = bg.copy()
+        if t % 2:
+            frame[150:430, 460:660] = rng.integers(0, 255, (280, 200, 3))
+        frame = np.clip(frame.astype(int) + rng.integers(-3, 4, frame.shape), 0, 255).astype(np.uint8)
+        assert [o for o, _ in lazy.detect(frame, bg)] == [o for o, _ in eager.detect(frame, bg)]
+
+    stats = lazy.criteria_stats
+    total = sum(s.evaluated for s in stats.values())
+    assert total < 4 * 6 * len(lazy.spots)
+    assert "gradient" in lazy.criteria_report()
+
+
+def test_gradient_criterion_agrees_with_float_magnitude():
+    detector = ImprovedParkingDetector()
+    rng = np.random.default_rng(2)
+    for amplitude in (2, 6, 10, 14, 40):
+        roi = cv2.medianBlur(rng.integers(100 - amplitude, 100 + amplitude + 1, (60, 80)).astype(np.uint8), 5)
+        grad_x = cv2.Sobel(roi, cv2.CV_64F, 1, 0, ksize=3)
+        grad_y = cv2.Sobel(roi, cv2.CV_64F, 0, 1, ksize=3)
+        expected = np.mean(np.sqrt(grad_x**2 + grad_y**2)) > 10
+        assert detector._criterion_gradient(0, roi, None) == expected
@@ -0,0 +1,114 @@
+import glob
+import json
+import os
+import numpy as np
+import pytest
+from detector.benchmark import synthetic_scene
+from detector.layout_file import (LayoutCache, layout_hash, load_layout_file, parse_layout,
+                                  save_layout_file)
+from detector.layout_utils import create_detector, load_layout
+
+
+def test_parse_layout_reports_invalid_spots():
+    valid = {"version": 1, "spots": [{"type": "rect", "rect": [0, 0, 10, 10]}]}
+    assert parse_layout(valid).spots == [(0, 0, 10, 10)]
+    with pytest.raises(ValueError, match="versão"):
+        parse_layout({**valid, "version": 2})
+    with pytest.raises(ValueError, match="spots"):
+        parse_layout({"version": 1, "spots": []})
+    with pytest.raises(ValueError, match=r"spots\[1\].type"):
+        parse_layout({"spots": valid["spots"] + [{"type": "circle"}]})
+    with pytest.raises(ValueError, match=r"spots\[0\].points"):
+        parse_layout({"spots": [{"type": "polygon", "points": [[0, 0], [1, 1]]}]})
+    with pytest.raises(ValueError, match="zona"):
+        parse_layout({"spots": [{"type": "rect", "rect": [0, 0, 1, 1], "zone": "norte"}]})
+    with pytest.raises(ValueError, match="repetido"):
+        parse_layout({"spots": [{"type": "rect", "rect": [0, 0, 1, 1], "id": "A"}] * 2})
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "layout.json")
+    polygons = [[[0, 0], [10, 0], [12, 8], [0, 8]], [[20, 0], [30, 0], [30, 9], [20, 9]]]
+    save_layout_file(path, polygons, (640, 480), zones={"norte": {"andar": 1}},
+                     spot_zones=["norte", None], ids=["N1", "N2"])
+    # Uma vaga por linha
+    with open(path) as f:
+        assert sum(line.strip().startswith('{"type"') for line in f) == 2
+
+    layout = load_layout_file(path)
+    assert layout.polygons == polygons and layout.spots == polygons
+    assert layout.rects == [(0, 0, 12, 8), (20, 0, 10, 9)]
+    assert layout.frame_shape == (480, 640)
+    assert layout.zones == {"norte": {"andar": 1}}
+    assert layout.spot_zones == ["norte", None] and layout.ids == ["N1", "N2"]
+    assert load_layout(path) == polygons
+
+    with open(path, "w") as f:
+        f.write("{")
+    with pytest.raises(ValueError, match="JSON inválido"):
+        load_layout_file(path)
+
+
+@pytest.mark.parametrize("kind", ["polygon", "rect"])
+def test_detector_uses_memory_mapped_cache(tmp_path, kind):
+    scene = synthetic_scene(24, (480, 900), num_frames=3)
+    path = str(tmp_path / "layout.json")
+    save_layout_file(path, scene.polygons, (900, 480))
+
+    fresh = create_detector(kind, path)
+    caches = glob.glob(str(tmp_path / "layout.*.900x480.npz"))
+    assert len(caches) == 1 and not os.path.exists(caches[0] + ".tmp")
+
+    cached = create_detector(kind, path)
+    if kind == "polygon":
+        masks = cached._shape_masks[(480, 900)]
+        assert isinstance(masks[0].base, np.memmap)
+        assert cached.spot_bounding_boxes == fresh.spot_bounding_boxes
+    for frame in scene.frames:
+        assert cached.detect(frame, scene.background) == fresh.detect(frame, scene.background)
+
+
+def test_cache_for_other_spots_is_rejected(tmp_path):
+    scene = synthetic_scene(6, (480, 900), num_frames=1)
+    path = str(tmp_path / "layout.json")
+    save_layout_file(path, scene.polygons, (900, 480))
+    create_detector("polygon", path)
+    cache = LayoutCache.load(glob.glob(str(tmp_path / "*.npz"))[0])
+    assert cache.layout_hash == layout_hash(scene.polygons)
+    with pytest.raises(ValueError, match="não corresponde"):
+        cache.check(scene.polygons[:-1])
+
+
+def test_corrupt_cache_is_rebuilt(tmp_path):
+    scene = synthetic_scene(6, (480, 900), num_frames=1)
+    path = str(tmp_path / "layout.json")
+    save_layout_file(path, scene.polygons, (900, 480))
+    create_detector("polygon", path)
+    cache_file = glob.glob(str(tmp_path / "*.npz"))[0]
+    with open(cache_file, "wb") as f:
+        f.write(b"lixo")
+    detector = create_detector("polygon", path)
+    assert detector.detect(scene.frames[0], scene.background)
+    LayoutCache.load(cache_file)
+
+
+def test_layout_without_resolution_has_no_cache(tmp_path):
+    path = str(tmp_path / "layout.json")
+    with open(path, "w") as f:
+        json.dump({"version": 1, "spots": [{"type": "rect", "rect": [0, 0, 10, 10]}]}, f)
+    create_detector("rect", path)
+    assert not glob.glob(str(tmp_path / "*.npz"))
+
+
+def test_failed_cache_write_leaves_no_tmp_file(tmp_path, monkeypatch):
+    scene = synthetic_scene(6, (480, 900), num_frames=1)
+    path = str(tmp_path / "layout.json")
+    save_layout_file(path, scene.polygons, (900, 480))
+
+    def fail(*args, **kwargs):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(os, "replace", fail)
+    detector = create_detector("polygon", path)
+    assert detector.detect(scene.frames[0], scene.background)
+    assert not list(tmp_path.glob("*.npz*"))
@@ -0,0 +1,105 @@
+import asyncio
+import cv2
+import numpy as np
+from detector.capture import ThreadedCapture
+from detector.color_utils import SpotColorCache
+from detector.events import OccupancyTracker
+from detector.metrics import MetricsRegistry
+from detector.parking_detector import ParkingDetector
+from detector.pipeline import run_headless
+from detector.polygon_parking_detector import PolygonParkingDetector
+from detector.server import OccupancyServer, SnapshotStore
+from detector.spot_gate import SpotChangeGate
+
+
+def samples(text: str) -> dict:
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+
+
+def write_video(tmp_path):
+    video = str(tmp_path / "video.avi")
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"FFV1"), 10, (900, 480))
+    for n in range(10):
+        frame = bg.copy()
+        if 3 <= n < 8:
+            frame[150:430, 460:660] = (0, 0, 0)
+        writer.write(frame)
+    writer.release()
+    return video, bg
+
+
+def test_metrics_from_headless_run(tmp_path):
+    video, bg = write_video(tmp_path)
+    metrics = MetricsRegistry(labels={"camera": "teste"}, hysteresis=2)
+    detector = PolygonParkingDetector(spot_gate=SpotChangeGate(), color_cache=SpotColorCache())
+    with ThreadedCapture(video) as capture:
+        run_headless(detector, capture, bg, metrics=metrics)
+
+    values = samples(metrics.render())
+    assert values['parking_frames_processed_total{camera="teste"}'] == "10"
+    assert values['parking_frames_read_total{camera="teste"}'] == "10"
+    assert values['parking_frames_dropped_total{camera="teste"}'] == "0"
+    assert values['parking_detect_seconds_count{camera="teste"}'] == "10"
+    assert 'parking_capture_latency_seconds{camera="teste",quantile="0.99"}' in values
+    assert values['parking_spot_state_changes_total{camera="teste",spot="3"}'] == "2"
+    assert values['parking_spot_state_changes_total{camera="teste",spot="1"}'] == "0"
+    executed = int(values['parking_spot_evaluations_total{camera="teste",result="executed"}'])
+    skipped = int(values['parking_spot_evaluations_total{camera="teste",result="skipped"}'])
+    assert executed + skipped == 40 and skipped > executed
+    # O detector de polígonos usa a cor média: nenhum k-means
+    assert values['parking_kmeans_calls_total{camera="teste",variant="fast"}'] == "0"
+
+    path = tmp_path / "metrics.prom"
+    metrics.dump(str(path))
+    assert path.read_text() == metrics.render()
+
+
+def test_metrics_read_pipeline_tracker(tmp_path):
+    video, bg = write_video(tmp_path)
+    metrics = MetricsRegistry()
+    tracker = OccupancyTracker(hysteresis=2)
+    with ThreadedCapture(video) as capture:
+        run_headless(PolygonParkingDetector(), capture, bg, tracker=tracker, metrics=metrics)
+    # Nenhum tracker duplicado: as mudanças vêm do tracker da execução
+    assert metrics.tracker is tracker
+    assert samples(metrics.render())['parking_spot_state_changes_total{spot="3"}'] == "2"
+
+
+def test_kmeans_counted_per_detector():
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    car = bg.copy()
+    car[150:430, 460:660] = (0, 0, 200)
+    first, second = ParkingDetector(), ParkingDetector(color_cache=SpotColorCache())
+    first.detect(car, bg)
+    first.detect(car, bg)
+    second.detect(car, bg)
+    occupied = sum(occupied for occupied, _ in first.detect(car, bg))
+    assert occupied and first.kmeans_stats.full == 3 * occupied
+    assert second.kmeans_stats.full == 0 and second.color_cache.kmeans_stats.fast == occupied
+
+    metrics = MetricsRegistry()
+    metrics.watch_detector(second)
+    values = samples(metrics.render())
+    assert values['parking_kmeans_calls_total{variant="full"}'] == "0"
+    assert values['parking_kmeans_calls_total{variant="fast"}'] == str(occupied)
+
+
+def test_metrics_endpoint():
+    metrics = MetricsRegistry()
+    metrics.observe_record({"frame": 1, "timestamp": 0.0,
+                            "spots": [{"occupied": True, "color": None}]})
+
+    async def scenario():
+        server = OccupancyServer(SnapshotStore(), port=0, metrics=metrics)
+        await server.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        await server.close()
+        return response
+
+    head, body = asyncio.run(scenario()).split(b"\r\n\r\n", 1)
+    assert b"text/plain; version=0.0.4" in head
+    assert samples(body.decode())['parking_spot_occupied{spot="1"}'] == "1"
@@ -0,0 +1,74 @@
+import numpy as np
+from detector.improved_parking_detector import ImprovedParkingDetector
+from detector.motion import MotionSpotSelector
+from detector.parking_detector import ParkingDetector
+from detector.polygon_parking_detector import PolygonParkingDetector
+from detector.spatial_index import SpotGrid
+
+
+def scene():
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    car = bg.copy()
+    car[150:430, 460:660] = (0, 0, 0)
+    return bg, car
+
+
+def test_grid_query_matches_brute_force():
+    rng = np.random.default_rng(0)
+    boxes = [(int(x), int(y), int(w), int(h)) for x, y, w, h
+             in zip(rng.integers(0, 800, 300), rng.integers(0, 400, 300),
+                    rng.integers(0, 60, 300), rng.integers(0, 60, 300))]
+    grid = SpotGrid(boxes, cell_size=32)
+    for x, y, w, h in [(0, 0, 900, 480), (100, 100, 1, 1), (300, 50, 120, 40), (850, 450, 50, 50)]:
+        expected = [idx for idx, (bx, by, bw, bh) in enumerate(boxes)
+                    if bw > 0 and bh > 0 and bx < x + w and bx + bw > x and by < y + h and by + bh > y]
+        assert list(grid.query(x, y, w, h)) == expected
+    assert len(grid.query_many([])) == 0
+
+
+def test_only_spots_touched_by_motion_are_evaluated():
+    bg, car = scene()
+    for kind in (PolygonParkingDetector, ParkingDetector, ImprovedParkingDetector):
+        detector = kind(motion_selector=MotionSpotSelector())
+        selector = detector.motion_selector
+        spots = len(detector.spots)
+
+        assert detector.detect(bg, bg) == kind().detect(bg, bg)
+        assert selector.evaluated == spots
+
+        # Sem movimento: nenhuma vaga analisada, mesmo resultado
+        assert detector.detect(bg, bg) == kind().detect(bg, bg)
+        assert selector.skipped == spots
+
+        # O carro só toca algumas vagas; o resultado é o da análise completa
+        assert detector.detect(car, bg) == kind().detect(car, bg)
+        assert spots < selector.evaluated < 2 * spots
+
+
+def test_slow_change_accumulates_until_detected():
+    bg, car = scene()
+    detector = ParkingDetector(motion_selector=MotionSpotSelector(pixel_threshold=25))
+    detector.detect(bg, bg)
+    # Escurece 10 níveis por frame: nenhum passo isolado passa do limite
+    frame = bg.copy()
+    for _ in range(8):
+        frame[150:430, 460:660] -= 10
+        result = detector.detect(frame, bg)
+    # A ocupação é detectada; a cor pode ser a do passo em que a mudança passou do limite
+    assert [occupied for occupied, _ in result] == \
+        [occupied for occupied, _ in ParkingDetector().detect(frame, bg)]
+    assert result[2][0]
+
+
+def test_background_change_and_invalidate():
+    bg, car = scene()
+    detector = PolygonParkingDetector(motion_selector=MotionSpotSelector())
+    detector.detect(car, bg)
+    # Fundo novo: todas as vagas voltam a ser analisadas
+    assert detector.detect(car, car) == PolygonParkingDetector().detect(car, car)
+
+    selector = detector.motion_selector
+    before = selector.evaluated
+    selector.invalidate([0])
+    detector.detect(car, car)
+    assert selector.evaluated == before + 1
@@ -13,8 +13,8 @@ def test_empty_spot(tmp_path, monkeypatch):
 def test_occupied_spot(tmp_path):
     # frame com uma mancha branca simulando carro
     frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    detector = ParkingDetector()
     x, y, w, h = detector.spots[0]
     frame[y:y+h, x:x+w] = 255
-    detector = ParkingDetector()
     results = detector.detect(frame, bg_frame=np.zeros_like(frame))
     assert results[0][0] is True
\ No newline at end of file
@@ -0,0 +1,39 @@
+import numpy as np
+from detector.polygon_parking_detector import PolygonParkingDetector
+
+
+def make_scene():
+    bg = np.full((480, 900, 3), 80, dtype=np.uint8)
+    frame = bg.copy()
+    frame[150:430, 460:660] = (30, 40, 200)
+    return bg, frame
+
+
+def test_background_built_once(monkeypatch):
+    bg, frame = make_scene()
+    detector = PolygonParkingDetector()
+    calls = []
+    original = detector._background._build
+    monkeypatch.setattr(detector._background, "_build",
+                        lambda bg_frame: calls.append(1) or original(bg_frame))
+
+    first = detector.detect(frame, bg)
+    detector.detect(frame, bg)
+    # Mesmo conteúdo em outro objeto não reconstrói o cache
+    second = detector.detect(frame, bg.copy())
+    assert len(calls) == 1
+    assert first == second
+    assert first[2][0] is True
+    assert not first[0][0]
+
+    detector.detect(frame, np.zeros_like(bg))
+    assert len(calls) == 2
+
+
+def test_background_resized_to_frame():
+    bg, frame = make_scene()
+    small_bg = np.full((240, 450, 3), 80, dtype=np.uint8)
+    detector = PolygonParkingDetector()
+    background = detector.register_background(small_bg, frame.shape)
+    assert background['gray'].shape == frame.shape[:2]
+    assert detector.detect(frame, small_bg) == detector.detect(frame, bg)
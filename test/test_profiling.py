@@ -0,0 +1,73 @@
+import threading
+import numpy as np
+from detector.improved_parking_detector import ImprovedParkingDetector
+from detector.parking_detector import ParkingDetector
+from detector.polygon_parking_detector import PolygonParkingDetector
+from detector.profiling import StageProfiler
+
+
+def scene():
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    car = bg.copy()
+    car[150:430, 460:660] = (0, 0, 0)
+    return bg, car
+
+
+def test_stages_recorded_for_all_detectors():
+    bg, car = scene()
+    for detector_class, stage in ((ParkingDetector, "diff"), (ImprovedParkingDetector, "criteria"),
+                                  (PolygonParkingDetector, "diff")):
+        profiler = StageProfiler()
+        detector = detector_class(profiler=profiler)
+        plain = detector_class()
+        for frame in (bg, car, car):
+            assert detector.detect(frame, bg) == plain.detect(frame, bg)
+            detector.draw_annotations(frame.copy(), detector.detect(frame, bg))
+            profiler.frame_done()
+
+        report = profiler.report()
+        assert report["frames"] == 3
+        assert {"gray", stage, "color", "draw"} <= set(report["stages"])
+        assert report["stages"]["gray"]["count"] == 6
+        assert sorted(report["spots"]) == list(range(len(detector.spots)))
+        row = report["stages"][stage]
+        assert 0 <= row["p50"] <= row["p95"] <= row["p99"]
+        assert "Vagas mais lentas" in profiler.summary()
+
+
+def test_rolling_window_and_profile_window():
+    profiler = StageProfiler(window=4)
+    for ms in (100, 100, 1, 1, 1, 1):
+        profiler.add("x", ms / 1000)
+    assert profiler.stages["x"].count == 6
+    assert np.allclose(profiler.stages["x"].percentiles(), [1, 1, 1])
+    snapshot = profiler.stage_times()
+    profiler.add("x", 1.0)
+    assert snapshot["x"].count == 6 and np.allclose(snapshot["x"].percentiles(), [1, 1, 1])
+
+    bg, car = scene()
+    detector = PolygonParkingDetector(profiler=profiler)
+    profiler.start_window(2)
+    for _ in range(3):
+        detector.detect(car, bg)
+        profiler.frame_done(capture_time=0.0)
+    assert "_detect_with_background" in profiler.window_report
+    assert "pico" in profiler.window_report
+    assert profiler.stages["latency"].count == 3
+
+
+def test_profiler_shared_between_threads():
+    profiler = StageProfiler()
+
+    def record():
+        for _ in range(2000):
+            profiler.add("render", 0.001)
+            profiler.add_spot(0, 0.001)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = profiler.report()
+    assert report["stages"]["render"]["count"] == report["spots"][0]["count"] == 8000
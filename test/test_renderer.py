@@ -0,0 +1,80 @@
+import numpy as np
+from detector.benchmark import synthetic_scene
+from detector.improved_parking_detector import ImprovedParkingDetector
+from detector.polygon_parking_detector import PolygonParkingDetector
+
+
+def test_incremental_render_matches_fresh_render():
+    scene = synthetic_scene(40, (480, 900), num_frames=4)
+    detector = PolygonParkingDetector(scene.polygons)
+    frame = scene.frames[0]
+    detections = detector.detect(frame, scene.background)
+    first = detector.draw_annotations(frame, detections)
+    assert not np.array_equal(first, frame)
+
+    # Uma vaga muda: só ela e as vizinhas que a tocam são redesenhadas
+    renderer = detector._renderer
+    redrawn = renderer.spots_redrawn
+    changed = list(detections)
+    changed[7] = (not changed[7][0], (10, 20, 30))
+    annotated = detector.draw_annotations(frame, changed)
+    assert 0 < renderer.spots_redrawn - redrawn < 10
+    assert np.array_equal(annotated, PolygonParkingDetector(scene.polygons).draw_annotations(frame, changed))
+
+    # De volta ao estado anterior: mesma imagem do primeiro frame
+    assert np.array_equal(detector.draw_annotations(frame, detections), first)
+    # Nada mudou: nenhuma vaga redesenhada
+    redrawn = renderer.spots_redrawn
+    detector.draw_annotations(frame, detections)
+    assert renderer.spots_redrawn == redrawn
+
+
+def test_render_does_not_modify_frame_and_handles_short_detections():
+    scene = synthetic_scene(6, (480, 900), num_frames=1)
+    detector = PolygonParkingDetector(scene.polygons)
+    frame = scene.frames[0]
+    original = frame.copy()
+    partial = detector.draw_annotations(frame, [(True, (0, 0, 0))] * 3)
+    full = detector.draw_annotations(frame, [(True, (0, 0, 0))] * 6)
+    assert np.array_equal(frame, original)
+    # A última vaga só aparece quando tem detecção
+    x0, y0 = np.min(scene.polygons[5], axis=0)
+    x1, y1 = np.max(scene.polygons[5], axis=0)
+    assert np.array_equal(partial[y0:y1, x0:x1], original[y0:y1, x0:x1])
+    assert not np.array_equal(full[y0:y1, x0:x1], original[y0:y1, x0:x1])
+
+
+def test_improved_draws_threshold_notes():
+    scene = synthetic_scene(4, (480, 900), num_frames=1)
+    detector = ImprovedParkingDetector(scene.rects)
+    frame = scene.frames[0]
+    detections = detector.detect(frame, scene.background)
+    plain = detector.draw_annotations(frame, detections)
+    detector.adaptive_thresholds = {idx: 1000.0 for idx in range(4)}
+    detector.calibrated = True
+    noted = detector.draw_annotations(frame, detections)
+    assert not np.array_equal(plain, noted)
+
+
+def test_color_jitter_does_not_redraw():
+    scene = synthetic_scene(12, (480, 900), num_frames=1)
+    detector = PolygonParkingDetector(scene.polygons)
+    frame = scene.frames[0]
+    detections = [(True, (100, 50, 200))] * 12
+    detector.draw_annotations(frame, detections)
+    renderer = detector._renderer
+    redrawn = renderer.spots_redrawn
+    # Oscilação da cor dominante dentro do mesmo degrau: nada é redesenhado
+    jittered = [(True, (101, 49, 203))] * 12
+    annotated = detector.draw_annotations(frame, jittered)
+    assert renderer.spots_redrawn == redrawn
+    assert np.array_equal(annotated, PolygonParkingDetector(scene.polygons).draw_annotations(frame, jittered))
+
+
+def test_renderer_built_on_first_draw():
+    scene = synthetic_scene(4, (480, 900), num_frames=1)
+    detector = ImprovedParkingDetector(scene.rects)
+    detections = detector.detect(scene.frames[0], scene.background)
+    assert detector._renderer is None
+    detector.draw_annotations(scene.frames[0], detections)
+    assert detector._renderer is not None
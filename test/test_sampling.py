@@ -0,0 +1,60 @@
+import json
+import cv2
+import numpy as np
+import headless
+from detector.capture import ThreadedCapture, stride_for_rate
+from detector.motion import MotionGate
+from detector.pipeline import GatedDetector
+from detector.polygon_parking_detector import PolygonParkingDetector
+
+
+def write_video(path, frames):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"FFV1"), 10, (900, 480))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+
+def test_stride_skips_with_grab(tmp_path):
+    path = write_video(tmp_path / "v.avi", [np.zeros((480, 900, 3), np.uint8)] * 10)
+    with ThreadedCapture(path, stride=3) as capture:
+        numbers = []
+        while capture.read(timeout=5)[0]:
+            numbers.append(capture.frame_number)
+    assert numbers == [1, 4, 7, 10]
+    assert capture.frames_skipped == 6
+    assert stride_for_rate(30, 2) == 15
+    assert stride_for_rate(0, 2) == 1
+
+
+def test_motion_gate_reuses_last_result():
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    car = bg.copy()
+    car[150:430, 460:660] = (0, 0, 0)
+
+    detector = GatedDetector(PolygonParkingDetector(), MotionGate())
+    first = detector.detect(bg, bg)
+    assert detector.detect(bg.copy(), bg) is first
+    moved = detector.detect(car, bg)
+    assert moved[2][0] is True
+    assert detector.frames_reused == 1
+    assert detector.spots is detector.detector.spots
+
+
+def test_headless_fills_skipped_frames(tmp_path):
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    car = bg.copy()
+    car[150:430, 460:660] = (0, 0, 0)
+    video = write_video(tmp_path / "v.avi", [bg] * 3 + [car] * 4)
+    background = str(tmp_path / "bg.png")
+    cv2.imwrite(background, bg)
+    output = tmp_path / "out.jsonl"
+
+    headless.main(["--video", video, "--background", background, "--output", str(output),
+                   "--stride", "2", "--motion-gate"])
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r["frame"] for r in records] == list(range(1, 8))
+    occupied = [r["spots"][2]["occupied"] for r in records]
+    # Frame 4 é pulado e herda o estado do frame 3
+    assert occupied == [False, False, False, False, True, True, True]
@@ -0,0 +1,58 @@
+import numpy as np
+from detector.improved_parking_detector import ImprovedParkingDetector
+from detector.layout_utils import create_detector
+from detector.parking_detector import ParkingDetector
+from detector.polygon_parking_detector import PolygonParkingDetector
+from detector.scaling import ScaledDetector, scale_polygons, scale_rects
+
+
+def scene():
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    car = bg.copy()
+    car[150:430, 460:660] = (0, 0, 0)
+    return bg, car
+
+
+def test_layouts_and_thresholds_rescaled():
+    assert scale_rects([(10, 140, 125, 300)], 0.5) == [(5, 70, 62, 150)]
+    assert scale_polygons([[[5, 140], [170, 160]]], 0.5) == [[[2, 70], [85, 80]]]
+
+    rect = ParkingDetector().scaled_copy(0.5)
+    assert rect.occupancy_threshold == 125
+    improved = ImprovedParkingDetector()
+    improved.adaptive_thresholds = {0: 4000.0}
+    copy = improved.scaled_copy(0.5)
+    assert copy.adaptive_thresholds == {0: 1000.0} and copy.min_pixel_threshold == 1250
+
+
+def test_scaled_detection_matches_native():
+    bg, car = scene()
+    for detector in (PolygonParkingDetector(), ParkingDetector(), ImprovedParkingDetector()):
+        scaled = ScaledDetector(detector, 0.5)
+        native = [occupied for occupied, _ in detector.detect(car, bg)]
+        assert [occupied for occupied, _ in scaled.detect(car, bg)] == native
+        occupancy, _ = scaled.detect_batch([car, bg], bg)
+        assert list(occupancy[0]) == native and not occupancy[1].any()
+
+    # Desenho em resolução nativa
+    scaled = create_detector("polygon", processing_scale=0.5)
+    annotated = scaled.draw_annotations(car.copy(), scaled.detect(car, bg))
+    assert annotated.shape == car.shape
+
+
+def test_calibration_reaches_scaled_copy(tmp_path):
+    bg, car = scene()
+    scaled = ScaledDetector(ImprovedParkingDetector(), 0.5)
+    scaled.calibrate_thresholds(bg, [bg, car])
+    native = scaled.detector.adaptive_thresholds
+    assert scaled.scaled.calibrated
+    assert scaled.scaled.adaptive_thresholds == {idx: value * 0.25 for idx, value in native.items()}
+    # Mesmo resultado que reduzir um detector já calibrado
+    assert scaled.detect(car, bg) == ScaledDetector(scaled.detector, 0.5).detect(car, bg)
+
+    path = str(tmp_path / "thresholds.json")
+    other = ScaledDetector(ImprovedParkingDetector(), 0.5)
+    assert not other.calibrate_stream(bg, [car] * 4, cache_path=path)
+    assert other.calibrate_stream(bg, [], cache_path=path)
+    assert other.scaled.adaptive_thresholds == {idx: value * 0.25
+                                                for idx, value in other.detector.adaptive_thresholds.items()}
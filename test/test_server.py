@@ -0,0 +1,95 @@
+import asyncio
+import base64
+import json
+import os
+import struct
+from detector.events import OccupancyTracker
+from detector.server import OccupancyServer, SnapshotStore, decode_binary
+
+FREE = [(False, None)] * 10
+
+
+async def get(port, path, headers=""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n{headers}\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    body = await reader.read()
+    writer.close()
+    return int(head.split(b" ")[1]), body
+
+
+async def read_ws_message(reader):
+    first, length = await reader.readexactly(2)
+    assert first == 0x81
+    if length == 126:
+        length, = struct.unpack("!H", await reader.readexactly(2))
+    return json.loads(await reader.readexactly(length))
+
+
+def test_snapshot_routes_and_concurrent_readers():
+    store = SnapshotStore()
+    detections = list(FREE)
+    detections[3] = (True, (10, 20, 30))
+    detections[9] = (True, None)
+    store.publish(detections, 7, 0.25)
+
+    async def scenario():
+        server = OccupancyServer(store, port=0)
+        await server.start()
+        try:
+            status, body = await get(server.port, "/occupancy")
+            record = json.loads(body)
+            assert status == 200 and record["free"] == 8 and record["frame"] == 7
+            assert record["spots"][3] == {"occupied": True, "color": [10, 20, 30]}
+
+            status, body = await get(server.port, "/occupancy.bin")
+            assert status == 200 and len(body) == 20 + 2
+            frame, timestamp, free, occupied = decode_binary(body)
+            assert (frame, timestamp, free) == (7, 0.25, 8)
+            assert occupied == [idx in (3, 9) for idx in range(10)]
+
+            status, _ = await get(server.port, "/occupancy", f'If-None-Match: "{store.current.version}"\r\n')
+            assert status == 304
+            assert (await get(server.port, "/missing"))[0] == 404
+
+            results = await asyncio.gather(*[get(server.port, "/occupancy.bin") for _ in range(300)])
+            assert all(status == 200 and body == results[0][1] for status, body in results)
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+def test_websocket_pushes_transitions():
+    tracker = OccupancyTracker(hysteresis=1, emit_initial=False)
+    store = SnapshotStore(tracker)
+    store.publish(FREE, 1, 0.0)
+
+    async def scenario():
+        server = OccupancyServer(store, port=0)
+        await server.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((f"GET /events HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        head = await reader.readuntil(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 101")
+
+        snapshot = await read_ws_message(reader)
+        assert snapshot["type"] == "snapshot" and snapshot["free"] == 10
+
+        # Publicação a partir de outra thread, como no laço de detecção
+        detections = list(FREE)
+        detections[4] = (True, (1, 2, 3))
+        await asyncio.to_thread(store.publish, detections, 2, 0.1)
+        event = await asyncio.wait_for(read_ws_message(reader), 1)
+        assert (event["type"], event["spot"], event["new"], event["color"]) == ("event", 4, True, [1, 2, 3])
+
+        # Close mascarado do cliente
+        writer.write(struct.pack("!BB", 0x88, 0x80) + b"\0\0\0\0")
+        first, _ = await asyncio.wait_for(reader.readexactly(2), 1)
+        assert first == 0x88
+        writer.close()
+        await server.close()
+
+    asyncio.run(scenario())
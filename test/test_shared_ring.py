@@ -0,0 +1,121 @@
+import multiprocessing as mp
+import cv2
+import numpy as np
+from detector.polygon_parking_detector import PolygonParkingDetector
+from detector.shared_ring import SharedFrameRing, decode_to_ring
+
+
+def test_write_read_and_release():
+    ring = SharedFrameRing.create((4, 5, 3), slots=3)
+    reader = SharedFrameRing.attach(ring.name)
+    try:
+        for value in (1, 2):
+            ring.write(np.full((4, 5, 3), value, dtype=np.uint8), overwrite=False)
+
+        seq, frame = reader.read(timeout=1)
+        assert seq == 1 and frame[0, 0, 0] == 1
+        assert not frame.flags.writeable
+        reader.release(seq)
+
+        seq, frame = reader.read(timeout=1)
+        assert seq == 2 and frame[0, 0, 0] == 2
+        reader.release(seq)
+        del frame
+
+        # Sem frames novos: timeout
+        assert reader.read(timeout=0.01) == (None, None)
+        ring.close_writer()
+        assert reader.read() == (None, None)
+    finally:
+        reader.close()
+        ring.close()
+
+
+def test_overwrite_on_full_skips_to_oldest():
+    ring = SharedFrameRing.create((2, 2, 3), slots=2)
+    try:
+        for value in range(1, 6):
+            ring.write(np.full((2, 2, 3), value, dtype=np.uint8))
+        assert not ring.is_valid(1)
+
+        seq, frame = ring.read(timeout=1)
+        assert seq == 4 and frame[0, 0, 0] == 4
+        assert ring.missed == 3
+        assert ring.read_latest()[0] == 5
+        del frame
+    finally:
+        ring.close()
+
+
+def test_writer_closing_with_lagging_reader_in_overwrite_mode():
+    for abort in (True, False):
+        ring = SharedFrameRing.create((2, 2, 3), slots=2)
+        reader = SharedFrameRing.attach(ring.name)
+        try:
+            for value in (1, 2):
+                ring.write(np.full((2, 2, 3), value, dtype=np.uint8))
+            # Buffer cheio: o próximo frame reserva o slot do frame 1
+            seq, _ = ring.begin_write(overwrite=True)
+            if abort:
+                # Fim do vídeo: a leitura falhou e o slot é devolvido
+                ring.abort_write(seq)
+            ring.close_writer()
+
+            seqs = []
+            while True:
+                seq, frame = reader.read()
+                if seq is None:
+                    break
+                seqs.append(seq)
+                reader.release(seq)
+            del frame
+            # Sem abort_write (escritor morreu no meio), o frame 1 é dado como perdido
+            assert seqs == ([1, 2] if abort else [2])
+            assert reader.missed == (0 if abort else 1)
+        finally:
+            reader.close()
+            ring.close()
+
+
+def test_detector_accepts_shared_view():
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    image = bg.copy()
+    image[150:430, 460:660] = (20, 20, 220)
+
+    ring = SharedFrameRing.create(image.shape, slots=2)
+    try:
+        seq = ring.write(image)
+        _, frame = ring.read_latest()
+        assert np.shares_memory(frame, ring.shm.buf)
+        detector = PolygonParkingDetector()
+        assert detector.detect(frame, bg) == detector.detect(image, bg)
+        assert ring.is_valid(seq)
+        del frame
+    finally:
+        ring.close()
+
+
+def test_decoder_process_writes_into_ring(tmp_path):
+    path = str(tmp_path / "video.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for _ in range(5):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+    ring = SharedFrameRing.create((48, 64, 3), slots=2)
+    try:
+        decoder = mp.Process(target=decode_to_ring, args=(path, ring.name, False))
+        decoder.start()
+        seqs = []
+        while True:
+            seq, frame = ring.read(timeout=5)
+            if seq is None:
+                break
+            seqs.append(seq)
+            ring.release(seq)
+        del frame
+        decoder.join(timeout=5)
+        assert seqs == [1, 2, 3, 4, 5]
+        assert decoder.exitcode == 0
+    finally:
+        ring.close()
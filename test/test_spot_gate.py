@@ -0,0 +1,50 @@
+import numpy as np
+from detector.improved_parking_detector import ImprovedParkingDetector
+from detector.parking_detector import ParkingDetector
+from detector.polygon_parking_detector import PolygonParkingDetector
+from detector.spot_gate import SpotChangeGate
+
+
+def scene():
+    bg = np.full((480, 900, 3), 90, dtype=np.uint8)
+    car = bg.copy()
+    car[150:430, 460:660] = (0, 0, 0)
+    return bg, car
+
+
+def test_unchanged_spots_reuse_result():
+    bg, car = scene()
+    for detector in (PolygonParkingDetector(spot_gate=SpotChangeGate()),
+                     ParkingDetector(spot_gate=SpotChangeGate()),
+                     ImprovedParkingDetector(spot_gate=SpotChangeGate())):
+        gate = detector.spot_gate
+        spots = len(detector.spots)
+        first = detector.detect(car, bg)
+        assert gate.evaluated == spots and gate.skipped == 0
+
+        # Ruído leve: tudo reaproveitado, mesmo resultado
+        noisy = car.copy()
+        noisy[::7, ::5] += 1
+        assert detector.detect(noisy, bg) == first
+        assert gate.skipped == spots
+
+        # Só as vagas alteradas voltam a ser analisadas
+        assert detector.detect(bg, bg) == type(detector)().detect(bg, bg)
+        assert spots < gate.evaluated < 2 * spots
+
+
+def test_background_change_resets_cache():
+    bg, car = scene()
+    detector = PolygonParkingDetector(spot_gate=SpotChangeGate())
+    detector.detect(car, bg)
+    assert detector.detect(car, car) == PolygonParkingDetector().detect(car, car)
+    assert detector.spot_gate.skipped == 0
+
+
+def test_tolerance_zero_requires_identical_signature():
+    gate = SpotChangeGate(tolerance=0)
+    roi = np.full((40, 60), 100, dtype=np.uint8)
+    signature, cached = gate.lookup(0, roi)
+    gate.store(0, signature, (False, None))
+    assert gate.lookup(0, roi.copy())[1] == (False, None)
+    assert gate.lookup(0, roi + 1)[1] is None
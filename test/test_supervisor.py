@@ -0,0 +1,58 @@
+import io
+import json
+import cv2
+import numpy as np
+from detector.supervisor import Supervisor, load_manifest
+
+
+def write_video(path, frames=6):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (900, 480))
+    for _ in range(frames):
+        writer.write(np.full((480, 900, 3), 90, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def test_supervisor_merges_camera_streams(tmp_path):
+    manifest = tmp_path / "cameras.json"
+    manifest.write_text(json.dumps({"cameras": [
+        {"name": "a", "source": write_video(tmp_path / "a.avi", 6), "detector": "polygon"},
+        {"name": "b", "source": write_video(tmp_path / "b.avi", 4), "detector": "rect"},
+    ]}))
+    output = tmp_path / "out.jsonl"
+
+    with open(output, "w") as sink:
+        supervisor = Supervisor(load_manifest(str(manifest)), sink, log=None).run()
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    frames = {name: [r["frame"] for r in records if r["camera"] == name] for name in ("a", "b")}
+    assert frames == {"a": list(range(1, 7)), "b": list(range(1, 5))}
+    assert supervisor.finished == {"a", "b"}
+    assert set(supervisor.worker_fps) == {"a", "b"}
+
+
+def test_supervisor_gives_up_on_broken_camera(tmp_path):
+    cameras = [{"name": "x", "source": str(tmp_path / "missing.avi"),
+                "background": None, "layout": None, "detector": "polygon"}]
+    supervisor = Supervisor(cameras, max_restarts=2, log=None).run()
+    assert supervisor.failed == {"x"}
+    assert supervisor.restarts["x"] == 2
+
+
+def test_supervisor_drops_records_repeated_after_restart():
+    sink = io.StringIO()
+    cameras = [{"name": "x", "source": "x.avi", "detector": "polygon"}]
+    supervisor = Supervisor(cameras, sink, log=None)
+
+    def record(frame):
+        return ("record", "x", {"frame": frame, "timestamp": frame / 10, "spots": []})
+
+    # O worker morre com os frames 3 e 4 ainda na fila; o substituto retoma
+    # a partir do frame 2 (o último recebido antes do reinício)
+    for frame in (1, 2, 3, 4, 3, 4, 5):
+        supervisor._handle(record(frame))
+
+    frames = [json.loads(line)["frame"] for line in sink.getvalue().splitlines()]
+    assert frames == [1, 2, 3, 4, 5]
+    assert supervisor.duplicates["x"] == 2
+    assert supervisor.last_frame["x"] == 5